@@ -1,12 +1,19 @@
 """
 Скрипт для создания резервной копии базы данных
 Может запускаться по расписанию через cron или другой планировщик
+
+Копия снимается через SQLite backup API небольшими порциями страниц, поэтому
+бот может продолжать писать в базу данных во время резервного копирования.
+Запись другим соединением заставляет SQLite начинать копирование заново,
+поэтому после нескольких перезапусков копия снимается за один шаг.
+Копия проверяется PRAGMA integrity_check, сжимается потоково, а контрольная
+сумма SHA-256 сохраняется в файле статистики и сверяется после сжатия.
 """
 import os
 import sys
 import logging
-import shutil
 import sqlite3
+import hashlib
 from datetime import datetime
 import gzip
 import json
@@ -26,6 +33,10 @@ logger = logging.getLogger(__name__)
 BACKUP_DIR = "backups"
 DB_PATH = "bot.db"
 MAX_BACKUPS = 10  # Максимальное количество хранимых резервных копий
+BACKUP_PAGES_PER_STEP = 256  # Количество страниц, копируемых за один шаг
+BACKUP_STEP_SLEEP = 0.01  # Пауза между шагами копирования в секундах, чтобы не блокировать запись
+BACKUP_MAX_RESTARTS = 3  # Количество перезапусков копирования, после которого копия снимается за один шаг
+CHUNK_SIZE = 1024 * 1024  # Размер блока при сжатии и проверке
 
 def create_backup_dir():
     """Создает директорию для резервных копий, если она не существует"""
@@ -33,27 +44,54 @@ def create_backup_dir():
         os.makedirs(BACKUP_DIR)
         logger.info(f"Создана директория для резервных копий: {BACKUP_DIR}")
 
-def get_database_stats():
-    """Получает статистику базы данных"""
+def get_database_stats(db_path=DB_PATH):
+    """
+    Получает статистику базы данных без полного просмотра таблиц.
+    
+    Количество строк берется из sqlite_stat1 (после ANALYZE), а для таблиц
+    без статистики оценивается по максимальному rowid.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
         # Получаем список таблиц
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        tables = [row[0] for row in cursor.fetchall()]
+        
+        # Первое число в sqlite_stat1.stat - количество строк в таблице
+        analyzed = {}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sqlite_stat1';")
+        if cursor.fetchone():
+            cursor.execute("SELECT tbl, stat FROM sqlite_stat1;")
+            for table_name, stat in cursor.fetchall():
+                if stat:
+                    analyzed[table_name] = max(analyzed.get(table_name, 0), int(stat.split()[0]))
+        
+        page_size = cursor.execute("PRAGMA page_size;").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count;").fetchone()[0]
         
         stats = {
             "tables": len(tables),
-            "table_stats": {}
+            "size_bytes": page_size * page_count,
+            "table_stats": {},
+            "row_count_source": {}
         }
         
-        # Получаем количество записей в каждой таблице
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
-            count = cursor.fetchone()[0]
-            stats["table_stats"][table_name] = count
+        # Оцениваем количество записей в каждой таблице
+        for table_name in tables:
+            if table_name in analyzed:
+                stats["table_stats"][table_name] = analyzed[table_name]
+                stats["row_count_source"][table_name] = "sqlite_stat1"
+                continue
+            try:
+                cursor.execute(f'SELECT MAX(rowid) FROM "{table_name}";')
+                stats["table_stats"][table_name] = cursor.fetchone()[0] or 0
+                stats["row_count_source"][table_name] = "max_rowid"
+            except sqlite3.OperationalError:
+                # Таблица без rowid
+                stats["table_stats"][table_name] = None
+                stats["row_count_source"][table_name] = "unknown"
         
         conn.close()
         return stats
@@ -61,6 +99,88 @@ def get_database_stats():
         logger.error(f"Ошибка при получении статистики базы данных: {e}")
         return None
 
+class BackupRestarted(Exception):
+    """Копирование порциями перезапускалось слишком часто из-за записи в базу данных"""
+
+def copy_database(target_path):
+    """
+    Копирует базу данных через SQLite backup API порциями страниц.
+    
+    Если другое соединение пишет в базу данных между шагами, SQLite начинает
+    копирование с первой страницы, и при постоянной записи копия большой базы
+    данных может не закончиться никогда. Перезапуск виден по тому, что
+    количество оставшихся страниц снова растет. После BACKUP_MAX_RESTARTS
+    перезапусков копия снимается за один шаг (pages=-1): на это время запись
+    в базу данных ждет завершения копирования.
+    
+    Returns:
+        int: Количество перезапусков копирования порциями
+    """
+    source = sqlite3.connect(DB_PATH)
+    target = sqlite3.connect(target_path)
+    restarts = 0
+    last_remaining = None
+    try:
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts >= BACKUP_MAX_RESTARTS:
+                    # Исключение в progress прерывает копирование
+                    raise BackupRestarted()
+            last_remaining = remaining
+            logger.debug(f"Скопировано {total - remaining} из {total} страниц")
+        
+        try:
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+        except BackupRestarted:
+            logger.warning(f"Копирование перезапускалось {restarts} раз из-за записи в базу данных, копируем за один шаг")
+            source.backup(target, pages=-1, sleep=BACKUP_STEP_SLEEP)
+        return restarts
+    finally:
+        target.close()
+        source.close()
+
+def check_integrity(db_path):
+    """Проверяет целостность копии базы данных"""
+    conn = sqlite3.connect(db_path)
+    try:
+        result = conn.execute("PRAGMA integrity_check;").fetchall()
+    finally:
+        conn.close()
+    return result == [("ok",)]
+
+def compress_file(source_path, target_path):
+    """
+    Потоково сжимает файл и возвращает контрольную сумму SHA-256 исходных данных.
+    
+    Файл сначала пишется во временный файл и переименовывается только после
+    успешной записи.
+    """
+    checksum = hashlib.sha256()
+    temp_path = f"{target_path}.tmp"
+    with open(source_path, 'rb') as f_in:
+        with gzip.open(temp_path, 'wb') as f_out:
+            while True:
+                chunk = f_in.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                checksum.update(chunk)
+                f_out.write(chunk)
+    os.replace(temp_path, target_path)
+    return checksum.hexdigest()
+
+def verify_backup(backup_path, expected_checksum):
+    """Распаковывает резервную копию потоково и сверяет контрольную сумму"""
+    checksum = hashlib.sha256()
+    with gzip.open(backup_path, 'rb') as f_in:
+        while True:
+            chunk = f_in.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            checksum.update(chunk)
+    return checksum.hexdigest() == expected_checksum
+
 def create_backup():
     """Создает резервную копию базы данных"""
     try:
@@ -71,19 +191,36 @@ def create_backup():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = os.path.join(BACKUP_DIR, f"bot_db_backup_{timestamp}.db.gz")
         
-        # Получаем статистику базы данных
-        stats = get_database_stats()
+        snapshot_path = os.path.join(BACKUP_DIR, f"bot_db_snapshot_{timestamp}.db")
+        
+        try:
+            # Снимаем согласованную копию, не блокируя запись в базу данных
+            copy_database(snapshot_path)
+            
+            if not check_integrity(snapshot_path):
+                logger.error("Копия базы данных не прошла проверку целостности")
+                return None
+            
+            # Получаем статистику по копии, а не по рабочей базе данных
+            stats = get_database_stats(snapshot_path)
+            
+            # Создаем резервную копию
+            checksum = compress_file(snapshot_path, backup_path)
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
         
-        # Создаем резервную копию
-        with open(DB_PATH, 'rb') as f_in:
-            with gzip.open(backup_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
+        if not verify_backup(backup_path, checksum):
+            logger.error(f"Контрольная сумма резервной копии не совпадает: {backup_path}")
+            os.remove(backup_path)
+            return None
         
         # Сохраняем статистику
-        if stats:
-            stats_path = os.path.join(BACKUP_DIR, f"bot_db_stats_{timestamp}.json")
-            with open(stats_path, 'w') as f:
-                json.dump(stats, f, indent=2)
+        stats = stats or {}
+        stats["sha256"] = checksum
+        stats_path = os.path.join(BACKUP_DIR, f"bot_db_stats_{timestamp}.json")
+        with open(stats_path, 'w') as f:
+            json.dump(stats, f, indent=2)
         
         logger.info(f"Создана резервная копия базы данных: {backup_path}")
         
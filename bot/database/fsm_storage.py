@@ -0,0 +1,294 @@
+"""
+Модуль для хранения состояний FSM в базе данных.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, insert, select
+
+from bot.database.setup import async_session
+from bot.models import FSMRecord
+from config import FSM_STORAGE, FSM_CACHE_SIZE, FSM_CACHE_TTL, FSM_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class DatabaseStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в таблице fsm_storage.
+
+    Чтение выполняется из LRU-кэша в памяти, обращение к базе данных происходит
+    только при промахе кэша. Запись попадает в кэш и в буфер измененных ключей,
+    который периодически сбрасывается в базу данных одной транзакцией, поэтому
+    несколько изменений состояния одного пользователя объединяются в одну запись.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = FSM_CACHE_SIZE,
+        cache_ttl: float = FSM_CACHE_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        """
+        Инициализирует хранилище
+
+        Args:
+            cache_size: Максимальное количество ключей в кэше
+            cache_ttl: Время жизни записи в кэше в секундах (0 - без ограничения).
+                При работе нескольких процессов ограничивает время, в течение
+                которого процесс может видеть устаревшее состояние
+            flush_interval: Интервал сброса изменений в базу данных в секундах
+            key_builder: Построитель строковых ключей
+        """
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        # {key: (state, data, loaded_at)}
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Dict[str, Any], float]]" = OrderedDict()
+        # Измененные, но еще не записанные в базу данных ключи: {key: (state, data)}
+        self._dirty: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        # Изменения, которые записываются в базу данных в данный момент
+        self._flushing: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Возвращает состояние и данные по ключу, при необходимости загружая их из базы данных
+
+        Args:
+            key: Строковый ключ хранилища
+
+        Returns:
+            Tuple[Optional[str], Dict[str, Any]]: Состояние и данные
+        """
+        # Несохраненные изменения всегда актуальнее, чем запись в базе данных
+        pending = self._dirty.get(key) or self._flushing.get(key)
+        if pending is not None:
+            state, data = pending
+            self._remember(key, state, data)
+            return state, data
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            state, data, loaded_at = cached
+            if not self.cache_ttl or time.monotonic() - loaded_at < self.cache_ttl:
+                self._cache.move_to_end(key)
+                return state, data
+
+        async with async_session() as session:
+            result = await session.execute(
+                select(FSMRecord.state, FSMRecord.data).where(FSMRecord.key == key)
+            )
+            row = result.first()
+
+        state, data = None, {}
+        if row:
+            state = row.state
+            if row.data:
+                try:
+                    data = json.loads(row.data)
+                except ValueError:
+                    logger.error(f"Не удалось разобрать данные FSM для ключа {key}")
+
+        self._remember(key, state, data)
+        return state, data
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Помещает запись в кэш и вытесняет самые старые записи"""
+        self._cache[key] = (state, data, time.monotonic())
+        self._cache.move_to_end(key)
+
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _mark_dirty(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Помечает ключ как измененный и запускает фоновый сброс изменений"""
+        self._remember(key, state, data)
+        self._dirty[key] = (state, data)
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Периодически сбрасывает изменения в базу данных, пока они есть"""
+        while self._dirty and not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении состояний FSM: {e}")
+
+    @staticmethod
+    def _serialize(
+        pending: Dict[str, Tuple[Optional[str], Dict[str, Any]]]
+    ) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, Tuple[Optional[str], Dict[str, Any]]]]:
+        """
+        Готовит изменения к записи в базу данных
+
+        set_data() не принимает данные, которые нельзя сохранить в JSON, но
+        вложенные объекты могут быть изменены после вызова. Такие ключи не
+        записываются и остаются в буфере, чтобы запись в базе данных не
+        вернула пользователю прежнее состояние; остальные изменения
+        сохраняются как обычно.
+
+        Args:
+            pending: Изменения {key: (state, data)}
+
+        Returns:
+            Tuple: Записываемые ключи, строки для вставки и несохраненные изменения
+        """
+        now = datetime.utcnow()
+        keys, rows, failed = [], [], {}
+        for key, (state, data) in pending.items():
+            try:
+                serialized = json.dumps(data, ensure_ascii=False) if data else None
+            except (TypeError, ValueError) as e:
+                logger.error(f"Данные FSM для ключа {key} не сохранены: они не сериализуются в JSON ({e})")
+                failed[key] = (state, data)
+                continue
+
+            keys.append(key)
+            # Пустые записи не храним, достаточно удалить старые
+            if state is not None or data:
+                rows.append({"key": key, "state": state, "data": serialized, "updated_at": now})
+        return keys, rows, failed
+
+    async def flush(self) -> int:
+        """
+        Записывает все накопленные изменения в базу данных одной транзакцией
+
+        Если запись не удалась, изменения возвращаются в буфер и записываются
+        при следующем сбросе.
+
+        Returns:
+            int: Количество записанных ключей
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+
+            pending, self._dirty = self._dirty, {}
+            self._flushing = pending
+
+            try:
+                keys, rows, failed = self._serialize(pending)
+                async with async_session() as session:
+                    await session.execute(
+                        delete(FSMRecord).where(FSMRecord.key.in_(keys))
+                    )
+                    if rows:
+                        await session.execute(insert(FSMRecord), rows)
+                    await session.commit()
+            except Exception:
+                # Возвращаем изменения в буфер, если за это время ключ не был изменен снова
+                for key, value in pending.items():
+                    self._dirty.setdefault(key, value)
+                raise
+            finally:
+                self._flushing = {}
+
+            for key, value in failed.items():
+                self._dirty.setdefault(key, value)
+
+            logger.debug(f"Сохранено {len(keys)} состояний FSM")
+            return len(keys)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        """
+        Устанавливает состояние для ключа
+
+        Args:
+            key: Ключ хранилища
+            state: Новое состояние
+        """
+        storage_key = self.key_builder.build(key)
+        _, data = await self._load(storage_key)
+        self._mark_dirty(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        """
+        Возвращает состояние для ключа
+
+        Args:
+            key: Ключ хранилища
+
+        Returns:
+            Optional[str]: Текущее состояние
+        """
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        """
+        Заменяет данные для ключа
+
+        Args:
+            key: Ключ хранилища
+            data: Новые данные
+
+        Raises:
+            TypeError: Данные нельзя сохранить в JSON
+        """
+        try:
+            json.dumps(data, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            raise TypeError(f"Данные FSM должны сериализоваться в JSON: {e}") from e
+
+        storage_key = self.key_builder.build(key)
+        state, _ = await self._load(storage_key)
+        self._mark_dirty(storage_key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        """
+        Возвращает данные для ключа
+
+        Args:
+            key: Ключ хранилища
+
+        Returns:
+            Dict[str, Any]: Копия текущих данных
+        """
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    async def close(self) -> None:
+        """Сбрасывает накопленные изменения и останавливает фоновую задачу"""
+        self._closed = True
+
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении состояний FSM при закрытии хранилища: {e}")
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    Создает хранилище состояний FSM в соответствии с настройкой FSM_STORAGE
+
+    Returns:
+        BaseStorage: Хранилище состояний
+    """
+    if FSM_STORAGE == "memory":
+        logger.info("Используется хранилище состояний FSM в памяти")
+        return MemoryStorage()
+
+    logger.info("Используется хранилище состояний FSM в базе данных")
+    return DatabaseStorage()
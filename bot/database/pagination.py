@@ -0,0 +1,59 @@
+"""
+Модуль для постраничного вывода списков с пагинацией по ключу.
+
+Страница выбирается условием на ключ крайней записи предыдущей страницы,
+а не через OFFSET, поэтому стоимость запроса не зависит от номера страницы
+при наличии индекса по столбцам ключа.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+def _beyond(columns: Sequence[Any], cursor: Sequence[Any], newer: bool):
+    """
+    Создает условие "ключ записи дальше курсора" для составного ключа
+
+    (a, b) > (x, y) раскрывается в a > x OR (a = x AND b > y).
+    """
+    column, value = columns[0], cursor[0]
+    strict = column > value if newer else column < value
+    if len(columns) == 1:
+        return strict
+    return or_(strict, and_(column == value, _beyond(columns[1:], cursor[1:], newer)))
+
+def keyset_page(
+    query,
+    columns: Sequence[Any],
+    cursor: Optional[Sequence[Any]],
+    direction: str,
+    limit: int
+) -> Tuple[List[Any], bool, bool]:
+    """
+    Получает страницу записей, начиная с наибольших значений ключа.
+
+    Args:
+        query: Запрос с фильтрами списка
+        columns: Столбцы ключа, например (created_at, id)
+        cursor: Значения ключа крайней записи текущей страницы (None - первая страница)
+        direction: "next" - записи с меньшим ключом, "prev" - с большим
+        limit: Размер страницы
+
+    Returns:
+        Tuple[List[Any], bool, bool]: Записи страницы в порядке убывания ключа,
+            есть ли записи с большим ключом и есть ли записи с меньшим ключом
+    """
+    newer = direction == "prev"
+    if cursor is not None:
+        query = query.filter(_beyond(columns, cursor, newer))
+    query = query.order_by(*[column.asc() if newer else column.desc() for column in columns])
+
+    # Лишняя запись показывает, есть ли следующая страница в этом направлении
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if newer:
+        rows.reverse()
+        return rows, has_more, True
+
+    return rows, cursor is not None, has_more
@@ -0,0 +1,166 @@
+"""
+Модуль для подсчета SQL-запросов и поиска проблемы N+1.
+
+Счетчик подключается через install_query_counter() и после этого учитывает
+запросы внутри каждого обработчика и задачи, отслеживаемых метриками.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from bot.database.setup import engine, async_engine
+from bot.utils.metrics import metrics
+from config import QUERY_REPEAT_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров и числовые литералы не влияют на форму запроса
+_IN_LIST_RE = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACES_RE = re.compile(r"\s+")
+
+_installed_engines: List[Engine] = []
+
+class QueryStats:
+    """Статистика запросов в рамках одного обработчика или задачи"""
+
+    __slots__ = ("kind", "name", "count", "duration", "shapes", "parent")
+
+    def __init__(self, kind: str, name: str, parent: Optional["QueryStats"] = None):
+        self.kind = kind
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        self.parent = parent
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD) -> List[tuple]:
+        """
+        Возвращает формы запросов, повторившиеся не менее threshold раз
+
+        Args:
+            threshold: Минимальное количество повторов
+
+        Returns:
+            List[tuple]: Список пар (форма запроса, количество)
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def statement_shape(statement: str) -> str:
+    """
+    Приводит запрос к форме, не зависящей от значений параметров
+
+    Args:
+        statement: Текст SQL-запроса
+
+    Returns:
+        str: Нормализованный текст запроса
+    """
+    shape = _SPACES_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _NUMBER_RE.sub("N", shape)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Запоминает время начала запроса"""
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Учитывает выполненный запрос в статистике текущего обработчика"""
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    stats = _current_stats.get()
+    if stats is None:
+        return
+
+    stats.count += 1
+    stats.duration += duration
+    stats.shapes[statement_shape(statement)] += 1
+
+@contextmanager
+def query_scope(kind: str, name: str) -> Iterator[QueryStats]:
+    """
+    Собирает статистику запросов, выполненных внутри блока
+
+    По завершении блока количество запросов и время работы с базой данных
+    добавляются в метрики, а повторяющиеся запросы записываются в лог.
+
+    Args:
+        kind: Тип операции (handler или job)
+        name: Имя обработчика или задачи
+
+    Yields:
+        QueryStats: Статистика запросов
+    """
+    parent = _current_stats.get()
+    stats = QueryStats(kind, name, parent)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        _report(stats)
+
+def _report(stats: QueryStats) -> None:
+    """Добавляет статистику в метрики и предупреждает о проблеме N+1"""
+    labels = {stats.kind: stats.name}
+    metrics.inc(f"bot_{stats.kind}_db_statements_total", stats.count, **labels)
+    metrics.inc(f"bot_{stats.kind}_db_seconds_total", stats.duration, **labels)
+
+    # Запросы вложенного обработчика учитываются и во внешнем
+    if stats.parent is not None:
+        stats.parent.count += stats.count
+        stats.parent.duration += stats.duration
+
+    repeated = stats.repeated()
+    if repeated:
+        metrics.inc(f"bot_{stats.kind}_n_plus_one_total", **labels)
+        shape, count = repeated[0]
+        logger.warning(
+            "Возможная проблема N+1 в %s '%s': %d запросов за %.3f сек, запрос повторен %d раз: %s",
+            stats.kind, stats.name, stats.count, stats.duration, count, _shorten(shape),
+            extra={
+                "query_kind": stats.kind,
+                "query_owner": stats.name,
+                "statements": stats.count,
+                "repeated_statements": count
+            }
+        )
+
+def _shorten(shape: str, limit: int = 300) -> str:
+    """Сокращает длинный запрос, сохраняя начало и условия в конце"""
+    if len(shape) <= limit:
+        return shape
+    half = limit // 2
+    return f"{shape[:half]} ... {shape[-half:]}"
+
+def install_query_counter(engines: Optional[List[Engine]] = None) -> None:
+    """
+    Подключает подсчет запросов к движкам базы данных
+
+    Args:
+        engines: Синхронные движки (по умолчанию основной и асинхронный движки бота)
+    """
+    if engines is None:
+        engines = [engine, async_engine.sync_engine]
+
+    for target in engines:
+        if target in _installed_engines:
+            continue
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        _installed_engines.append(target)
+
+    metrics.add_scope_hook(query_scope)
+    logger.info("Включен подсчет SQL-запросов для обработчиков и задач")
@@ -12,17 +12,19 @@ from aiogram import types
 from bot.handlers.user_handlers import (
     start_command, show_main_menu, profile_menu, settings_menu,
     select_categories, toggle_category, select_cities, toggle_city,
-    edit_phone, save_phone, my_requests, show_request,
+    edit_phone, save_phone, my_requests, filter_my_requests, my_requests_page, show_request,
     accept_request, reject_request, show_admin_message,
     select_subcategories, handle_subcategory_selection,
-    UserStates
+    UserStates, REQUEST_FILTER_BUTTONS
 )
 from bot.handlers.admin_handlers_aiogram import (
     admin_command, show_admin_menu, exit_admin_panel,
     admin_categories, admin_add_category, admin_save_category, admin_toggle_category,
     admin_cities, admin_add_city, admin_save_city, admin_toggle_city,
-    admin_demo_generation, admin_generate_demo_request, admin_stats, admin_demo_stats,
-    create_test_data, AdminStates, is_admin
+    admin_demo_generation, admin_generate_demo_request, admin_stats, admin_demo_stats, admin_metrics, admin_jobs,
+    admin_users, admin_users_page, admin_requests, admin_requests_page,
+    create_test_data, AdminStates, is_admin,
+    ADMIN_USER_FILTER_BUTTONS, ADMIN_REQUEST_FILTER_BUTTONS
 )
 from bot.handlers.help_handlers import help_command
 from bot.handlers.error_handlers import register_error_handlers
@@ -40,6 +42,10 @@ def setup_handlers() -> Router:
     router.message.register(show_main_menu, Command("menu"))
     router.message.register(help_command, Command("help"))
     router.message.register(admin_command, Command("admin"))
+    router.message.register(admin_metrics, Command("metrics"))
+    router.message.register(admin_jobs, Command("jobs"))
+    router.message.register(admin_users, Command("users"))
+    router.message.register(admin_requests, Command("requests"))
     
     # Обработчики для главного меню
     router.message.register(profile_menu, F.text == "👤 Мой профиль", StateFilter(UserStates.MAIN_MENU))
@@ -70,6 +76,8 @@ def setup_handlers() -> Router:
     
     # Обработчики для меню заявок
     router.message.register(show_main_menu, F.text == "🔙 Вернуться в главное меню", StateFilter(UserStates.MY_REQUESTS))
+    router.message.register(filter_my_requests, F.text.in_(REQUEST_FILTER_BUTTONS), StateFilter(UserStates.MY_REQUESTS))
+    router.callback_query.register(my_requests_page, F.data.startswith("inbox:"))
     
     # Обработчики для меню настроек
     router.message.register(show_main_menu, F.text == "🔙 Вернуться в главное меню", StateFilter(UserStates.SETTINGS_MENU))
@@ -78,6 +86,8 @@ def setup_handlers() -> Router:
     router.message.register(show_admin_menu, F.text == "🏠 Главное меню", StateFilter(AdminStates.MAIN_MENU))
     router.message.register(admin_categories, F.text == "🔧 Категории", StateFilter(AdminStates.MAIN_MENU))
     router.message.register(admin_cities, F.text == "🏙️ Города", StateFilter(AdminStates.MAIN_MENU))
+    router.message.register(admin_users, F.text == "👥 Пользователи", StateFilter(AdminStates.MAIN_MENU))
+    router.message.register(admin_requests, F.text == "📋 Заявки", StateFilter(AdminStates.MAIN_MENU))
     router.message.register(admin_demo_generation, F.text == "🤖 Демо-режим", StateFilter(AdminStates.MAIN_MENU))
     router.message.register(admin_stats, F.text == "📊 Статистика", StateFilter(AdminStates.MAIN_MENU))
     router.message.register(create_test_data, F.text == "🧪 Создать тестовые данные", StateFilter(AdminStates.MAIN_MENU))
@@ -88,6 +98,14 @@ def setup_handlers() -> Router:
     router.message.register(admin_toggle_category, F.text.startswith(("✅", "❌")), StateFilter(AdminStates.CATEGORIES))
     router.message.register(show_admin_menu, F.text == "🔙 Назад", StateFilter(AdminStates.CATEGORIES))
     
+    # Обработчики для списков пользователей и заявок в админ-панели
+    router.message.register(admin_users, F.text.in_(ADMIN_USER_FILTER_BUTTONS), StateFilter(AdminStates.USERS))
+    router.message.register(show_admin_menu, F.text == "🔙 Назад в админ-меню", StateFilter(AdminStates.USERS))
+    router.message.register(admin_requests, F.text.in_(ADMIN_REQUEST_FILTER_BUTTONS), StateFilter(AdminStates.REQUESTS))
+    router.message.register(show_admin_menu, F.text == "🔙 Назад в админ-меню", StateFilter(AdminStates.REQUESTS))
+    router.callback_query.register(admin_users_page, F.data.startswith("adm_users:"))
+    router.callback_query.register(admin_requests_page, F.data.startswith("adm_reqs:"))
+    
     # Обработчики для добавления категории в админ-панели
     router.message.register(admin_save_category, StateFilter(AdminStates.ADD_CATEGORY))
     router.message.register(show_admin_menu, F.text == "🔙 Отмена", StateFilter(AdminStates.ADD_CATEGORY))
@@ -1,10 +1,11 @@
 import logging
+import re
 from typing import Dict, Any, List, Optional, Union, Callable
 from datetime import datetime
 from sqlalchemy import func
 
 from aiogram import types, Router, F
-from aiogram.filters import Command, CommandStart, StateFilter
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
@@ -13,9 +14,12 @@ from bot.database.setup import get_session
 from bot.models import User, Category, City, Request, Distribution, RequestStatus
 from bot.services.user_service import UserService
 from bot.services.request_service import RequestService
+from bot.services.reference_cache import reference_cache
+from bot.services.scheduler import job_summary
 from bot.utils import encrypt_personal_data, decrypt_personal_data, mask_phone_number
 from bot.utils.demo_generator import generate_demo_request, get_demo_info_message
-from config import ADMIN_IDS, DEFAULT_CATEGORIES, DEFAULT_CITIES
+from bot.utils.metrics import metrics
+from config import ADMIN_IDS, DEFAULT_CATEGORIES, DEFAULT_CITIES, TOP_USERS_LIMIT
 from bot.handlers.user_handlers import show_main_menu
 
 logger = logging.getLogger(__name__)
@@ -137,27 +141,17 @@ async def exit_admin_panel(message: types.Message, state: FSMContext) -> None:
 async def admin_categories(message: types.Message, state: FSMContext) -> None:
     """Показывает список категорий с возможностью управления"""
     try:
-        with get_session() as session:
-            categories = session.query(Category).all()
-            
-            keyboard = []
-            for category in categories:
-                status = "✅" if category.is_active else "❌"
-                keyboard.append([KeyboardButton(text=f"{status} {category.name}")])
-            
-            keyboard.append([KeyboardButton(text="➕ Добавить категорию")])
-            keyboard.append([KeyboardButton(text="🔙 Назад в админ-меню")])
-            
-            reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
-            
-            await message.answer(
-                "Управление категориями услуг:\n"
-                "✅ - активна, ❌ - неактивна\n\n"
-                "Нажмите на категорию для изменения статуса или добавьте новую.",
-                reply_markup=reply_markup
-            )
-            
-            await state.set_state(AdminStates.CATEGORIES)
+        # Клавиатура со списком категорий берется из кэша справочников
+        reply_markup = reference_cache.admin_keyboard("categories")
+        
+        await message.answer(
+            "Управление категориями услуг:\n"
+            "✅ - активна, ❌ - неактивна\n\n"
+            "Нажмите на категорию для изменения статуса или добавьте новую.",
+            reply_markup=reply_markup
+        )
+        
+        await state.set_state(AdminStates.CATEGORIES)
     except Exception as e:
         logger.error(f"Ошибка в admin_categories: {e}")
         await message.answer("Произошла ошибка при загрузке категорий. Пожалуйста, попробуйте позже.")
@@ -201,6 +195,7 @@ async def admin_save_category(message: types.Message, state: FSMContext) -> None
                 new_category = Category(name=category_name, is_active=True)
                 session.add(new_category)
                 session.commit()
+                reference_cache.invalidate()
                 await message.answer(f"Категория '{category_name}' успешно добавлена.")
             
             # Возвращаемся к списку категорий
@@ -234,6 +229,7 @@ async def admin_toggle_category(message: types.Message, state: FSMContext) -> No
                     # Переключаем статус
                     category.is_active = not category.is_active
                     session.commit()
+                    reference_cache.invalidate()
                     
                     status = "активирована" if category.is_active else "деактивирована"
                     await message.answer(f"Категория '{category_name}' {status}.")
@@ -250,27 +246,17 @@ async def admin_toggle_category(message: types.Message, state: FSMContext) -> No
 # Обработчик раздела городов
 async def admin_cities(message: types.Message, state: FSMContext) -> None:
     """Показывает список городов с возможностью управления"""
-    with get_session() as session:
-        cities = session.query(City).all()
-        
-        keyboard = []
-        for city in cities:
-            status = "✅" if city.is_active else "❌"
-            keyboard.append([KeyboardButton(text=f"{status} {city.name}")])
-        
-        keyboard.append([KeyboardButton(text="➕ Добавить город")])
-        keyboard.append([KeyboardButton(text="🔙 Назад в админ-меню")])
-        
-        reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
-        
-        await message.answer(
-            "Управление городами:\n"
-            "✅ - активен, ❌ - неактивен\n\n"
-            "Нажмите на город для изменения статуса или добавьте новый.",
-            reply_markup=reply_markup
-        )
-        
-        await state.set_state(AdminStates.CITIES)
+    # Клавиатура со списком городов берется из кэша справочников
+    reply_markup = reference_cache.admin_keyboard("cities")
+    
+    await message.answer(
+        "Управление городами:\n"
+        "✅ - активен, ❌ - неактивен\n\n"
+        "Нажмите на город для изменения статуса или добавьте новый.",
+        reply_markup=reply_markup
+    )
+    
+    await state.set_state(AdminStates.CITIES)
 
 # Обработчик добавления нового города
 async def admin_add_city(message: types.Message, state: FSMContext) -> None:
@@ -304,6 +290,7 @@ async def admin_save_city(message: types.Message, state: FSMContext) -> None:
             new_city = City(name=city_name, is_active=True)
             session.add(new_city)
             session.commit()
+            reference_cache.invalidate()
             await message.answer(f"Город '{city_name}' успешно добавлен.")
         
         # Возвращаемся к списку городов
@@ -332,6 +319,7 @@ async def admin_toggle_city(message: types.Message, state: FSMContext) -> None:
                 # Переключаем статус
                 city.is_active = not city.is_active
                 session.commit()
+                reference_cache.invalidate()
                 
                 status = "активирован" if city.is_active else "деактивирован"
                 await message.answer(f"Город '{city_name}' {status}.")
@@ -515,6 +503,353 @@ async def admin_demo_stats(message: types.Message, state: FSMContext) -> None:
         await message.answer("Произошла ошибка при получении статистики демо-заявок.")
         await show_admin_menu(message, state)
 
+# Фильтры, передаваемые в callback_data списков админ-панели (в указанном порядке)
+USER_LIST_FILTERS = ("active", "category", "city")
+REQUEST_LIST_FILTERS = ("status", "category", "city")
+
+# Кнопки фильтров списка пользователей
+ADMIN_USER_FILTER_BUTTONS = {
+    "👥 Все пользователи": {},
+    "✅ Активные": {"active": True},
+    "❌ Неактивные": {"active": False}
+}
+
+# Кнопки фильтров списка заявок
+ADMIN_REQUEST_FILTER_BUTTONS = {
+    "📋 Все заявки": {},
+    "🆕 Новые": {"status": RequestStatus.NEW},
+    "🔄 В работе": {"status": RequestStatus.IN_PROGRESS},
+    "🏁 Завершенные": {"status": RequestStatus.COMPLETED}
+}
+
+REQUEST_STATUS_EMOJI = {
+    RequestStatus.NEW: "🆕",
+    RequestStatus.ACTUAL: "✅",
+    RequestStatus.NOT_ACTUAL: "❌",
+    RequestStatus.IN_PROGRESS: "🔄",
+    RequestStatus.MEASUREMENT: "📏",
+    RequestStatus.CLIENT_REJECTED: "🚫",
+    RequestStatus.COMPLETED: "🏁",
+    RequestStatus.PENDING: "⏳",
+    RequestStatus.DISTRIBUTING: "📤",
+    RequestStatus.CANCELLED: "🗑",
+    RequestStatus.EXPIRED: "⏰"
+}
+
+# Аргументы команды: слово или параметр вида key=значение (значение может содержать пробелы)
+_FILTER_ARG_RE = re.compile(r"\w+=.+?(?=\s+\w+=|$)|\S+")
+
+def _parse_list_filters(args: Optional[str]) -> Dict[str, Any]:
+    """
+    Разбирает фильтры списка из аргументов команды.
+    
+    Поддерживаются слова active и inactive и параметры status=, category=
+    и city= (категория и город задаются названием или ID), например:
+    /requests status=новая city=Москва
+    
+    Returns:
+        Dict[str, Any]: Фильтры (active, status, category, city)
+        
+    Raises:
+        ValueError: Если фильтр неизвестен или значение не найдено
+    """
+    filters: Dict[str, Any] = {}
+    if not args:
+        return filters
+    
+    for argument in _FILTER_ARG_RE.findall(args.strip()):
+        key, _, value = argument.partition("=")
+        key, value = key.lower(), value.strip()
+        
+        if key in ("active", "inactive") and not value:
+            filters["active"] = key == "active"
+        elif key == "status":
+            status = next(
+                (item for item in RequestStatus if value.lower() in (item.name.lower(), item.value)),
+                None
+            )
+            if status is None:
+                raise ValueError(f"Неизвестный статус: {value}")
+            filters["status"] = status
+        elif key in ("category", "city"):
+            items = reference_cache.categories(active_only=False) if key == "category" \
+                else reference_cache.cities(active_only=False)
+            item_id = next(
+                (item.id for item in items
+                 if str(item.id) == value or item.name.casefold() == value.casefold()),
+                None
+            )
+            if item_id is None:
+                raise ValueError(f"Не найдено значение фильтра {key}: {value}")
+            filters[key] = item_id
+        else:
+            raise ValueError(f"Неизвестный фильтр: {argument}")
+    
+    return filters
+
+def _encode_list_filters(filters: Dict[str, Any], keys: tuple) -> str:
+    """Кодирует фильтры списка для callback_data"""
+    values = []
+    for key in keys:
+        value = filters.get(key)
+        if value is None:
+            values.append("")
+        elif isinstance(value, bool):
+            values.append("1" if value else "0")
+        elif isinstance(value, RequestStatus):
+            values.append(value.name.lower())
+        else:
+            values.append(str(value))
+    return ":".join(values)
+
+def _decode_list_filters(values: List[str], keys: tuple) -> Dict[str, Any]:
+    """Декодирует фильтры списка из callback_data"""
+    filters: Dict[str, Any] = {}
+    for key, value in zip(keys, values):
+        if not value:
+            continue
+        if key == "active":
+            filters[key] = value == "1"
+        elif key == "status":
+            filters[key] = RequestStatus[value.upper()]
+        else:
+            filters[key] = int(value)
+    return filters
+
+def _describe_list_filters(filters: Dict[str, Any]) -> str:
+    """Формирует описание примененных фильтров"""
+    names = {
+        "category": {item.id: item.name for item in reference_cache.categories(active_only=False)},
+        "city": {item.id: item.name for item in reference_cache.cities(active_only=False)}
+    }
+    parts = []
+    if "active" in filters:
+        parts.append("активные" if filters["active"] else "неактивные")
+    if "status" in filters:
+        parts.append(f"статус {filters['status'].value}")
+    if "category" in filters:
+        parts.append(f"категория {names['category'].get(filters['category'])}")
+    if "city" in filters:
+        parts.append(f"город {names['city'].get(filters['city'])}")
+    return ", ".join(parts)
+
+def _encode_request_cursor(request: Request) -> str:
+    """Кодирует ключ (created_at, id) заявки для callback_data"""
+    return f"{request.created_at:%Y%m%d%H%M%S%f}:{request.id}"
+
+def _decode_request_cursor(value: str) -> tuple:
+    """Декодирует ключ (created_at, id) заявки из callback_data"""
+    created_at, request_id = value.split(":")
+    return datetime.strptime(created_at, "%Y%m%d%H%M%S%f"), int(request_id)
+
+def _page_navigation(prefix: str, has_prev: bool, has_next: bool,
+                     first_cursor: str, last_cursor: str) -> InlineKeyboardMarkup:
+    """Формирует инлайн-клавиатуру для перехода между страницами списка"""
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"{prefix}:prev:{first_cursor}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Далее ➡️", callback_data=f"{prefix}:next:{last_cursor}"))
+    return InlineKeyboardMarkup(inline_keyboard=[navigation] if navigation else [])
+
+def _render_users_page(session, filters: Dict[str, Any], cursor: Optional[int] = None,
+                       direction: str = "next") -> tuple:
+    """
+    Формирует текст и инлайн-клавиатуру страницы списка пользователей
+    
+    Returns:
+        tuple: Текст сообщения и инлайн-клавиатура (None, если пользователей нет)
+    """
+    user_service = UserService(session)
+    query_filters = {
+        "is_active": filters.get("active"),
+        "category_id": filters.get("category"),
+        "city_id": filters.get("city")
+    }
+    users, has_prev, has_next = user_service.get_users_page(cursor=cursor, direction=direction, **query_filters)
+    total = user_service.count_users(**query_filters)
+    
+    description = _describe_list_filters(filters)
+    users_text = f"👥 Пользователи ({total})\n" + (f"Фильтр: {description}\n" if description else "") + "\n"
+    if not users:
+        return users_text + "Пользователи не найдены.", None
+    
+    for user in users:
+        admin_mark = "👑 " if user.is_admin else ""
+        active_mark = "✅ " if user.is_active else "❌ "
+        name = f"{user.first_name or ''} {user.last_name or ''}".strip() or "Без имени"
+        users_text += f"{admin_mark}{active_mark}{name} (@{user.username or 'нет'}), ID {user.telegram_id}\n"
+    
+    prefix = f"adm_users:{_encode_list_filters(filters, USER_LIST_FILTERS)}"
+    return users_text, _page_navigation(prefix, has_prev, has_next, str(users[0].id), str(users[-1].id))
+
+async def _render_requests_page(session, filters: Dict[str, Any], cursor: Optional[tuple] = None,
+                                direction: str = "next") -> tuple:
+    """
+    Формирует текст и инлайн-клавиатуру страницы списка заявок
+    
+    Returns:
+        tuple: Текст сообщения и инлайн-клавиатура (None, если заявок нет)
+    """
+    request_service = RequestService(session)
+    query_filters = {
+        "status": filters.get("status"),
+        "category_id": filters.get("category"),
+        "city_id": filters.get("city")
+    }
+    requests, has_prev, has_next = await request_service.get_requests_page(
+        cursor=cursor, direction=direction, **query_filters
+    )
+    total = request_service.count_requests(**query_filters)
+    
+    description = _describe_list_filters(filters)
+    requests_text = f"📋 Заявки ({total})\n" + (f"Фильтр: {description}\n" if description else "") + "\n"
+    if not requests:
+        return requests_text + "Заявки не найдены.", None
+    
+    for request in requests:
+        status_emoji = REQUEST_STATUS_EMOJI.get(request.status, "❓")
+        demo_mark = "🎲 " if request.is_demo else ""
+        requests_text += (
+            f"{demo_mark}{status_emoji} #{request.id} от {request.created_at.strftime('%d.%m.%Y %H:%M')}, "
+            f"{request.category.name if request.category else 'без категории'}, "
+            f"{request.city.name if request.city else 'без города'}\n"
+        )
+    
+    prefix = f"adm_reqs:{_encode_list_filters(filters, REQUEST_LIST_FILTERS)}"
+    return requests_text, _page_navigation(
+        prefix, has_prev, has_next,
+        _encode_request_cursor(requests[0]), _encode_request_cursor(requests[-1])
+    )
+
+# Обработчик раздела пользователей
+async def admin_users(message: types.Message, state: FSMContext, command: Optional[CommandObject] = None) -> None:
+    """Показывает первую страницу списка пользователей (команда /users принимает фильтры)"""
+    try:
+        if not await is_admin(message.from_user.id):
+            await message.answer("У вас нет прав для доступа к административной панели.")
+            return
+        
+        keyboard = ReplyKeyboardMarkup(
+            keyboard=[
+                [KeyboardButton(text=text) for text in ADMIN_USER_FILTER_BUTTONS],
+                [KeyboardButton(text="🔙 Назад в админ-меню")]
+            ],
+            resize_keyboard=True
+        )
+        
+        with get_session() as session:
+            if command is not None:
+                try:
+                    filters = _parse_list_filters(command.args)
+                except ValueError as e:
+                    await message.answer(
+                        f"{e}\n\nПример: /users active city=Москва category=Электрика"
+                    )
+                    return
+            else:
+                filters = ADMIN_USER_FILTER_BUTTONS.get(message.text, {})
+            
+            users_text, inline_markup = _render_users_page(session, filters)
+        
+        await state.set_state(AdminStates.USERS)
+        await message.answer(
+            "Фильтры: кнопки ниже или /users active|inactive city=<город> category=<категория>",
+            reply_markup=keyboard
+        )
+        await message.answer(users_text, reply_markup=inline_markup)
+    except Exception as e:
+        logger.error(f"Ошибка в admin_users: {e}")
+        await message.answer("Произошла ошибка при загрузке пользователей. Пожалуйста, попробуйте позже.")
+
+async def admin_users_page(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """Переключает страницу списка пользователей"""
+    try:
+        if not await is_admin(callback.from_user.id):
+            await callback.answer("Недостаточно прав")
+            return
+        
+        # Формат callback_data: adm_users:<active>:<category>:<city>:<next|prev>:<id>
+        _, *filter_values, direction, cursor = callback.data.split(":")
+        filters = _decode_list_filters(filter_values, USER_LIST_FILTERS)
+        
+        with get_session() as session:
+            users_text, inline_markup = _render_users_page(session, filters, int(cursor), direction)
+        
+        if inline_markup is None:
+            await callback.answer("Больше пользователей нет")
+            return
+        
+        await callback.message.edit_text(users_text, reply_markup=inline_markup)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка в admin_users_page: {e}")
+        await callback.answer("Произошла ошибка при загрузке пользователей.")
+
+# Обработчик раздела заявок
+async def admin_requests(message: types.Message, state: FSMContext, command: Optional[CommandObject] = None) -> None:
+    """Показывает первую страницу списка заявок (команда /requests принимает фильтры)"""
+    try:
+        if not await is_admin(message.from_user.id):
+            await message.answer("У вас нет прав для доступа к административной панели.")
+            return
+        
+        buttons = [KeyboardButton(text=text) for text in ADMIN_REQUEST_FILTER_BUTTONS]
+        keyboard = ReplyKeyboardMarkup(
+            keyboard=[buttons[:2], buttons[2:], [KeyboardButton(text="🔙 Назад в админ-меню")]],
+            resize_keyboard=True
+        )
+        
+        with get_session() as session:
+            if command is not None:
+                try:
+                    filters = _parse_list_filters(command.args)
+                except ValueError as e:
+                    await message.answer(
+                        f"{e}\n\nПример: /requests status=новая city=Москва category=Электрика"
+                    )
+                    return
+            else:
+                filters = ADMIN_REQUEST_FILTER_BUTTONS.get(message.text, {})
+            
+            requests_text, inline_markup = await _render_requests_page(session, filters)
+        
+        await state.set_state(AdminStates.REQUESTS)
+        await message.answer(
+            "Фильтры: кнопки ниже или /requests status=<статус> city=<город> category=<категория>",
+            reply_markup=keyboard
+        )
+        await message.answer(requests_text, reply_markup=inline_markup)
+    except Exception as e:
+        logger.error(f"Ошибка в admin_requests: {e}")
+        await message.answer("Произошла ошибка при загрузке заявок. Пожалуйста, попробуйте позже.")
+
+async def admin_requests_page(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """Переключает страницу списка заявок"""
+    try:
+        if not await is_admin(callback.from_user.id):
+            await callback.answer("Недостаточно прав")
+            return
+        
+        # Формат callback_data: adm_reqs:<status>:<category>:<city>:<next|prev>:<created_at>:<id>
+        _, *filter_values, direction, created_at, request_id = callback.data.split(":")
+        filters = _decode_list_filters(filter_values, REQUEST_LIST_FILTERS)
+        
+        with get_session() as session:
+            requests_text, inline_markup = await _render_requests_page(
+                session, filters, _decode_request_cursor(f"{created_at}:{request_id}"), direction
+            )
+        
+        if inline_markup is None:
+            await callback.answer("Больше заявок нет")
+            return
+        
+        await callback.message.edit_text(requests_text, reply_markup=inline_markup)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка в admin_requests_page: {e}")
+        await callback.answer("Произошла ошибка при загрузке заявок.")
+
 # Обработчик раздела статистики
 async def admin_stats(message: types.Message, state: FSMContext) -> None:
     """Показывает статистику системы"""
@@ -524,6 +859,7 @@ async def admin_stats(message: types.Message, state: FSMContext) -> None:
             active_users = session.query(User).filter(User.is_active == True).count()
             total_requests = session.query(Request).count()
             total_distributions = session.query(Distribution).count()
+            top_users = UserService(session).get_top_users(limit=TOP_USERS_LIMIT)
             
             stats_text = (
                 "📊 *Статистика системы*\n\n"
@@ -533,6 +869,15 @@ async def admin_stats(message: types.Message, state: FSMContext) -> None:
                 f"📨 Всего распределений: {total_distributions}\n"
             )
             
+            if top_users:
+                stats_text += "\n🏆 *Лучшие исполнители*\n"
+                for place, (user, statistics) in enumerate(top_users, start=1):
+                    name = f"{user.first_name or ''} {user.last_name or ''}".strip() or user.username or str(user.telegram_id)
+                    stats_text += (
+                        f"{place}. {_escape_markdown(name)}: принято {statistics.successful_requests} "
+                        f"из {statistics.total_requests}, конверсия {statistics.conversion_rate:.0f}%\n"
+                    )
+            
             keyboard = ReplyKeyboardMarkup(
                 keyboard=[
                     [KeyboardButton(text="🔙 Назад в админ-меню")]
@@ -549,6 +894,74 @@ async def admin_stats(message: types.Message, state: FSMContext) -> None:
         await message.answer("Произошла ошибка при получении статистики.")
         await show_admin_menu(message, state)
 
+def _escape_markdown(text: str) -> str:
+    """Экранирует символы разметки Markdown в пользовательском тексте"""
+    return re.sub(r"([_*`\[])", r"\\\1", text)
+
+# Обработчик команды /metrics
+async def admin_metrics(message: types.Message, state: FSMContext) -> None:
+    """Показывает сводку по времени выполнения обработчиков и задач"""
+    try:
+        if not await is_admin(message.from_user.id):
+            await message.answer("У вас нет прав для просмотра метрик.")
+            return
+        
+        lines = []
+        for title, kind in (("Обработчики", "handler"), ("Задачи планировщика", "job")):
+            rows = metrics.summary(kind)
+            lines.append(f"{title}:")
+            if not rows:
+                lines.append("  нет данных")
+            for row in rows[:15]:
+                lines.append(
+                    f"  {row['name']}: {row['count']} вызовов, "
+                    f"ср. {row['avg'] * 1000:.0f} мс, p95 ≤ {row['p95'] * 1000:.0f} мс, "
+                    f"ошибок {row['errors']}, выполняется {row['in_progress']}"
+                    + (f", SQL {row['db_statements']:.1f}/вызов" if row['db_statements'] else "")
+                )
+            lines.append("")
+        
+        # Имена обработчиков содержат подчеркивания, поэтому выводим моноширинным блоком
+        await message.answer(
+            "📈 *Метрики*\n```\n" + "\n".join(lines).strip() + "\n```",
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка в admin_metrics: {e}")
+        await message.answer("Произошла ошибка при получении метрик.")
+
+# Обработчик команды /jobs
+async def admin_jobs(message: types.Message, state: FSMContext) -> None:
+    """Показывает время выполнения и задержку запуска задач планировщика"""
+    try:
+        if not await is_admin(message.from_user.id):
+            await message.answer("У вас нет прав для просмотра задач.")
+            return
+        
+        rows = job_summary()
+        lines = []
+        if not rows:
+            lines.append("Задачи еще не запускались на этом экземпляре")
+        for row in rows:
+            lines.append(f"{row['name']}{' (ведущий)' if row['leader'] else ''}:")
+            lines.append(
+                f"  {row['count']} запусков, ср. {row['avg']:.1f} с, p95 ≤ {row['p95']:.1f} с, "
+                f"выполняется {row['in_progress']}"
+            )
+            lines.append(
+                f"  задержка ср. {row['lag_avg']:.1f} с, p95 ≤ {row['lag_p95']:.1f} с; "
+                f"ошибок {row['errors']}, отменено по времени {row['timeouts']}, пропущено {row['skipped']}"
+            )
+        
+        # Имена задач содержат подчеркивания, поэтому выводим моноширинным блоком
+        await message.answer(
+            "⏱ *Задачи планировщика*\n```\n" + "\n".join(lines) + "\n```",
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка в admin_jobs: {e}")
+        await message.answer("Произошла ошибка при получении статистики задач.")
+
 # Функция для создания тестовых данных
 async def create_test_data(update: types.Message, state: FSMContext) -> None:
     """Создает тестовые данные (города и категории)"""
@@ -616,6 +1029,8 @@ async def create_test_data(update: types.Message, state: FSMContext) -> None:
             session.commit()
             logger.info(f"Создано {len(test_cities)} тестовых городов")
         
+        reference_cache.invalidate()
+        
         # Отправляем сообщение об успешном создании тестовых данных
         await update.answer(
             f"✅ Тестовые данные успешно созданы!\n\n"
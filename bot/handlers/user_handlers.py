@@ -1,6 +1,7 @@
+import asyncio
 import logging
 import re
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Set, Union
 from datetime import datetime
 from aiogram import types, Router, F
 from aiogram.filters import Command, CommandStart, StateFilter
@@ -14,6 +15,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models import User, Category, City, Request, Distribution, RequestStatus, DistributionStatus, SubCategory
 from bot.services.user_service import UserService
 from bot.services.request_service import RequestService
+from bot.services.reference_cache import reference_cache, SUBCATEGORY_TYPE_TITLES
+from bot.services.info_service import edit_revoked_offers, REVOKED_OFFER_TEXT
 from bot.utils import encrypt_personal_data, decrypt_personal_data, mask_phone_number
 from bot.utils.demo_generator import get_demo_info_message
 from config import ADMIN_IDS, DEFAULT_CATEGORIES, DEFAULT_CITIES
@@ -21,6 +24,9 @@ from bot.database.setup import get_session
 
 logger = logging.getLogger(__name__)
 
+# Фоновые задачи обработчиков: без ссылки задачу может удалить сборщик мусора до завершения
+_background_tasks: Set[asyncio.Task] = set()
+
 # Состояния для FSM
 class UserStates(StatesGroup):
     MAIN_MENU = State()
@@ -273,25 +279,9 @@ async def select_categories(update: types.Message, state: FSMContext) -> None:
             await state.set_state(UserStates.MAIN_MENU)
             return
         
-        # Получаем все категории
-        categories = session.query(Category).filter(Category.is_active == True).all()
-        
-        # Получаем категории пользователя
-        user_categories = db_user.categories
-        user_category_ids = [c.id for c in user_categories]
-        
-        # Создаем клавиатуру с категориями
-        keyboard = []
-        for category in categories:
-            # Добавляем маркер выбранной категории
-            status = "✅" if category.id in user_category_ids else "❌"
-            keyboard.append([f"{status} {category.name}"])
-        
-        # Добавляем кнопку "Готово"
-        keyboard.append(["✅ Готово"])
-        keyboard.append(["🔙 Вернуться в главное меню"])
-        
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        # Клавиатура с категориями строится по справочнику из кэша
+        user_category_ids = [c.id for c in db_user.categories]
+        reply_markup = reference_cache.selection_keyboard("categories", user_category_ids)
         
         # Текст с инструкцией
         message_text = (
@@ -351,13 +341,9 @@ async def toggle_category(update: types.Message, state: FSMContext) -> None:
             # Извлекаем название категории
             category_name = message_text[2:]  # Убираем маркер
             
-            # Находим категорию в БД
-            category = session.query(Category).filter(
-                and_(
-                    Category.name == category_name,
-                    Category.is_active == True
-                )
-            ).first()
+            # Находим категорию в справочнике
+            cached_category = reference_cache.find_category(category_name)
+            category = session.get(Category, cached_category.id) if cached_category else None
             
             if not category:
                 await update.answer(f"Категория '{category_name}' не найдена.")
@@ -378,6 +364,10 @@ async def toggle_category(update: types.Message, state: FSMContext) -> None:
             session.commit()
             
             # Обновляем клавиатуру
+            await update.answer(
+                f"Категория '{category.name}' {'удалена' if is_selected else 'добавлена'}.",
+                reply_markup=reference_cache.selection_keyboard("categories", [c.id for c in db_user.categories])
+            )
             await state.set_state(UserStates.SELECTING_CATEGORIES)
             return
         
@@ -408,25 +398,9 @@ async def select_cities(update: types.Message, state: FSMContext) -> None:
             await state.set_state(UserStates.MAIN_MENU)
             return
         
-        # Получаем все города
-        cities = session.query(City).filter(City.is_active == True).all()
-        
-        # Получаем города пользователя
-        user_cities = db_user.cities
-        user_city_ids = [c.id for c in user_cities]
-        
-        # Создаем клавиатуру с городами
-        keyboard = []
-        for city in cities:
-            # Добавляем маркер выбранного города
-            status = "✅" if city.id in user_city_ids else "❌"
-            keyboard.append([f"{status} {city.name}"])
-        
-        # Добавляем кнопку "Готово"
-        keyboard.append(["✅ Готово"])
-        keyboard.append(["🔙 Вернуться в главное меню"])
-        
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        # Клавиатура с городами строится по справочнику из кэша
+        user_city_ids = [c.id for c in db_user.cities]
+        reply_markup = reference_cache.selection_keyboard("cities", user_city_ids)
         
         # Текст с инструкцией
         message_text = (
@@ -486,13 +460,9 @@ async def toggle_city(update: types.Message, state: FSMContext) -> None:
             # Извлекаем название города
             city_name = message_text[2:]  # Убираем маркер
             
-            # Находим город в БД
-            city = session.query(City).filter(
-                and_(
-                    City.name == city_name,
-                    City.is_active == True
-                )
-            ).first()
+            # Находим город в справочнике
+            cached_city = reference_cache.find_city(city_name)
+            city = session.get(City, cached_city.id) if cached_city else None
             
             if not city:
                 await update.answer(f"Город '{city_name}' не найден.")
@@ -513,6 +483,10 @@ async def toggle_city(update: types.Message, state: FSMContext) -> None:
             session.commit()
             
             # Обновляем клавиатуру
+            await update.answer(
+                f"Город '{city.name}' {'удален' if is_selected else 'добавлен'}.",
+                reply_markup=reference_cache.selection_keyboard("cities", [c.id for c in db_user.cities])
+            )
             await state.set_state(UserStates.SELECTING_CITIES)
             return
         
@@ -612,53 +586,135 @@ async def save_phone(update: types.Message, state: FSMContext) -> None:
         )
         await state.set_state(UserStates.MAIN_MENU)
 
-async def my_requests(update: types.Message, state: FSMContext, filter_type: str = "all") -> None:
-    """Показывает список заявок пользователя"""
+# Фильтры раздела "Мои заявки": {фильтр: статус распределения}
+REQUEST_FILTERS = {
+    "all": None,
+    "new": DistributionStatus.PENDING,
+    "accepted": DistributionStatus.ACCEPTED,
+    "rejected": DistributionStatus.REJECTED
+}
+
+# Кнопки фильтров раздела "Мои заявки"
+REQUEST_FILTER_BUTTONS = {
+    "📋 Все заявки": "all",
+    "🆕 Новые": "new",
+    "✅ Принятые": "accepted",
+    "❌ Отклоненные": "rejected"
+}
+
+DISTRIBUTION_STATUS_EMOJI = {
+    DistributionStatus.PENDING: "📤",
+    DistributionStatus.ACCEPTED: "✅",
+    DistributionStatus.REJECTED: "❌",
+    DistributionStatus.COMPLETED: "🏁",
+    DistributionStatus.EXPIRED: "⏰"
+}
+
+def _encode_page_cursor(distribution: Distribution) -> str:
+    """Кодирует ключ (created_at, id) распределения для callback_data"""
+    return f"{distribution.created_at:%Y%m%d%H%M%S%f}:{distribution.id}"
+
+def _decode_page_cursor(value: str) -> tuple:
+    """Декодирует ключ (created_at, id) из callback_data"""
+    created_at, distribution_id = value.split(":")
+    return datetime.strptime(created_at, "%Y%m%d%H%M%S%f"), int(distribution_id)
+
+def _render_requests_page(
+    distributions: List[Distribution],
+    filter_type: str,
+    has_newer: bool,
+    has_older: bool
+) -> tuple:
+    """
+    Формирует текст и инлайн-клавиатуру страницы раздела "Мои заявки"
+    
+    Returns:
+        tuple: Текст сообщения и инлайн-клавиатура
+    """
+    requests_text = "📋 *Ваши заявки*:\n\n"
+    inline_keyboard = []
+    
+    for distribution in distributions:
+        request = distribution.request
+        status_emoji = DISTRIBUTION_STATUS_EMOJI.get(distribution.status, "❓")
+        status_text = distribution.status.value if distribution.status else "неизвестно"
+        
+        # Формируем информацию о заявке
+        requests_text += f"{status_emoji} *Заявка #{request.id}*\n"
+        requests_text += f"   📅 Дата: {request.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+        requests_text += f"   🏙️ Город: {request.city.name if request.city else 'Не указан'}\n"
+        requests_text += f"   🔧 Категория: {request.category.name if request.category else 'Не указана'}\n"
+        requests_text += f"   📝 Статус: {status_text}\n\n"
+        
+        # Добавляем кнопку для просмотра заявки
+        inline_keyboard.append([
+            InlineKeyboardButton(
+                text=f"{status_emoji} Заявка #{request.id} ({status_text})",
+                callback_data=f"show_request_{distribution.id}"
+            )
+        ])
+    
+    # Кнопки перехода между страницами
+    navigation = []
+    if has_newer and distributions:
+        navigation.append(InlineKeyboardButton(
+            text="⬅️ Новее",
+            callback_data=f"inbox:{filter_type}:prev:{_encode_page_cursor(distributions[0])}"
+        ))
+    if has_older and distributions:
+        navigation.append(InlineKeyboardButton(
+            text="Старее ➡️",
+            callback_data=f"inbox:{filter_type}:next:{_encode_page_cursor(distributions[-1])}"
+        ))
+    if navigation:
+        inline_keyboard.append(navigation)
+    
+    return requests_text, InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
+async def my_requests(
+    update: types.Message,
+    state: FSMContext,
+    filter_type: str = "all",
+    user: Optional[types.User] = None
+) -> None:
+    """
+    Показывает первую страницу списка заявок пользователя
+
+    Args:
+        update: Сообщение, в чат которого отправляется список
+        state: Состояние пользователя
+        filter_type: Фильтр по статусу распределения
+        user: Пользователь, чьи заявки показываются (по умолчанию автор сообщения).
+            Передается из обработчиков кнопок, где сообщение отправлено ботом
+    """
     try:
-        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-        
-        user = update.from_user
+        user = user or update.from_user
         
         # Используем контекстный менеджер для сессии
         with get_session() as session:
             request_service = RequestService(session)
             
-            # Получаем распределения пользователя
-            distributions = await request_service.get_user_distributions(user.id)
-            
-            if not distributions:
-                # Создаем клавиатуру для возврата
-                keyboard = [
-                    [KeyboardButton(text="🔙 Вернуться в главное меню")]
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
-                
-                await update.answer(
-                    "У вас нет активных заявок.",
-                    reply_markup=reply_markup
-                )
-                return
-            
-            # Фильтруем распределения по статусу
-            if filter_type == "new":
-                distributions = [d for d in distributions if d.status == "отправлено"]
-            elif filter_type == "accepted":
-                distributions = [d for d in distributions if d.status == "принято"]
-            elif filter_type == "rejected":
-                distributions = [d for d in distributions if d.status == "отклонено"]
+            # Получаем первую страницу распределений пользователя
+            distributions, has_newer, has_older = await request_service.get_user_distributions_page(
+                user.id,
+                status=REQUEST_FILTERS.get(filter_type)
+            )
             
             if not distributions:
                 # Создаем клавиатуру для возврата
                 keyboard = [
-                    [KeyboardButton(text="📋 Все заявки")],
                     [KeyboardButton(text="🔙 Вернуться в главное меню")]
                 ]
+                if filter_type != "all":
+                    keyboard.insert(0, [KeyboardButton(text="📋 Все заявки")])
                 reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
                 
                 await update.answer(
-                    f"У вас нет заявок со статусом '{filter_type}'.",
+                    "У вас нет активных заявок." if filter_type == "all"
+                    else "У вас нет заявок с выбранным статусом.",
                     reply_markup=reply_markup
                 )
+                await state.set_state(UserStates.MY_REQUESTS)
                 return
             
             # Создаем клавиатуру для фильтрации
@@ -669,57 +725,20 @@ async def my_requests(update: types.Message, state: FSMContext, filter_type: str
             ]
             reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
             
-            # Создаем сообщение со списком заявок
-            requests_text = f"📋 *Ваши заявки ({len(distributions)})*:\n\n"
-            
-            # Создаем инлайн-клавиатуру для просмотра заявок
-            inline_keyboard = []
-            
-            for i, distribution in enumerate(distributions, 1):
-                request = distribution.request
-                status_emoji = {
-                    "отправлено": "📤",
-                    "принято": "✅",
-                    "отклонено": "❌",
-                    "завершено": "🏁",
-                    "просрочено": "⏰"
-                }.get(distribution.status, "❓")
-                
-                # Формируем информацию о заявке
-                requests_text += f"{i}. {status_emoji} *Заявка #{request.id}*\n"
-                requests_text += f"   📅 Дата: {request.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-                requests_text += f"   🏙️ Город: {request.city.name if request.city else 'Не указан'}\n"
-                requests_text += f"   🔧 Категория: {request.category.name if request.category else 'Не указана'}\n"
-                requests_text += f"   📝 Статус: {distribution.status}\n\n"
-                
-                # Добавляем кнопку для просмотра заявки
-                inline_keyboard.append([
-                    InlineKeyboardButton(
-                        text=f"{status_emoji} Заявка #{request.id} ({distribution.status})",
-                        callback_data=f"show_request_{distribution.id}"
-                    )
-                ])
-            
-            # Добавляем кнопку "Назад"
-            inline_keyboard.append([
-                InlineKeyboardButton(
-                    text="🔙 Назад",
-                    callback_data="back_to_requests"
-                )
-            ])
-            
-            inline_markup = InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+            requests_text, inline_markup = _render_requests_page(
+                distributions, filter_type, has_newer, has_older
+            )
             
             await update.answer(
-                requests_text,
-                reply_markup=reply_markup,
-                parse_mode="Markdown"
+                "Выберите заявку для просмотра или отфильтруйте список:",
+                reply_markup=reply_markup
             )
             
-            # Отправляем инлайн-клавиатуру отдельным сообщением
+            # Список отправляется отдельным сообщением, чтобы листать его на месте
             await update.answer(
-                "Выберите заявку для просмотра:",
-                reply_markup=inline_markup
+                requests_text,
+                reply_markup=inline_markup,
+                parse_mode="Markdown"
             )
             
             # Устанавливаем состояние
@@ -730,6 +749,43 @@ async def my_requests(update: types.Message, state: FSMContext, filter_type: str
             "Произошла ошибка при загрузке заявок. Пожалуйста, попробуйте позже."
         )
 
+async def filter_my_requests(update: types.Message, state: FSMContext) -> None:
+    """Показывает заявки пользователя с выбранным фильтром"""
+    await my_requests(update, state, filter_type=REQUEST_FILTER_BUTTONS.get(update.text, "all"))
+
+async def my_requests_page(update: types.CallbackQuery, state: FSMContext) -> None:
+    """Переключает страницу списка заявок пользователя"""
+    try:
+        # Формат callback_data: inbox:<фильтр>:<next|prev>:<created_at>:<id>
+        _, filter_type, direction, cursor = update.data.split(":", 3)
+        
+        with get_session() as session:
+            request_service = RequestService(session)
+            distributions, has_newer, has_older = await request_service.get_user_distributions_page(
+                update.from_user.id,
+                status=REQUEST_FILTERS.get(filter_type),
+                cursor=_decode_page_cursor(cursor),
+                direction=direction
+            )
+            
+            if not distributions:
+                await update.answer("Больше заявок нет")
+                return
+            
+            requests_text, inline_markup = _render_requests_page(
+                distributions, filter_type, has_newer, has_older
+            )
+            
+            await update.message.edit_text(
+                requests_text,
+                reply_markup=inline_markup,
+                parse_mode="Markdown"
+            )
+            await update.answer()
+    except Exception as e:
+        logger.error(f"Ошибка в my_requests_page: {e}")
+        await update.answer("Произошла ошибка при загрузке заявок. Пожалуйста, попробуйте позже.")
+
 async def show_request(update: types.CallbackQuery, state: FSMContext) -> None:
     """Показывает детали заявки"""
     try:
@@ -742,6 +798,11 @@ async def show_request(update: types.CallbackQuery, state: FSMContext) -> None:
         with get_session() as session:
             request_service = RequestService(session)
             
+            # Запоминаем сообщение с кнопками "Принять"/"Отклонить", чтобы убрать их,
+            # если заявку примет другой исполнитель. Сохраняем до загрузки заявки:
+            # get_distribution расшифровывает ее данные, их нельзя записывать в базу данных
+            request_service.remember_offer_message(distribution_id, update.message.message_id)
+            
             # Получаем распределение
             distribution = await request_service.get_distribution(distribution_id)
             if not distribution:
@@ -850,14 +911,25 @@ async def accept_request(update: types.CallbackQuery, state: FSMContext) -> None
         with get_session() as session:
             request_service = RequestService(session)
             
-            # Обновляем статус распределения
-            distribution = await request_service.update_distribution_status(distribution_id, DistributionStatus.ACCEPTED)
+            # Атомарно принимаем заявку: из одновременных нажатий побеждает только одно
+            distribution, revoked = request_service.accept_distribution(distribution_id)
             if not distribution:
                 await update.message.answer(
                     "Заявка не найдена или была удалена."
                 )
                 await state.set_state(UserStates.MY_REQUESTS)
                 return
+                
+            if distribution.status != DistributionStatus.ACCEPTED:
+                await update.message.answer(REVOKED_OFFER_TEXT)
+                await my_requests(update.message, state, user=update.from_user)
+                return
+                
+            # Убираем кнопки у остальных исполнителей в фоне, не задерживая ответ
+            if revoked:
+                task = asyncio.create_task(edit_revoked_offers(update.bot, revoked))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
             
             # Проверяем, является ли заявка демо-заявкой
             is_demo = distribution.request.is_demo
@@ -877,7 +949,7 @@ async def accept_request(update: types.CallbackQuery, state: FSMContext) -> None
                 )
             
             # Возвращаемся к списку заявок
-            await my_requests(update.message, state)
+            await my_requests(update.message, state, user=update.from_user)
         
     except Exception as e:
         logger.error(f"Ошибка в accept_request: {e}")
@@ -925,7 +997,7 @@ async def reject_request(update: types.CallbackQuery, state: FSMContext) -> None
                 )
             
             # Возвращаемся к списку заявок
-            await my_requests(update.message, state)
+            await my_requests(update.message, state, user=update.from_user)
         
     except Exception as e:
         logger.error(f"Ошибка в reject_request: {e}")
@@ -967,14 +1039,9 @@ async def select_subcategories(update: types.Message, state: FSMContext) -> None
                 )
                 return
             
-            # Получаем подкатегории для выбранных категорий пользователя
+            # Получаем подкатегории для выбранных категорий пользователя из справочника
             category_ids = [category.id for category in db_user.categories]
-            subcategories = session.query(SubCategory).filter(
-                and_(
-                    SubCategory.category_id.in_(category_ids),
-                    SubCategory.is_active == True
-                )
-            ).all()
+            subcategories = reference_cache.subcategories(category_ids)
             
             if not subcategories:
                 await update.answer(
@@ -1004,23 +1071,8 @@ async def select_subcategories(update: types.Message, state: FSMContext) -> None
                 subcategories_by_type=list(subcategories_by_type.keys())
             )
             
-            # Создаем клавиатуру с типами подкатегорий
-            keyboard = []
-            for sc_type in subcategories_by_type.keys():
-                # Преобразуем тип в удобочитаемый формат
-                type_display = {
-                    'house_type': '🏠 Тип дома',
-                    'design_project': '📐 Дизайн-проект',
-                    'area': '📏 Площадь'
-                }.get(sc_type, sc_type)
-                
-                keyboard.append([KeyboardButton(text=f"{type_display}")])
-            
-            # Добавляем кнопку "Готово" и "Назад"
-            keyboard.append(["✅ Готово"])
-            keyboard.append(["🔙 Вернуться в профиль"])
-            
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+            # Клавиатура с типами подкатегорий
+            reply_markup = reference_cache.subcategory_types_keyboard(subcategories_by_type.keys())
             
             # Текст с инструкцией
             message_text = (
@@ -1058,11 +1110,7 @@ async def handle_subcategory_selection(update: types.Message, state: FSMContext)
         subcategories_by_type = data.get('subcategories_by_type', [])
         
         # Определяем тип подкатегории по тексту сообщения
-        sc_type_map = {
-            '🏠 Тип дома': 'house_type',
-            '📐 Дизайн-проект': 'design_project',
-            '📏 Площадь': 'area'
-        }
+        sc_type_map = {title: sc_type for sc_type, title in SUBCATEGORY_TYPE_TITLES.items()}
         
         selected_type = sc_type_map.get(message_text)
         
@@ -1108,21 +1156,9 @@ async def handle_subcategory_selection(update: types.Message, state: FSMContext)
                 await state.update_data(user_subcategory_ids=user_subcategory_ids)
                 
                 # Показываем обновленный список подкатегорий текущего типа
-                filtered_subcategories = [(sc_id, sc_name, sc_type, cat_id) for sc_id, sc_name, sc_type, cat_id in subcategories if sc_type == current_type]
-                
-                # Создаем клавиатуру с подкатегориями
-                keyboard = []
-                for sc_id, sc_name, _, _ in filtered_subcategories:
-                    # Добавляем маркер выбранной подкатегории
-                    status = "✅" if sc_id in user_subcategory_ids else "❌"
-                    keyboard.append([f"{status} {sc_name}"])
-                
-                # Добавляем кнопку "Назад к типам" и "Готово"
-                keyboard.append(["⬅️ Назад к типам"])
-                keyboard.append(["✅ Готово"])
-                keyboard.append(["🔙 Вернуться в профиль"])
-                
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+                reply_markup = reference_cache.subcategories_keyboard(
+                    current_type, {cat_id for _, _, _, cat_id in subcategories}, user_subcategory_ids
+                )
                 
                 await update.answer(
                     f"Выберите подкатегории типа '{message_text}':\n\n"
@@ -1136,22 +1172,7 @@ async def handle_subcategory_selection(update: types.Message, state: FSMContext)
             # Проверяем другие команды
             if message_text == "⬅️ Назад к типам":
                 # Показываем список типов подкатегорий
-                keyboard = []
-                for sc_type in subcategories_by_type:
-                    # Преобразуем тип в удобочитаемый формат
-                    type_display = {
-                        'house_type': '🏠 Тип дома',
-                        'design_project': '📐 Дизайн-проект',
-                        'area': '📏 Площадь'
-                    }.get(sc_type, sc_type)
-                    
-                    keyboard.append([KeyboardButton(text=f"{type_display}")])
-                
-                # Добавляем кнопку "Готово" и "Назад"
-                keyboard.append(["✅ Готово"])
-                keyboard.append(["🔙 Вернуться в профиль"])
-                
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+                reply_markup = reference_cache.subcategory_types_keyboard(subcategories_by_type)
                 
                 await update.answer(
                     "Выберите тип подкатегорий:",
@@ -1174,22 +1195,10 @@ async def handle_subcategory_selection(update: types.Message, state: FSMContext)
         # Сохраняем выбранный тип в состоянии
         await state.update_data(current_subcategory_type=selected_type)
         
-        # Фильтруем подкатегории по выбранному типу
-        filtered_subcategories = [(sc_id, sc_name, sc_type, cat_id) for sc_id, sc_name, sc_type, cat_id in subcategories if sc_type == selected_type]
-        
-        # Создаем клавиатуру с подкатегориями
-        keyboard = []
-        for sc_id, sc_name, _, _ in filtered_subcategories:
-            # Добавляем маркер выбранной подкатегории
-            status = "✅" if sc_id in user_subcategory_ids else "❌"
-            keyboard.append([f"{status} {sc_name}"])
-        
-        # Добавляем кнопку "Назад к типам" и "Готово"
-        keyboard.append(["⬅️ Назад к типам"])
-        keyboard.append(["✅ Готово"])
-        keyboard.append(["🔙 Вернуться в профиль"])
-        
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        # Клавиатура с подкатегориями выбранного типа
+        reply_markup = reference_cache.subcategories_keyboard(
+            selected_type, {cat_id for _, _, _, cat_id in subcategories}, user_subcategory_ids
+        )
         
         await update.answer(
             f"Выберите подкатегории типа '{message_text}':\n\n"
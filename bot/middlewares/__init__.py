@@ -2,6 +2,7 @@
 Промежуточное ПО для бота
 """
 import logging
+import time
 import traceback
 from typing import Any, Dict, Callable, Awaitable, Optional, Union
 from aiogram import Router, types, BaseMiddleware
@@ -12,7 +13,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.setup import async_session
 from bot.models import User as DbUser
-from config import ADMIN_IDS
+from bot.middlewares.metrics import MetricsMiddleware
+from bot.utils.logging_utils import LogSampler
+from config import ADMIN_IDS, LOG_SAMPLING
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +96,15 @@ class DatabaseMiddleware(BaseMiddleware):
 class LoggingMiddleware(BaseMiddleware):
     """Промежуточное ПО для логирования событий"""
     
+    def __init__(self, sampler: Optional[LogSampler] = None):
+        """
+        Инициализирует middleware
+        
+        Args:
+            sampler: Выборка логируемых событий (по умолчанию из LOG_SAMPLING)
+        """
+        self.sampler = sampler or LogSampler(LOG_SAMPLING)
+    
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -110,25 +122,77 @@ class LoggingMiddleware(BaseMiddleware):
         Returns:
             Any: Результат обработки события
         """
+        event_type = self._get_event_type(event)
+        # Описание события формируется, только если запись действительно попадет в лог
+        sampled = logger.isEnabledFor(logging.INFO) and self.sampler.should_log(event_type)
+        
+        if sampled and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Получено событие: %s от %s",
+                self._get_event_info(event), self._get_user_info(event),
+                extra=self._get_log_fields(event, event_type)
+            )
+        
+        start_time = time.monotonic()
         try:
-            # Логируем входящее событие
-            user_info = self._get_user_info(event)
-            event_info = self._get_event_info(event)
-            
-            logger.info(f"Получено событие: {event_info} от {user_info}")
-            
             # Вызываем следующий обработчик
             result = await handler(event, data)
-            
+        except Exception as e:
+            # Ошибки логируются независимо от выборки
+            fields = self._get_log_fields(event, event_type)
+            fields["duration_ms"] = round((time.monotonic() - start_time) * 1000, 1)
+            logger.error(
+                "Ошибка при обработке события %s от %s: %s",
+                self._get_event_info(event), self._get_user_info(event), e,
+                exc_info=True, extra=fields
+            )
+            raise
+        
+        if sampled:
             # Логируем результат обработки
-            logger.info(f"Событие {event_info} от {user_info} обработано")
+            fields = self._get_log_fields(event, event_type)
+            fields["duration_ms"] = round((time.monotonic() - start_time) * 1000, 1)
+            logger.info(
+                "Событие %s от %s обработано",
+                self._get_event_info(event), self._get_user_info(event),
+                extra=fields
+            )
+        
+        return result
+    
+    def _get_event_type(self, event: TelegramObject) -> str:
+        """
+        Получает тип события для выборки логируемых событий
+        
+        Args:
+            event: Событие
             
-            return result
-        except Exception as e:
-            logger.error(f"Ошибка в LoggingMiddleware: {e}")
-            logger.error(traceback.format_exc())
-            # Продолжаем обработку события
-            return await handler(event, data)
+        Returns:
+            str: Тип события
+        """
+        if isinstance(event, Message):
+            return "message"
+        elif isinstance(event, CallbackQuery):
+            return "callback_query"
+        return type(event).__name__.lower()
+    
+    def _get_log_fields(self, event: TelegramObject, event_type: str) -> Dict[str, Any]:
+        """
+        Получает структурированные поля записи лога
+        
+        Args:
+            event: Событие
+            event_type: Тип события
+            
+        Returns:
+            Dict[str, Any]: Поля записи
+        """
+        user = getattr(event, "from_user", None)
+        return {
+            "event_type": event_type,
+            "user_id": user.id if user else None,
+            "username": (user.username or user.first_name) if user else None
+        }
     
     def _get_user_info(self, event: TelegramObject) -> str:
         """
@@ -311,12 +375,14 @@ def setup_middlewares(router: Router) -> None:
     router.message.middleware(ThrottlingMiddleware())
     router.message.middleware(DatabaseMiddleware())
     router.message.middleware(StateMiddleware())
+    router.message.middleware(MetricsMiddleware())
     
     router.callback_query.middleware(LoggingMiddleware())
     router.callback_query.middleware(ErrorHandlingMiddleware())
     router.callback_query.middleware(ThrottlingMiddleware())
     router.callback_query.middleware(DatabaseMiddleware())
     router.callback_query.middleware(StateMiddleware())
+    router.callback_query.middleware(MetricsMiddleware())
     
     # Логируем регистрацию промежуточного ПО
     logger.info("Промежуточное ПО зарегистрировано") 
\ No newline at end of file
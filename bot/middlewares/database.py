@@ -1,19 +1,238 @@
 """
 Модуль для работы с базой данных в middleware.
 """
+import asyncio
 import logging
-from typing import Any, Awaitable, Callable, Dict
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from aiogram import BaseMiddleware, types
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from bot.database.setup import get_session
+from bot.database.setup import async_session
 from bot.models import User
+from config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """
+    Кэш пользователей с отложенной записью изменений.
+    
+    Значения столбцов пользователей хранятся в LRU-кэше в течение USER_CACHE_TTL
+    секунд, поэтому повторные события от одного пользователя не обращаются
+    к базе данных. Кэш хранит не объекты User, а их снимки: каждое событие
+    получает собственный объект, и обработчики не разделяют его между собой.
+    Время последней активности и изменения профиля накапливаются в буфере
+    и записываются в базу данных одним пакетным UPDATE раз в flush_interval секунд.
+    """
+    
+    def __init__(
+        self,
+        cache_size: int = USER_CACHE_SIZE,
+        cache_ttl: float = USER_CACHE_TTL,
+        flush_interval: float = USER_FLUSH_INTERVAL
+    ):
+        """
+        Инициализирует кэш
+        
+        Args:
+            cache_size: Максимальное количество пользователей в кэше
+            cache_ttl: Время жизни пользователя в кэше в секундах
+            flush_interval: Интервал записи изменений в базу данных в секундах
+        """
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        
+        # {telegram_id: (значения столбцов, loaded_at)}
+        self._cache: "OrderedDict[int, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # Изменения, еще не записанные в базу данных: {users.id: значения столбцов}
+        self._dirty: Dict[int, Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def get(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает значения столбцов пользователя из кэша, если запись еще не устарела
+        
+        Args:
+            telegram_id: ID пользователя в Telegram
+        
+        Returns:
+            Optional[Dict[str, Any]]: Значения столбцов или None
+        """
+        cached = self._cache.get(telegram_id)
+        if cached is None:
+            return None
+        
+        values, loaded_at = cached
+        if time.monotonic() - loaded_at >= self.cache_ttl:
+            del self._cache[telegram_id]
+            return None
+        
+        self._cache.move_to_end(telegram_id)
+        return values
+    
+    def put(self, user: User) -> Dict[str, Any]:
+        """
+        Помещает снимок пользователя в кэш и вытесняет самые старые записи
+        
+        Args:
+            user: Загруженный пользователь
+        
+        Returns:
+            Dict[str, Any]: Значения столбцов пользователя
+        """
+        values = {column.key: getattr(user, column.key) for column in inspect(User).column_attrs}
+        self._cache[user.telegram_id] = (values, time.monotonic())
+        self._cache.move_to_end(user.telegram_id)
+        
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return values
+    
+    def invalidate(self, telegram_id: int) -> None:
+        """Удаляет пользователя из кэша"""
+        self._cache.pop(telegram_id, None)
+    
+    def touch(self, values: Dict[str, Any], telegram_user: Optional[types.User]) -> None:
+        """
+        Обновляет время активности и профиль пользователя в кэше
+        и ставит изменения в очередь на запись
+        
+        Args:
+            values: Значения столбцов пользователя из кэша
+            telegram_user: Пользователь Telegram из события
+        """
+        values["last_activity"] = datetime.utcnow()
+        if telegram_user:
+            values["username"] = telegram_user.username
+            values["first_name"] = telegram_user.first_name
+            values["last_name"] = telegram_user.last_name
+        
+        self._dirty[values["id"]] = {
+            key: values[key]
+            for key in ("id", "username", "first_name", "last_name", "last_activity")
+        }
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self) -> None:
+        """Периодически записывает изменения в базу данных, пока они есть"""
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении активности пользователей: {e}")
+    
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения одним пакетным UPDATE
+        
+        Если пакетная запись не удалась (например, один из пользователей
+        удален), пользователи записываются по одному: строки с ошибкой
+        отбрасываются, а при недоступности базы данных возвращаются в буфер.
+        
+        Returns:
+            int: Количество обновленных пользователей
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            
+            pending, self._dirty = self._dirty, {}
+            try:
+                await self._write(list(pending.values()))
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить активность пользователей одним запросом ({e}), сохраняем по одному")
+                written = await self._write_each(pending)
+            else:
+                written = len(pending)
+            
+            logger.debug(f"Сохранена активность {written} пользователей")
+            return written
+    
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Записывает изменения пользователей одной транзакцией"""
+        async with async_session() as session:
+            await session.execute(update(User), rows)
+            await session.commit()
+    
+    async def _write_each(self, pending: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Записывает изменения каждого пользователя отдельной транзакцией
+        
+        Args:
+            pending: Изменения {users.id: значения столбцов}
+        
+        Returns:
+            int: Количество обновленных пользователей
+        """
+        written = 0
+        for user_id, values in pending.items():
+            try:
+                await self._write([values])
+                written += 1
+            except OperationalError as e:
+                # База данных недоступна: повторяем при следующем сбросе, если пользователь не менялся
+                self._dirty.setdefault(user_id, values)
+                logger.error(f"Активность пользователя {user_id} будет сохранена позже: {e}")
+            except Exception as e:
+                logger.error(f"Активность пользователя {user_id} не сохранена и отброшена: {e}")
+        return written
+    
+    async def close(self) -> None:
+        """Записывает накопленные изменения и останавливает фоновую задачу"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении активности пользователей при остановке: {e}")
+
+# Общий кэш для всех экземпляров DatabaseMiddleware
+user_cache = UserCache()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Удаляет из кэша пользователя, измененного через ORM (профиль, права администратора)"""
+    user_cache.invalidate(target.telegram_id)
 
 class DatabaseMiddleware(BaseMiddleware):
     """
     Middleware для работы с базой данных.
+    
+    Добавляет в данные события сессию базы данных и пользователя. Пользователь
+    создается по снимку из общего кэша и привязан к сессии события без запроса
+    к базе данных; время активности записывается при очередном сбросе кэша.
+    
+    setup_middlewares() регистрирует вместо него middleware, добавляющий только
+    сессию: обработчики пока не используют data["user"]. При регистрации этого
+    middleware нужно вызывать user_cache.close() при остановке бота.
     """
     
+    def __init__(self, cache: Optional[UserCache] = None):
+        """
+        Инициализирует middleware
+        
+        Args:
+            cache: Кэш пользователей (по умолчанию общий)
+        """
+        self.cache = cache or user_cache
+    
     async def __call__(
         self,
         handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -27,18 +246,14 @@ class DatabaseMiddleware(BaseMiddleware):
             handler: Обработчик события
             event: Событие
             data: Данные события
-            
+        
         Returns:
             Any: Результат обработки события
         """
-        # Получаем сессию базы данных
-        session_generator = get_session()
-        session = await anext(session_generator)
-        
-        # Добавляем сессию в данные
-        data["session"] = session
-        
-        try:
+        async with async_session() as session:
+            # Добавляем сессию в данные
+            data["session"] = session
+            
             # Получаем информацию о пользователе
             user_id = self._get_user_id(event)
             if user_id:
@@ -50,9 +265,6 @@ class DatabaseMiddleware(BaseMiddleware):
             
             # Вызываем обработчик
             return await handler(event, data)
-        finally:
-            # Закрываем сессию
-            await session.close()
     
     def _get_user_id(self, event: types.TelegramObject) -> int:
         """
@@ -60,7 +272,7 @@ class DatabaseMiddleware(BaseMiddleware):
         
         Args:
             event: Событие
-            
+        
         Returns:
             int: ID пользователя или None, если не удалось получить
         """
@@ -72,9 +284,9 @@ class DatabaseMiddleware(BaseMiddleware):
         return None
     
     async def _get_or_create_user(
-        self, 
-        session: AsyncSession, 
-        user_id: int, 
+        self,
+        session: AsyncSession,
+        user_id: int,
         event: types.TelegramObject
     ) -> User:
         """
@@ -82,63 +294,58 @@ class DatabaseMiddleware(BaseMiddleware):
         
         Args:
             session: Сессия базы данных
-            user_id: ID пользователя
+            user_id: ID пользователя в Telegram
             event: Событие
-            
+        
         Returns:
             User: Пользователь
         """
-        from sqlalchemy import select
+        values = self.cache.get(user_id)
         
-        # Ищем пользователя в базе данных
-        result = await session.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
+        if values is None:
+            # Ищем пользователя в базе данных
+            result = await session.execute(select(User).where(User.telegram_id == user_id))
+            user = result.scalar_one_or_none()
+            
+            if user is None:
+                # Создаем нового пользователя
+                user = await self._create_user(session, user_id, event)
+                self.cache.put(user)
+                return user
+            
+            values = self.cache.put(user)
+            session.expunge(user)
         
-        if user:
-            # Обновляем информацию о пользователе
-            user = await self._update_user_info(session, user, event)
-        else:
-            # Создаем нового пользователя
-            user = await self._create_user(session, user_id, event)
+        # Обновляем информацию о пользователе
+        self._update_user_info(values, event)
         
+        # Объект события: привязан к сессии как загруженный, без изменений для записи
+        user = User(**values)
+        make_transient_to_detached(user)
+        session.add(user)
         return user
     
-    async def _update_user_info(
-        self, 
-        session: AsyncSession, 
-        user: User, 
+    def _update_user_info(
+        self,
+        values: Dict[str, Any],
         event: types.TelegramObject
-    ) -> User:
+    ) -> None:
         """
         Обновляет информацию о пользователе.
         
+        Изменения записываются в базу данных не сразу, а вместе с изменениями
+        других пользователей при очередном сбросе кэша.
+        
         Args:
-            session: Сессия базы данных
-            user: Пользователь
+            values: Значения столбцов пользователя из кэша
             event: Событие
-            
-        Returns:
-            User: Обновленный пользователь
         """
-        # Получаем информацию о пользователе из события
-        telegram_user = self._get_telegram_user(event)
-        if not telegram_user:
-            return user
-        
-        # Обновляем информацию о пользователе
-        user.username = telegram_user.username
-        user.first_name = telegram_user.first_name
-        user.last_name = telegram_user.last_name
-        
-        # Сохраняем изменения
-        await session.commit()
-        
-        return user
+        self.cache.touch(values, self._get_telegram_user(event))
     
     async def _create_user(
-        self, 
-        session: AsyncSession, 
-        user_id: int, 
+        self,
+        session: AsyncSession,
+        user_id: int,
         event: types.TelegramObject
     ) -> User:
         """
@@ -146,9 +353,9 @@ class DatabaseMiddleware(BaseMiddleware):
         
         Args:
             session: Сессия базы данных
-            user_id: ID пользователя
+            user_id: ID пользователя в Telegram
             event: Событие
-            
+        
         Returns:
             User: Созданный пользователь
         """
@@ -157,7 +364,7 @@ class DatabaseMiddleware(BaseMiddleware):
         if not telegram_user:
             # Создаем пользователя с минимальной информацией
             user = User(
-                id=user_id,
+                telegram_id=user_id,
                 username=None,
                 first_name=None,
                 last_name=None,
@@ -166,7 +373,7 @@ class DatabaseMiddleware(BaseMiddleware):
         else:
             # Создаем пользователя с информацией из Telegram
             user = User(
-                id=user_id,
+                telegram_id=user_id,
                 username=telegram_user.username,
                 first_name=telegram_user.first_name,
                 last_name=telegram_user.last_name,
@@ -177,7 +384,7 @@ class DatabaseMiddleware(BaseMiddleware):
         session.add(user)
         await session.commit()
         
-        logging.info(f"Создан новый пользователь: {user.id} ({user.username or user.first_name})")
+        logger.info(f"Создан новый пользователь: {user.telegram_id} ({user.username or user.first_name})")
         
         return user
     
@@ -187,7 +394,7 @@ class DatabaseMiddleware(BaseMiddleware):
         
         Args:
             event: Событие
-            
+        
         Returns:
             types.User: Объект пользователя Telegram или None, если не удалось получить
         """
@@ -196,4 +403,4 @@ class DatabaseMiddleware(BaseMiddleware):
         elif isinstance(event, types.CallbackQuery):
             return event.from_user
         
-        return None 
\ No newline at end of file
+        return None
@@ -3,14 +3,31 @@
 """
 import logging
 import time
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 from aiogram import BaseMiddleware, types
 
+from bot.utils.logging_utils import LogSampler
+from config import LOG_SAMPLING
+
+logger = logging.getLogger(__name__)
+
 class LoggingMiddleware(BaseMiddleware):
     """
     Middleware для логирования запросов.
+    
+    Успешно обработанные события логируются выборочно в соответствии
+    с LOG_SAMPLING, ошибки логируются всегда.
     """
     
+    def __init__(self, sampler: Optional[LogSampler] = None):
+        """
+        Инициализирует middleware.
+        
+        Args:
+            sampler: Выборка логируемых событий (по умолчанию из LOG_SAMPLING)
+        """
+        self.sampler = sampler or LogSampler(LOG_SAMPLING)
+    
     async def __call__(
         self,
         handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -28,33 +45,80 @@ class LoggingMiddleware(BaseMiddleware):
         Returns:
             Any: Результат обработки события
         """
-        # Получаем информацию о пользователе и сообщении
-        user_info = self._get_user_info(event)
-        event_info = self._get_event_info(event)
-        
-        # Логируем входящее событие
-        logging.info(f"Входящее событие: {event_info} от {user_info}")
+        event_type = self._get_event_type(event)
+        # Информация о пользователе и сообщении формируется, только если запись попадет в лог
+        sampled = logger.isEnabledFor(logging.INFO) and self.sampler.should_log(event_type)
         
         # Замеряем время выполнения обработчика
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
             # Вызываем обработчик
             result = await handler(event, data)
-            
-            # Логируем успешное выполнение
-            execution_time = time.time() - start_time
-            logging.info(f"Обработка события {event_info} от {user_info} завершена за {execution_time:.3f} сек")
-            
-            return result
         except Exception as e:
             # Логируем ошибку
-            execution_time = time.time() - start_time
-            logging.error(f"Ошибка при обработке события {event_info} от {user_info} "
-                         f"(за {execution_time:.3f} сек): {e}")
+            execution_time = time.monotonic() - start_time
+            logger.error(
+                "Ошибка при обработке события %s от %s (за %.3f сек): %s",
+                self._get_event_info(event), self._get_user_info(event), execution_time, e,
+                extra=self._get_log_fields(event, event_type, execution_time)
+            )
             
             # Пробрасываем исключение дальше
             raise
+        
+        if sampled:
+            # Логируем успешное выполнение
+            execution_time = time.monotonic() - start_time
+            logger.info(
+                "Обработка события %s от %s завершена за %.3f сек",
+                self._get_event_info(event), self._get_user_info(event), execution_time,
+                extra=self._get_log_fields(event, event_type, execution_time)
+            )
+        
+        return result
+    
+    def _get_event_type(self, event: types.TelegramObject) -> str:
+        """
+        Получает тип события.
+        
+        Args:
+            event: Событие
+            
+        Returns:
+            str: Тип события
+        """
+        if isinstance(event, types.Message):
+            return "message"
+        elif isinstance(event, types.CallbackQuery):
+            return "callback_query"
+        
+        return type(event).__name__.lower()
+    
+    def _get_log_fields(
+        self,
+        event: types.TelegramObject,
+        event_type: str,
+        execution_time: float
+    ) -> Dict[str, Any]:
+        """
+        Получает структурированные поля записи лога.
+        
+        Args:
+            event: Событие
+            event_type: Тип события
+            execution_time: Время обработки в секундах
+            
+        Returns:
+            Dict[str, Any]: Поля записи
+        """
+        user = getattr(event, "from_user", None)
+        return {
+            "event_type": event_type,
+            "user_id": user.id if user else None,
+            "username": (user.username or user.first_name) if user else None,
+            "duration_ms": round(execution_time * 1000, 1)
+        }
     
     def _get_user_info(self, event: types.TelegramObject) -> str:
         """
@@ -0,0 +1,42 @@
+"""
+Middleware для сбора метрик обработчиков
+"""
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, types
+
+from bot.utils.metrics import metrics
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Middleware для учета времени выполнения, ошибок и количества
+    выполняющихся обработчиков.
+    
+    Регистрируется как внутренний middleware, поэтому имя обработчика
+    известно заранее и берется из data["handler"].
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """
+        Обрабатывает входящее событие.
+        
+        Args:
+            handler: Обработчик события
+            event: Событие
+            data: Данные события
+            
+        Returns:
+            Any: Результат обработки события
+        """
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        
+        if callback is None:
+            return await handler(event, data)
+        
+        with metrics.track("handler", getattr(callback, "__name__", "unknown")):
+            return await handler(event, data)
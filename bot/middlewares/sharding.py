@@ -0,0 +1,190 @@
+"""
+Middleware для упорядоченной обработки обновлений по пользователям
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+from bot.utils.metrics import metrics
+from config import UPDATE_SHARDS, UPDATE_MAX_CONCURRENCY, UPDATE_QUEUE_WARNING
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+metrics.describe("bot_update_queue_depth", "Количество ожидающих и выполняемых обновлений в очереди пользователей")
+
+class UpdateShardingMiddleware(BaseMiddleware):
+    """
+    Распределяет обновления по очередям в зависимости от ID пользователя.
+
+    Каждая очередь обрабатывается одним обработчиком, поэтому обновления одного
+    пользователя выполняются строго в порядке поступления, а обновления разных
+    пользователей - параллельно. Общее количество одновременно выполняемых
+    обновлений ограничено семафором, что защищает базу данных от всплесков нагрузки.
+    """
+
+    def __init__(
+        self,
+        shards: int = UPDATE_SHARDS,
+        max_concurrency: int = UPDATE_MAX_CONCURRENCY,
+        queue_warning: int = UPDATE_QUEUE_WARNING
+    ):
+        """
+        Инициализирует middleware
+
+        Args:
+            shards: Количество очередей
+            max_concurrency: Максимальное количество одновременно обрабатываемых обновлений
+            queue_warning: Длина очереди, при которой в лог пишется предупреждение
+        """
+        self.shards = max(1, shards)
+        self.queue_warning = queue_warning
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._queues: List[Optional[asyncio.Queue]] = [None] * self.shards
+        self._workers: List[Optional[asyncio.Task]] = [None] * self.shards
+        self._busy: List[bool] = [False] * self.shards
+
+    def _get_shard(self, data: Dict[str, Any]) -> Optional[int]:
+        """
+        Определяет номер очереди для обновления
+
+        Args:
+            data: Данные события
+
+        Returns:
+            Optional[int]: Номер очереди или None, если пользователь неизвестен
+        """
+        user = data.get("event_from_user")
+        if user is None:
+            return None
+        return user.id % self.shards
+
+    def _get_queue(self, shard: int) -> asyncio.Queue:
+        """Возвращает очередь и при необходимости запускает ее обработчик"""
+        queue = self._queues[shard]
+        if queue is None:
+            queue = self._queues[shard] = asyncio.Queue()
+
+        worker = self._workers[shard]
+        if worker is None or worker.done():
+            self._workers[shard] = asyncio.create_task(self._worker(shard, queue))
+
+        return queue
+
+    async def _worker(self, shard: int, queue: asyncio.Queue) -> None:
+        """Последовательно выполняет обновления из очереди"""
+        while True:
+            item: Tuple[Handler, TelegramObject, Dict[str, Any], asyncio.Future] = await queue.get()
+            handler, event, data, future = item
+            self._busy[shard] = True
+            try:
+                if future.cancelled():
+                    continue
+                async with self._semaphore:
+                    try:
+                        result = await handler(event, data)
+                    except asyncio.CancelledError:
+                        future.cancel()
+                        raise
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+            finally:
+                self._busy[shard] = False
+                queue.task_done()
+                self._report_depth(shard)
+
+    async def __call__(
+        self,
+        handler: Handler,
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """
+        Ставит обновление в очередь пользователя и ожидает результат обработки
+
+        Args:
+            handler: Обработчик события
+            event: Событие
+            data: Данные события
+
+        Returns:
+            Any: Результат обработки события
+        """
+        shard = self._get_shard(data)
+        if shard is None:
+            # Обновления без пользователя не требуют упорядочивания
+            async with self._semaphore:
+                return await handler(event, data)
+
+        queue = self._get_queue(shard)
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((handler, event, data, future))
+        self._report_depth(shard)
+
+        depth = queue.qsize()
+        if depth >= self.queue_warning:
+            logger.warning(f"Очередь обновлений {shard} содержит {depth} ожидающих обновлений")
+
+        return await future
+
+    def _get_depth(self, shard: int) -> int:
+        """Возвращает количество ожидающих и выполняемых обновлений в очереди"""
+        queue = self._queues[shard]
+        return (queue.qsize() if queue is not None else 0) + int(self._busy[shard])
+
+    def _report_depth(self, shard: int) -> None:
+        """Обновляет датчик глубины очереди в метриках"""
+        metrics.set_gauge("bot_update_queue_depth", self._get_depth(shard), shard=str(shard))
+
+    def get_queue_depths(self) -> Dict[int, int]:
+        """
+        Возвращает количество ожидающих и выполняемых обновлений в каждой очереди
+
+        Returns:
+            Dict[int, int]: Словарь {номер очереди: глубина}
+        """
+        return {shard: self._get_depth(shard) for shard in range(self.shards)}
+
+    async def close(self) -> None:
+        """Останавливает обработчики очередей"""
+        workers = [worker for worker in self._workers if worker is not None and not worker.done()]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers = [None] * self.shards
+
+def setup_update_sharding(dp: Dispatcher, **kwargs: Any) -> UpdateShardingMiddleware:
+    """
+    Подключает упорядоченную обработку обновлений к диспетчеру.
+
+    Middleware регистрируется до FSM middleware, чтобы состояние пользователя
+    читалось уже после обработки его предыдущих обновлений.
+
+    Args:
+        dp: Диспетчер
+        **kwargs: Параметры UpdateShardingMiddleware
+
+    Returns:
+        UpdateShardingMiddleware: Зарегистрированный middleware
+    """
+    middleware = UpdateShardingMiddleware(**kwargs)
+    outer = dp.update.outer_middleware
+
+    # Переносим FSM middleware и все, что зарегистрировано после него, в конец цепочки
+    tail = list(outer[outer.index(dp.fsm):]) if dp.fsm in outer else []
+    for item in tail:
+        outer.unregister(item)
+    outer(middleware)
+    for item in tail:
+        outer(item)
+
+    dp.shutdown.register(middleware.close)
+    return middleware
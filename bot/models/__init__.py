@@ -16,6 +16,8 @@ from bot.models.models import (
     ServicePackage,
     UserStatistics,
     SubCategory,
+    FSMRecord,
+    JobLease,
     user_category,
     user_city,
     user_subcategory,
@@ -38,6 +40,8 @@ __all__ = [
     'ServicePackage',
     'UserStatistics',
     'SubCategory',
+    'FSMRecord',
+    'JobLease',
     'user_category',
     'user_city',
     'user_subcategory',
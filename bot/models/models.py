@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Table, Text, JSON, create_engine, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Table, Text, JSON, create_engine, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker, backref
 from datetime import datetime
@@ -180,6 +180,8 @@ class Request(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     estimated_cost = Column(Float, nullable=True)  # Предполагаемая стоимость
+    claimed_by = Column(String(100), nullable=True)  # Экземпляр бота, распределяющий заявку
+    claim_expires_at = Column(DateTime, nullable=True)  # До какого времени действует захват заявки
     crm_id = Column(String(100), nullable=True)  # ID в CRM-системе
     crm_status = Column(String(50), nullable=True)  # Статус в CRM-системе
     
@@ -202,6 +204,12 @@ class Request(Base):
     house_type = Column(String(50), nullable=True)  # Тип дома
     has_design_project = Column(Boolean, default=False)  # Наличие дизайн-проекта
     
+    # Индексы для постраничного вывода заявок в админ-панели
+    __table_args__ = (
+        Index('ix_requests_created', 'created_at', 'id'),
+        Index('ix_requests_status_created', 'status', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f"<Request(id={self.id}, client_name={self.client_name}, status={self.status})>"
 
@@ -220,6 +228,14 @@ class Distribution(Base):
     is_converted = Column(Boolean, default=False)  # Флаг успешной конверсии
     expires_at = Column(DateTime, nullable=True)  # Время истечения срока действия распределения
     
+    # Индексы для постраничного вывода заявок пользователя и подсчета ожидающих ответа распределений,
+    # запрет повторного распределения заявки пользователю
+    __table_args__ = (
+        Index('ix_distributions_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_distributions_status_user', 'status', 'user_id'),
+        Index('uq_distributions_request_user', 'request_id', 'user_id', unique=True),
+    )
+    
     # Отношения
     request = relationship("Request", back_populates="distributions")
     user = relationship("User", back_populates="distributions")
@@ -236,6 +252,7 @@ class UserStatistics(Base):
     total_requests = Column(Integer, default=0)  # Всего полученных заявок
     processed_requests = Column(Integer, default=0)  # Обработанных заявок
     successful_requests = Column(Integer, default=0)  # Успешно завершенных заявок
+    expired_requests = Column(Integer, default=0)  # Закрытых без ответа (истек срок или заявку принял другой)
     avg_response_time = Column(Float, default=0.0)  # Среднее время ответа в секундах
     conversion_rate = Column(Float, default=0.0)  # Процент успешных конверсий
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -258,6 +275,30 @@ class Setting(Base):
     def __repr__(self):
         return f"<Setting(key={self.key}, value={self.value})>"
 
+class FSMRecord(Base):
+    """Модель сохраненного состояния FSM пользователя"""
+    __tablename__ = 'fsm_storage'
+
+    key = Column(String(255), primary_key=True)  # Ключ хранилища aiogram (бот, чат, пользователь)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # Данные состояния в формате JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<FSMRecord(key={self.key}, state={self.state})>"
+
+class JobLease(Base):
+    """Модель аренды периодической задачи экземпляром бота"""
+    __tablename__ = 'job_leases'
+
+    name = Column(String(100), primary_key=True)  # Имя периодической задачи
+    owner = Column(String(100), nullable=True)  # Экземпляр бота, выполняющий задачу
+    expires_at = Column(DateTime, nullable=True)  # До какого времени действует аренда
+    last_run_at = Column(DateTime, nullable=True)  # Время последнего запуска задачи
+    
+    def __repr__(self):
+        return f"<JobLease(name={self.name}, owner={self.owner})>"
+
 class SubCategory(Base):
     """Модель подкатегории для дополнительных критериев"""
     __tablename__ = 'subcategories'
@@ -0,0 +1,296 @@
+"""
+Архив удаленных заявок и распределений.
+
+Перед удалением строки записываются в сжатые сегменты JSONL, разложенные
+по таблицам и датам создания строк (строки связей заявки с подкатегориями
+и пакетами услуг - по дате создания заявки):
+
+    archive/requests/2025-03-05/20250611T030000123456-1042.jsonl.gz
+
+Сегменты только добавляются и никогда не изменяются: каждый пакет очистки
+пишет новый файл через временный файл и атомарное переименование, поэтому
+прерванная запись не портит архив. Если транзакция удаления не завершилась,
+строки попадут в архив повторно, и при чтении дубликаты по первичному
+ключу отбрасываются.
+"""
+import enum
+import gzip
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from sqlalchemy import DateTime, Enum, Table, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.models import Distribution, Request, request_package, request_subcategory
+from bot.utils.batching import batched
+from config import ARCHIVE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, строки которых архивируются, в порядке восстановления
+ARCHIVED_TABLES: Dict[str, Table] = {
+    "requests": Request.__table__,
+    "request_subcategory": request_subcategory,
+    "request_package": request_package,
+    "distributions": Distribution.__table__,
+}
+
+# Таблицы связей, строки которых архивируются и удаляются вместе с заявкой
+REQUEST_LINK_TABLES: List[Table] = [request_subcategory, request_package]
+
+RESTORE_BATCH_SIZE = 500
+
+def encode_value(value: Any) -> Any:
+    """Преобразует значение столбца в JSON-совместимый вид"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+def _decode_row(table: Table, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Восстанавливает типы значений строки, прочитанной из архива"""
+    decoded = {}
+    for column in table.columns:
+        value = row.get(column.name)
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Enum) and column.type.enum_class is not None:
+                value = column.type.enum_class[value]
+        decoded[column.name] = value
+    return decoded
+
+def _partition_dir(table_name: str, day: date, root: Optional[str]) -> str:
+    """Путь к директории архива таблицы за указанный день"""
+    return os.path.join(root or ARCHIVE_DIR, table_name, day.isoformat())
+
+def write_segment(table_name: str, rows: List[Dict[str, Any]], root: Optional[str] = None) -> int:
+    """
+    Записывает строки в новые сегменты архива, по одному на каждый день создания строк.
+
+    Args:
+        table_name: Имя таблицы
+        rows: Строки таблицы в виде словарей
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        int: Количество записанных строк
+    """
+    partitions = defaultdict(list)
+    for row in rows:
+        created_at = row.get("created_at") or datetime.now()
+        partitions[created_at.date()].append(row)
+
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    for day, day_rows in partitions.items():
+        directory = _partition_dir(table_name, day, root)
+        os.makedirs(directory, exist_ok=True)
+
+        # У таблиц связей нет столбца id, сегмент называется по ID заявки
+        first = day_rows[0].get("id", day_rows[0].get("request_id"))
+        path = os.path.join(directory, f"{stamp}-{first}.jsonl.gz")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f_out:
+                for row in day_rows:
+                    line = json.dumps({key: encode_value(value) for key, value in row.items()}, ensure_ascii=False)
+                    f_out.write(line.encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+
+    return len(rows)
+
+async def archive_rows(session: AsyncSession, model: Type, ids: List[int], column=None, root: Optional[str] = None) -> int:
+    """
+    Записывает в архив строки, которые будут удалены в текущей транзакции.
+
+    Args:
+        session: Сессия базы данных
+        model: Модель архивируемой таблицы
+        ids: Значения столбца отбора
+        column: Столбец отбора (по умолчанию первичный ключ)
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        int: Количество заархивированных строк
+    """
+    table = model.__table__
+    column = column if column is not None else table.c.id
+    result = await session.execute(select(table).where(column.in_(ids)).order_by(table.c.id))
+    rows = [dict(row) for row in result.mappings()]
+    if not rows:
+        return 0
+    return write_segment(table.name, rows, root)
+
+async def archive_request_links(session: AsyncSession, request_ids: List[int], root: Optional[str] = None) -> int:
+    """
+    Записывает в архив связи заявок с подкатегориями и пакетами услуг.
+
+    Строки связей раскладываются по дате создания заявки, поэтому
+    восстанавливаются за тот же диапазон дат, что и сама заявка.
+
+    Args:
+        session: Сессия базы данных
+        request_ids: ID удаляемых заявок
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        int: Количество заархивированных строк
+    """
+    archived = 0
+    for table in REQUEST_LINK_TABLES:
+        result = await session.execute(
+            select(table, Request.created_at)
+            .join(Request, Request.id == table.c.request_id)
+            .where(table.c.request_id.in_(request_ids))
+            .order_by(*table.primary_key.columns)
+        )
+        rows = [dict(row) for row in result.mappings()]
+        if rows:
+            archived += write_segment(table.name, rows, root)
+    return archived
+
+def _row_key(table: Table, row: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Значение первичного ключа строки"""
+    return tuple(row[column.name] for column in table.primary_key.columns)
+
+def _days(start: date, end: date) -> Iterator[date]:
+    """Перебирает дни диапазона включительно"""
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+def read_archive(
+    table_name: str,
+    start: date,
+    end: date,
+    root: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Читает строки таблицы из архива за диапазон дат.
+
+    Args:
+        table_name: Имя таблицы из ARCHIVED_TABLES
+        start: Первый день диапазона
+        end: Последний день диапазона (включительно)
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Yields:
+        Dict[str, Any]: Строка таблицы с восстановленными типами значений
+    """
+    table = ARCHIVED_TABLES[table_name]
+    for day in _days(start, end):
+        directory = _partition_dir(table_name, day, root)
+        if not os.path.isdir(directory):
+            continue
+
+        seen = set()
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".jsonl.gz"):
+                continue
+            with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f_in:
+                for line in f_in:
+                    row = _decode_row(table, json.loads(line))
+                    key = _row_key(table, row)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield row
+
+def restore_archive(
+    engine: Engine,
+    start: date,
+    end: date,
+    root: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Возвращает в базу данных заявки, их связи и распределения из архива за диапазон дат.
+
+    Строки, которые уже есть в базе данных, пропускаются. Связи и распределения
+    восстанавливаются только для заявок, которые есть в базе данных: распределения
+    лежат в архиве по своей дате создания, и если их заявка создана раньше
+    диапазона и еще не восстановлена, они пропускаются с предупреждением в логе.
+
+    Args:
+        engine: Синхронный движок базы данных
+        start: Первый день диапазона
+        end: Последний день диапазона (включительно)
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        Dict[str, int]: Количество восстановленных строк по таблицам и количество
+            строк, пропущенных из-за отсутствия заявки (ключи skipped_<таблица>)
+    """
+    counts = {}
+    requests_table = ARCHIVED_TABLES["requests"]
+
+    for table_name, table in ARCHIVED_TABLES.items():
+        restored = skipped = 0
+        key_columns = list(table.primary_key.columns)
+        for batch in batched(read_archive(table_name, start, end, root), RESTORE_BATCH_SIZE):
+            with engine.begin() as connection:
+                # Отбор по первому столбцу ключа, для составного ключа лишние строки
+                # отсеиваются сравнением полного ключа
+                first = key_columns[0]
+                query = select(*key_columns).where(first.in_({row[first.name] for row in batch}))
+                existing = {tuple(key) for key in connection.execute(query)}
+                rows = [row for row in batch if _row_key(table, row) not in existing]
+
+                if table is not requests_table and rows:
+                    request_ids = {row["request_id"] for row in rows}
+                    known = set(connection.execute(
+                        select(requests_table.c.id).where(requests_table.c.id.in_(request_ids))
+                    ).scalars())
+                    orphans = [row for row in rows if row["request_id"] not in known]
+                    if orphans:
+                        skipped += len(orphans)
+                        rows = [row for row in rows if row["request_id"] in known]
+
+                if rows:
+                    connection.execute(insert(table), rows)
+                    restored += len(rows)
+
+        counts[table_name] = restored
+        logger.info(f"Из архива восстановлено {restored} строк таблицы {table_name}")
+        if table is not requests_table:
+            counts[f"skipped_{table_name}"] = skipped
+            if skipped:
+                logger.warning(
+                    f"Пропущено {skipped} строк таблицы {table_name}: их заявок нет в базе данных, "
+                    f"восстановите заявки за более ранний диапазон дат"
+                )
+
+    return counts
+
+def list_partitions(table_name: str, root: Optional[str] = None) -> List[Tuple[date, int]]:
+    """
+    Возвращает дни, за которые в архиве есть строки таблицы, и количество сегментов.
+
+    Args:
+        table_name: Имя таблицы
+        root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        List[Tuple[date, int]]: Пары (день, количество сегментов) по возрастанию дня
+    """
+    directory = os.path.join(root or ARCHIVE_DIR, table_name)
+    if not os.path.isdir(directory):
+        return []
+
+    partitions = []
+    for name in sorted(os.listdir(directory)):
+        try:
+            day = date.fromisoformat(name)
+        except ValueError:
+            continue
+        segments = [f for f in os.listdir(os.path.join(directory, name)) if f.endswith(".jsonl.gz")]
+        partitions.append((day, len(segments)))
+    return partitions
@@ -1,71 +1,209 @@
 """
 Модуль для очистки старых данных.
+
+Строки удаляются пакетами по CLEANUP_BATCH_SIZE, каждый пакет - отдельной
+короткой транзакцией, между пакетами цикл событий получает управление.
+Один запуск длится не дольше CLEANUP_TIME_BUDGET секунд, а позиция, на
+которой он остановился, сохраняется в таблице settings, и следующий запуск
+продолжает с нее.
+
+Если ARCHIVE_ENABLED, строки перед удалением записываются в архив
+(bot/services/archive_service.py) в той же транзакции.
 """
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, and_
+from sqlalchemy import select, delete
+from sqlalchemy.sql import Select
 
 from bot.database.setup import async_session
-from bot.models import Request, Distribution, RequestStatus
+from bot.models import Request, Distribution, RequestStatus, Setting
+from bot.services.archive_service import REQUEST_LINK_TABLES, archive_request_links, archive_rows
 from bot.services.demo_service import cleanup_demo_requests
-from bot.services.distribution_service import cleanup_old_distributions
+from bot.utils.metrics import metrics
+from config import CLEANUP_BATCH_SIZE, CLEANUP_TIME_BUDGET, CLEANUP_CHUNK_PAUSE, ARCHIVE_ENABLED
+
+# Статусы заявок, которые удаляются по истечении срока хранения
+FINISHED_REQUEST_STATUSES = [
+    RequestStatus.COMPLETED,
+    RequestStatus.CANCELLED,
+    RequestStatus.EXPIRED
+]
+
+metrics.describe("bot_cleanup_rows_purged_total", "Количество строк, удаленных при очистке старых данных")
+metrics.describe("bot_cleanup_rows_per_second", "Скорость удаления строк при последнем запуске очистки")
+metrics.describe("bot_cleanup_budget_exhausted_total", "Количество запусков очистки, прерванных по времени")
+
+def _cursor_key(name: str) -> str:
+    """Ключ настройки, в которой хранится позиция очистки"""
+    return f"cleanup_cursor:{name}"
+
+async def _load_cursor(name: str) -> int:
+    """Загружает позицию, на которой остановился предыдущий запуск очистки"""
+    async with async_session() as session:
+        value = await session.scalar(select(Setting.value).where(Setting.key == _cursor_key(name)))
+    return int(value) if value else 0
+
+async def _save_cursor(session: AsyncSession, name: str, cursor: int) -> None:
+    """Сохраняет позицию очистки в текущей транзакции"""
+    setting = await session.scalar(select(Setting).where(Setting.key == _cursor_key(name)))
+    if setting is None:
+        setting = Setting(key=_cursor_key(name), description=f"Позиция очистки таблицы {name}")
+        session.add(setting)
+    setting.value = str(cursor)
+
+async def purge_in_chunks(
+    name: str,
+    select_ids: Callable[[int], Select],
+    purge_chunk: Callable[[AsyncSession, List[int]], Awaitable[int]],
+    batch_size: int = CLEANUP_BATCH_SIZE,
+    time_budget: float = CLEANUP_TIME_BUDGET
+) -> int:
+    """
+    Удаляет строки пакетами с ограничением по времени.
+
+    Args:
+        name: Имя очищаемой таблицы (для позиции, логов и метрик)
+        select_ids: Функция, возвращающая запрос ID строк после указанной позиции
+            в порядке возрастания
+        purge_chunk: Функция, удаляющая строки с указанными ID и возвращающая их количество
+        batch_size: Количество строк в одном пакете
+        time_budget: Максимальная длительность запуска в секундах
+
+    Returns:
+        int: Количество удаленных строк
+    """
+    cursor = await _load_cursor(name)
+    started = time.monotonic()
+    purged = 0
+
+    while True:
+        async with async_session() as session:
+            result = await session.execute(select_ids(cursor).limit(batch_size))
+            ids = result.scalars().all()
+            if ids:
+                purged += await purge_chunk(session, ids)
+                cursor = ids[-1]
+
+            # После полного прохода следующий запуск начинает с начала таблицы
+            finished = len(ids) < batch_size
+            await _save_cursor(session, name, 0 if finished else cursor)
+            await session.commit()
+
+        if finished:
+            break
+
+        if time.monotonic() - started >= time_budget:
+            metrics.inc("bot_cleanup_budget_exhausted_total", table=name)
+            logging.info(f"Очистка {name} прервана по времени на ID {cursor}, следующий запуск продолжит с этого места")
+            break
+
+        # Отдаем управление циклу событий и другим транзакциям
+        await asyncio.sleep(CLEANUP_CHUNK_PAUSE)
+
+    elapsed = time.monotonic() - started
+    rate = purged / elapsed if elapsed > 0 else 0.0
+    metrics.inc("bot_cleanup_rows_purged_total", purged, table=name)
+    metrics.set_gauge("bot_cleanup_rows_per_second", rate, table=name)
+    logging.info(f"Очистка {name}: удалено {purged} строк за {elapsed:.1f} с ({rate:.0f} строк/с)")
+    return purged
 
-async def cleanup_old_requests(days: int = 90):
+async def cleanup_old_distributions(days: int = 30, archive_root: Optional[str] = None) -> int:
+    """
+    Очищает старые распределения.
+
+    Args:
+        days: Количество дней, после которых распределения считаются старыми
+        archive_root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        int: Количество удаленных распределений
+    """
+    try:
+        logging.info(f"Запуск очистки распределений старше {days} дней")
+
+        # Определяем дату, до которой нужно удалить распределения
+        cutoff_date = datetime.now() - timedelta(days=days)
+
+        def select_ids(cursor: int) -> Select:
+            return (
+                select(Distribution.id)
+                .where(Distribution.id > cursor)
+                .where(Distribution.created_at < cutoff_date)
+                .order_by(Distribution.id)
+            )
+
+        async def purge_chunk(session: AsyncSession, ids: List[int]) -> int:
+            if ARCHIVE_ENABLED:
+                await archive_rows(session, Distribution, ids, root=archive_root)
+
+            result = await session.execute(delete(Distribution).where(Distribution.id.in_(ids)))
+            return result.rowcount
+
+        return await purge_in_chunks("distributions", select_ids, purge_chunk)
+    except Exception as e:
+        logging.error(f"Ошибка при очистке старых распределений: {e}")
+        return 0
+
+async def cleanup_old_requests(days: int = 90, archive_root: Optional[str] = None) -> int:
     """
     Очищает старые заявки.
-    
+
     Args:
         days: Количество дней, после которых заявки считаются старыми
+        archive_root: Корневая директория архива (по умолчанию ARCHIVE_DIR)
+
+    Returns:
+        int: Количество удаленных заявок
     """
     try:
         logging.info(f"Запуск очистки заявок старше {days} дней")
-        
+
         # Очищаем демо-заявки (они хранятся меньше)
         await cleanup_demo_requests(days=7)
-        
+
         # Очищаем старые распределения
-        await cleanup_old_distributions(days=30)
-        
+        await cleanup_old_distributions(days=30, archive_root=archive_root)
+
         # Определяем дату, до которой нужно удалить заявки
         cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Удаляем старые заявки
-        async with async_session() as session:
-            # Получаем ID старых заявок
-            result = await session.execute(
+
+        def select_ids(cursor: int) -> Select:
+            return (
                 select(Request.id)
+                .where(Request.id > cursor)
                 .where(Request.created_at < cutoff_date)
                 .where(Request.is_demo == False)  # Не удаляем демо-заявки, они обрабатываются отдельно
-                .where(Request.status.in_([
-                    RequestStatus.COMPLETED,
-                    RequestStatus.CANCELLED,
-                    RequestStatus.EXPIRED
-                ]))
+                .where(Request.status.in_(FINISHED_REQUEST_STATUSES))
+                .order_by(Request.id)
             )
-            request_ids = [row[0] for row in result.fetchall()]
-            
-            if not request_ids:
-                logging.info("Нет заявок для удаления")
-                return
-            
+
+        async def purge_chunk(session: AsyncSession, ids: List[int]) -> int:
+            # Сохраняем заявки, их связи и распределения в архив до удаления
+            if ARCHIVE_ENABLED:
+                await archive_rows(session, Request, ids, root=archive_root)
+                await archive_request_links(session, ids, root=archive_root)
+                await archive_rows(session, Distribution, ids, column=Distribution.request_id, root=archive_root)
+
             # Удаляем связанные распределения
-            await session.execute(
-                delete(Distribution)
-                .where(Distribution.request_id.in_(request_ids))
-            )
-            
+            result = await session.execute(delete(Distribution).where(Distribution.request_id.in_(ids)))
+            metrics.inc("bot_cleanup_rows_purged_total", result.rowcount, table="distributions")
+
+            # Удаляем связи заявок с подкатегориями и пакетами услуг
+            for table in REQUEST_LINK_TABLES:
+                await session.execute(delete(table).where(table.c.request_id.in_(ids)))
+
             # Удаляем заявки
-            await session.execute(
-                delete(Request)
-                .where(Request.id.in_(request_ids))
-            )
-            
-            await session.commit()
-        
-        logging.info(f"Удалено {len(request_ids)} старых заявок")
+            result = await session.execute(delete(Request).where(Request.id.in_(ids)))
+            return result.rowcount
+
+        return await purge_in_chunks("requests", select_ids, purge_chunk)
     except Exception as e:
         logging.error(f"Ошибка при очистке старых заявок: {e}")
+        return 0
 
 async def cleanup_old_data():
     """
@@ -73,16 +211,16 @@ async def cleanup_old_data():
     """
     try:
         logging.info("Запуск очистки всех старых данных")
-        
+
         # Очищаем старые заявки
         await cleanup_old_requests()
-        
+
         # Очищаем старые распределения
         await cleanup_old_distributions()
-        
+
         # Очищаем демо-заявки
         await cleanup_demo_requests()
-        
+
         logging.info("Очистка всех старых данных завершена")
     except Exception as e:
-        logging.error(f"Ошибка при очистке всех старых данных: {e}") 
\ No newline at end of file
+        logging.error(f"Ошибка при очистке всех старых данных: {e}")
@@ -1,10 +1,22 @@
 """
 Модуль для распределения заявок.
+
+Несколько экземпляров бота могут распределять заявки одновременно: перед
+распределением экземпляр атомарно захватывает заявки условным UPDATE с
+указанием владельца (WORKER_ID) и срока захвата. Заявку, захваченную другим
+экземпляром, не трогают, пока захват не истечет.
+
+Новые и нераспределенные заявки распределяются по убыванию приоритета
+(bot/services/request_priority.py) пакетами по DISTRIBUTION_CLAIM_BATCH,
+пока не истечет DISTRIBUTION_TICK_BUDGET секунд одного запуска.
 """
 import logging
+import time
 from datetime import datetime, timedelta
+from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.exc import SQLAlchemyError
 
 from bot.database.setup import async_session
 from bot.models import (
@@ -19,16 +31,31 @@ from bot.models import (
     City,
     SubCategory
 )
-from bot.services.request_service import RequestService
+from bot.services.request_priority import ScoreFunction, load_request_queue, score_request
+from bot.services.request_service import RequestService, insert_distributions
+from bot.services.user_statistics import distributions_expired
+from bot.utils.batching import batched
+from bot.utils.metrics import metrics
 from config import (
     DEFAULT_DISTRIBUTION_INTERVAL, 
     DEFAULT_USERS_PER_REQUEST, 
     RESERVE_USERS_PER_REQUEST,
-    DEFAULT_MAX_DISTRIBUTIONS
+    DEFAULT_MAX_DISTRIBUTIONS,
+    DISTRIBUTION_CLAIM_BATCH,
+    DISTRIBUTION_CLAIM_LEASE,
+    DISTRIBUTION_TICK_BUDGET,
+    WORKER_ID
 )
 
 logger = logging.getLogger(__name__)
 
+# Количество заявок в одном запросе при обработке истекших распределений
+EXPIRY_BATCH_SIZE = 500
+
+metrics.describe("bot_distributions_expired_total", "Количество распределений, срок которых истек без ответа")
+metrics.describe("bot_distribution_queue_depth", "Количество заявок в очереди распределения в начале запуска")
+metrics.describe("bot_distribution_budget_exhausted_total", "Количество запусков распределения, прерванных по времени")
+
 async def process_distributions():
     """
     Обрабатывает распределения заявок.
@@ -36,12 +63,15 @@ async def process_distributions():
     try:
         logging.info("Запуск обработки распределений заявок")
         
+        # Новые и нераспределенные заявки делят общее время запуска
+        deadline = time.monotonic() + DISTRIBUTION_TICK_BUDGET
+        
         async with async_session() as session:
             # Обрабатываем новые заявки
-            await process_new_requests(session)
+            await process_new_requests(session, deadline)
             
             # Обрабатываем заявки, которые не были распределены
-            await process_undistributed_requests(session)
+            await process_undistributed_requests(session, deadline)
             
             # Обрабатываем заявки, по которым истек срок распределения
             await process_expired_distributions(session)
@@ -50,60 +80,196 @@ async def process_distributions():
     except Exception as e:
         logging.error(f"Ошибка при обработке распределений заявок: {e}")
 
-async def process_new_requests(session: AsyncSession):
+async def claim_requests(
+    session: AsyncSession,
+    condition,
+    limit: int = DISTRIBUTION_CLAIM_BATCH,
+    owner: str = WORKER_ID,
+    lease: int = DISTRIBUTION_CLAIM_LEASE
+) -> List[int]:
+    """
+    Атомарно захватывает заявки для распределения.
+    
+    Заявки переводятся в статус "распределяется" одним условным UPDATE,
+    условие повторяется во внешнем WHERE, поэтому одну заявку не могут
+    захватить два экземпляра одновременно. Заявки, захват которых истек
+    (экземпляр остановился, не завершив распределение), захватываются снова.
+    
+    Args:
+        session: Сессия базы данных
+        condition: Условие отбора заявок
+        limit: Максимальное количество захватываемых заявок
+        owner: Идентификатор экземпляра бота
+        lease: Срок захвата в секундах
+        
+    Returns:
+        List[int]: ID захваченных заявок
+    """
+    now = datetime.utcnow()
+    claimable = and_(
+        condition,
+        or_(Request.claim_expires_at.is_(None), Request.claim_expires_at < now)
+    )
+    candidates = (
+        select(Request.id)
+        .where(claimable)
+        .order_by(Request.created_at, Request.id)
+        .limit(limit)
+    )
+    result = await session.execute(
+        update(Request)
+        .where(Request.id.in_(candidates))
+        .where(claimable)
+        .values(
+            status=RequestStatus.DISTRIBUTING,
+            claimed_by=owner,
+            claim_expires_at=now + timedelta(seconds=lease)
+        )
+        .returning(Request.id)
+        .execution_options(synchronize_session=False)
+    )
+    request_ids = list(result.scalars())
+    await session.commit()
+    return request_ids
+
+async def release_claims(session: AsyncSession, request_ids: List[int], owner: str = WORKER_ID):
+    """
+    Снимает захват с заявок после распределения.
+    
+    Args:
+        session: Сессия базы данных
+        request_ids: ID заявок
+        owner: Идентификатор экземпляра бота
+    """
+    if not request_ids:
+        return
+    
+    await session.execute(
+        update(Request)
+        .where(Request.id.in_(request_ids))
+        .where(Request.claimed_by == owner)
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+async def distribute_claimed_requests(session: AsyncSession, request_ids: List[int], owner: str = WORKER_ID):
+    """
+    Распределяет захваченные заявки и снимает с них захват.
+    
+    Args:
+        session: Сессия базы данных
+        request_ids: ID захваченных заявок
+        owner: Идентификатор экземпляра бота, захватившего заявки
+    """
+    try:
+        for request_id in request_ids:
+            await distribute_request(session, request_id)
+    finally:
+        await release_claims(session, request_ids, owner)
+
+async def drain_request_queue(
+    session: AsyncSession,
+    condition,
+    name: str,
+    deadline: Optional[float] = None,
+    score: ScoreFunction = score_request,
+    owner: str = WORKER_ID
+) -> int:
+    """
+    Распределяет заявки по убыванию приоритета, пока очередь не опустеет или не истечет время.
+    
+    Очередь строится один раз за запуск, из нее пакетами извлекаются заявки
+    с наибольшим приоритетом и захватываются. Заявки пакета, которые успел
+    захватить другой экземпляр, пропускаются.
+    
+    Args:
+        session: Сессия базы данных
+        condition: Условие отбора заявок
+        name: Имя очереди для логов и метрик
+        deadline: Время окончания запуска по time.monotonic() (None - без ограничения)
+        score: Функция оценки приоритета
+        owner: Идентификатор экземпляра бота
+        
+    Returns:
+        int: Количество распределенных заявок
+    """
+    now = datetime.utcnow()
+    queue = await load_request_queue(
+        session,
+        and_(condition, or_(Request.claim_expires_at.is_(None), Request.claim_expires_at < now)),
+        score
+    )
+    metrics.set_gauge("bot_distribution_queue_depth", len(queue), queue=name)
+    
+    distributed = 0
+    while len(queue):
+        if deadline is not None and time.monotonic() >= deadline:
+            metrics.inc("bot_distribution_budget_exhausted_total", queue=name)
+            logging.info(f"Время распределения истекло, в очереди {name} осталось {len(queue)} заявок")
+            break
+        
+        batch = queue.pop_batch(DISTRIBUTION_CLAIM_BATCH)
+        claimed = set(await claim_requests(session, and_(condition, Request.id.in_(batch)), limit=len(batch), owner=owner))
+        
+        # Распределяем в порядке приоритета, а не в порядке, в котором вернул UPDATE
+        request_ids = [request_id for request_id in batch if request_id in claimed]
+        await distribute_claimed_requests(session, request_ids, owner)
+        distributed += len(request_ids)
+    
+    return distributed
+
+async def process_new_requests(session: AsyncSession, deadline: Optional[float] = None):
     """
     Обрабатывает новые заявки.
     
     Args:
         session: Сессия базы данных
+        deadline: Время окончания запуска по time.monotonic()
     """
     try:
-        # Получаем новые заявки
-        result = await session.execute(
-            select(Request)
-            .where(Request.status == RequestStatus.NEW)
-            .order_by(Request.created_at)
-        )
-        requests = result.scalars().all()
+        # Распределяем новые заявки по убыванию приоритета
+        count = await drain_request_queue(session, Request.status == RequestStatus.NEW, "new", deadline)
         
-        if not requests:
+        if not count:
             logging.info("Нет новых заявок для распределения")
             return
         
-        logging.info(f"Найдено {len(requests)} новых заявок для распределения")
-        
-        # Распределяем каждую заявку
-        for request in requests:
-            await distribute_request(session, request.id)
+        logging.info(f"Распределено {count} новых заявок")
     except Exception as e:
         logging.error(f"Ошибка при обработке новых заявок: {e}")
 
-async def process_undistributed_requests(session: AsyncSession):
+async def process_undistributed_requests(session: AsyncSession, deadline: Optional[float] = None):
     """
     Обрабатывает заявки, которые не были распределены.
     
     Args:
         session: Сессия базы данных
+        deadline: Время окончания запуска по time.monotonic()
     """
     try:
-        # Получаем заявки, которые не были распределены
-        result = await session.execute(
-            select(Request)
-            .where(Request.status == RequestStatus.DISTRIBUTING)
-            .where(~Request.distributions.any())
-            .order_by(Request.created_at)
+        # Заявки, которые сейчас никому не предложены: еще не распределенные, а также
+        # заявки, чьи распределения истекли, если повторное распределение не состоялось
+        # (заявку держал другой экземпляр или процесс остановился после отметки истечения)
+        distributions_count = (
+            select(func.count(Distribution.id))
+            .where(Distribution.request_id == Request.id)
+            .scalar_subquery()
+        )
+        undistributed = and_(
+            Request.status == RequestStatus.DISTRIBUTING,
+            ~Request.distributions.any(Distribution.status == DistributionStatus.PENDING),
+            distributions_count < DEFAULT_MAX_DISTRIBUTIONS
         )
-        requests = result.scalars().all()
         
-        if not requests:
+        # Распределяем их по убыванию приоритета
+        count = await drain_request_queue(session, undistributed, "undistributed", deadline)
+        
+        if not count:
             logging.info("Нет нераспределенных заявок")
             return
         
-        logging.info(f"Найдено {len(requests)} нераспределенных заявок")
-        
-        # Распределяем каждую заявку
-        for request in requests:
-            await distribute_request(session, request.id)
+        logging.info(f"Распределено {count} нераспределенных заявок")
     except Exception as e:
         logging.error(f"Ошибка при обработке нераспределенных заявок: {e}")
 
@@ -111,88 +277,80 @@ async def process_expired_distributions(session: AsyncSession):
     """
     Обрабатывает заявки, по которым истек срок распределения.
     
-    Args:
-        session: Сессия базы данных
-    """
-    try:
-        # Получаем текущее время
-        now = datetime.now()
-        
-        # Получаем заявки, по которым истек срок распределения
-        result = await session.execute(
-            select(Request)
-            .where(Request.status == RequestStatus.DISTRIBUTING)
-            .where(Request.distributions.any(
-                and_(
-                    Distribution.status == DistributionStatus.PENDING,
-                    Distribution.expires_at < now
-                )
-            ))
-            .order_by(Request.created_at)
-        )
-        requests = result.scalars().all()
-        
-        if not requests:
-            logging.info("Нет заявок с истекшим сроком распределения")
-            return
-        
-        logging.info(f"Найдено {len(requests)} заявок с истекшим сроком распределения")
-        
-        # Обрабатываем каждую заявку
-        for request in requests:
-            await process_expired_request(session, request)
-    except Exception as e:
-        logging.error(f"Ошибка при обработке заявок с истекшим сроком распределения: {e}")
-
-async def process_expired_request(session: AsyncSession, request: Request):
-    """
-    Обрабатывает заявку с истекшим сроком распределения.
+    Истекшие распределения отмечаются одним UPDATE ... RETURNING, который
+    возвращает их заявки. Заявки, достигшие DEFAULT_MAX_DISTRIBUTIONS, находятся
+    одним GROUP BY и отмечаются просроченными одним UPDATE, остальные
+    распределяются снова. Условный UPDATE не дает двум экземплярам бота
+    обработать одно распределение дважды. Заявки, которые не удалось захватить
+    для повторного распределения, распределяет process_undistributed_requests.
     
     Args:
         session: Сессия базы данных
-        request: Заявка
     """
     try:
-        # Получаем текущее время
-        now = datetime.now()
+        now = datetime.utcnow()
         
-        # Получаем истекшие распределения
+        # Отмечаем истекшие распределения и получаем их заявки
         result = await session.execute(
-            select(Distribution)
-            .where(Distribution.request_id == request.id)
+            update(Distribution)
             .where(Distribution.status == DistributionStatus.PENDING)
             .where(Distribution.expires_at < now)
+            .where(Distribution.request_id.in_(
+                select(Request.id).where(Request.status == RequestStatus.DISTRIBUTING)
+            ))
+            .values(status=DistributionStatus.EXPIRED, updated_at=now)
+            .returning(Distribution.request_id, Distribution.user_id)
+            .execution_options(synchronize_session=False)
         )
-        expired_distributions = result.scalars().all()
+        expired = result.all()
+        request_ids = sorted({request_id for request_id, _ in expired})
         
-        if not expired_distributions:
-            logging.warning(f"Не найдено истекших распределений для заявки #{request.id}")
+        if not request_ids:
+            logging.info("Нет заявок с истекшим сроком распределения")
             return
         
-        logging.info(f"Найдено {len(expired_distributions)} истекших распределений для заявки #{request.id}")
+        # Учитываем распределения без ответа в статистике пользователей
+        await session.execute(distributions_expired(session, [user_id for _, user_id in expired]))
         
-        # Отмечаем распределения как истекшие
-        for distribution in expired_distributions:
-            distribution.status = DistributionStatus.EXPIRED
-        
-        # Проверяем, достигнуто ли максимальное количество распределений
-        result = await session.execute(
-            select(func.count(Distribution.id))
-            .where(Distribution.request_id == request.id)
-        )
-        distribution_count = result.scalar_one()
-        
-        if distribution_count >= DEFAULT_MAX_DISTRIBUTIONS:
-            # Если достигнуто максимальное количество распределений, отмечаем заявку как просроченную
-            request.status = RequestStatus.EXPIRED
-            logging.info(f"Заявка #{request.id} отмечена как просроченная (достигнуто максимальное количество распределений)")
-        else:
-            # Иначе распределяем заявку снова
-            await distribute_request(session, request.id)
+        metrics.inc("bot_distributions_expired_total", len(expired))
+        logging.info(f"Истекло {len(expired)} распределений по {len(request_ids)} заявкам")
         
+        # Находим заявки, достигшие максимального количества распределений, и отмечаем их как просроченные
+        exhausted = []
+        for batch in batched(request_ids, EXPIRY_BATCH_SIZE):
+            result = await session.execute(
+                select(Distribution.request_id)
+                .where(Distribution.request_id.in_(batch))
+                .group_by(Distribution.request_id)
+                .having(func.count(Distribution.id) >= DEFAULT_MAX_DISTRIBUTIONS)
+            )
+            exhausted_batch = result.scalars().all()
+            if exhausted_batch:
+                await session.execute(
+                    update(Request)
+                    .where(Request.id.in_(exhausted_batch))
+                    .where(Request.status == RequestStatus.DISTRIBUTING)
+                    .values(status=RequestStatus.EXPIRED)
+                    .execution_options(synchronize_session=False)
+                )
+            exhausted.extend(exhausted_batch)
         await session.commit()
+        
+        if exhausted:
+            logging.info(f"{len(exhausted)} заявок отмечены как просроченные (достигнуто максимальное количество распределений)")
+        
+        # Остальные заявки распределяем снова
+        exhausted = set(exhausted)
+        redistribute_ids = [request_id for request_id in request_ids if request_id not in exhausted]
+        for batch in batched(redistribute_ids, DISTRIBUTION_CLAIM_BATCH):
+            claimed = await claim_requests(
+                session,
+                and_(Request.id.in_(batch), Request.status == RequestStatus.DISTRIBUTING),
+                limit=len(batch)
+            )
+            await distribute_claimed_requests(session, claimed)
     except Exception as e:
-        logging.error(f"Ошибка при обработке заявки #{request.id} с истекшим сроком распределения: {e}")
+        logging.error(f"Ошибка при обработке заявок с истекшим сроком распределения: {e}")
 
 async def distribute_request(session: AsyncSession, request_id: int):
     """
@@ -203,11 +361,10 @@ async def distribute_request(session: AsyncSession, request_id: int):
         request_id: ID заявки
     """
     try:
-        # Создаем экземпляр сервиса для работы с заявками
-        request_service = RequestService(session)
-        
-        # Используем метод класса для распределения заявки
-        distributions = request_service.distribute_request(request_id)
+        # Сервис заявок работает с синхронной сессией, выполняем его на соединении асинхронной
+        distributions = await session.run_sync(
+            lambda sync_session: RequestService(sync_session).distribute_request(request_id)
+        )
         
         if distributions:
             logger.info(f"Заявка #{request_id} распределена между {len(distributions)} пользователями")
@@ -291,34 +448,6 @@ async def create_distribution(session: AsyncSession, request: Request, user: Use
     except Exception as e:
         logging.error(f"Ошибка при создании распределения заявки #{request.id} пользователю {user.id}: {e}")
 
-async def cleanup_old_distributions(days: int = 30):
-    """
-    Очищает старые распределения.
-    
-    Args:
-        days: Количество дней, после которых распределения считаются старыми
-    """
-    try:
-        logging.info(f"Запуск очистки распределений старше {days} дней")
-        
-        # Определяем дату, до которой нужно удалить распределения
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Удаляем старые распределения
-        async with async_session() as session:
-            result = await session.execute(
-                delete(Distribution)
-                .where(Distribution.created_at < cutoff_date)
-                .returning(Distribution.id)
-            )
-            deleted_count = len(result.fetchall())
-            
-            await session.commit()
-        
-        logging.info(f"Удалено {deleted_count} старых распределений")
-    except Exception as e:
-        logging.error(f"Ошибка при очистке старых распределений: {e}")
-
 class DistributionService:
     """Сервис для распределения заявок"""
     
@@ -373,31 +502,13 @@ class DistributionService:
                 logger.warning(f"Не найдено подходящих пользователей для заявки #{request.id}")
                 return []
             
-            # Создаем распределения
-            distributions = []
-            for user in matching_users:
-                # Проверяем, не было ли уже распределения для этого пользователя и заявки
-                existing_distribution = self.session.query(Distribution).filter(
-                    Distribution.user_id == user.id,
-                    Distribution.request_id == request.id
-                ).first()
-                
-                if existing_distribution:
-                    logger.info(f"Распределение для пользователя {user.id} и заявки #{request.id} уже существует")
-                    distributions.append(existing_distribution)
-                    continue
-                
-                # Создаем новое распределение
-                distribution = Distribution(
-                    user_id=user.id,
-                    request_id=request.id,
-                    status="отправлено",
-                    created_at=datetime.now(),
-                    expires_at=datetime.now() + timedelta(hours=24)  # Срок действия 24 часа
-                )
-                
-                self.session.add(distribution)
-                distributions.append(distribution)
+            # Создаем распределения одним запросом, уже существующие пропускаются
+            distributions = insert_distributions(
+                self.session,
+                request.id,
+                [user.id for user in matching_users],
+                expires_at=datetime.utcnow() + timedelta(hours=24)  # Срок действия 24 часа
+            )
             
             # Сохраняем изменения
             self.session.commit()
@@ -422,29 +533,6 @@ class DistributionService:
             logger.error(f"Ошибка при получении распределения #{distribution_id}: {e}")
             return None
     
-    def update_distribution_status(self, distribution_id: int, status: str) -> bool:
-        """
-        Обновляет статус распределения
-        """
-        try:
-            distribution = self.get_distribution(distribution_id)
-            if not distribution:
-                logger.error(f"Распределение #{distribution_id} не найдено")
-                return False
-            
-            distribution.status = status
-            distribution.updated_at = datetime.now()
-            
-            self.session.commit()
-            
-            logger.info(f"Обновлен статус распределения #{distribution_id} на '{status}'")
-            
-            return True
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при обновлении статуса распределения #{distribution_id}: {e}")
-            self.session.rollback()
-            return False
-    
     def get_user_distributions(self, user_telegram_id: int, status: str = None) -> List[Distribution]:
         """
         Получает распределения пользователя
@@ -8,16 +8,23 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.setup import async_session
 from bot.models import User, Distribution, Request
 from bot.utils.demo_generator import get_demo_info_message, schedule_demo_info_message
-from config import DEMO_MODE
+from bot.utils.throttling import Throttler
+from config import DEMO_MODE, OFFER_EDIT_INTERVAL
 
 logger = logging.getLogger(__name__)
 
+# Общий для всех чатов лимит частоты правки сообщений с отозванными предложениями
+offer_edit_throttler = Throttler(rate_limit=OFFER_EDIT_INTERVAL, key_prefix="offer_edit")
+
+REVOKED_OFFER_TEXT = "⌛ Эту заявку уже принял другой исполнитель."
+
 async def send_info_messages(bot: Bot) -> None:
     """
     Отправляет информационные сообщения пользователям
@@ -112,4 +119,45 @@ async def start_info_service(bot: Bot) -> None:
         asyncio.create_task(schedule_info_messages(bot))
         logger.info("Сервис информационных сообщений запущен")
     except Exception as e:
-        logger.error(f"Ошибка при запуске сервиса информационных сообщений: {e}") 
\ No newline at end of file
+        logger.error(f"Ошибка при запуске сервиса информационных сообщений: {e}") 
+
+async def edit_revoked_offers(bot: Bot, offers: List[Any]) -> int:
+    """
+    Убирает кнопки из сообщений с предложениями заявки, которую уже принял другой исполнитель
+    
+    Сообщения правятся по одному с общим ограничением частоты, чтобы массовый
+    отзыв не упирался в лимиты Telegram.
+    
+    Args:
+        bot: Экземпляр бота
+        offers: Отозванные предложения (RevokedOffer из RequestService.accept_distribution)
+        
+    Returns:
+        int: Количество исправленных сообщений
+    """
+    edited = 0
+    for offer in offers:
+        if not offer.telegram_message_id:
+            continue
+            
+        for attempt in range(2):
+            await offer_edit_throttler.throttle_and_wait("global")
+            try:
+                await bot.edit_message_text(
+                    chat_id=offer.telegram_id,
+                    message_id=offer.telegram_message_id,
+                    text=REVOKED_OFFER_TEXT
+                )
+                edited += 1
+                break
+            except TelegramRetryAfter as e:
+                # Telegram просит подождать - ждем и повторяем один раз
+                logger.warning(f"Лимит Telegram при правке предложения #{offer.distribution_id}, ожидание {e.retry_after} сек")
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error(f"Ошибка при правке сообщения с предложением #{offer.distribution_id}: {e}")
+                break
+                
+    if edited:
+        logger.info(f"Исправлено {edited} сообщений с отозванными предложениями")
+    return edited
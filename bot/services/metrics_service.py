@@ -0,0 +1,64 @@
+"""
+Сервис для публикации метрик по HTTP в формате Prometheus
+"""
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from bot.utils.metrics import metrics
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+_runner: Optional[web.AppRunner] = None
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Отдает метрики в текстовом формате Prometheus"""
+    return web.Response(
+        text=metrics.render(),
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"}
+    )
+
+def create_metrics_app() -> web.Application:
+    """
+    Создает приложение с маршрутом /metrics
+
+    Returns:
+        web.Application: Приложение
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    return app
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+    """
+    Запускает HTTP-сервер метрик, если он включен в настройках
+
+    Args:
+        host: Адрес сервера (по умолчанию только локальный)
+        port: Порт сервера
+    """
+    global _runner
+
+    if not METRICS_ENABLED or _runner is not None:
+        return
+
+    try:
+        runner = web.AppRunner(create_metrics_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host=host, port=port).start()
+        _runner = runner
+        logger.info(f"Сервер метрик запущен на http://{host}:{port}/metrics")
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {host}:{port}: {e}")
+
+async def stop_metrics_server() -> None:
+    """Останавливает HTTP-сервер метрик"""
+    global _runner
+
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
+        logger.info("Сервер метрик остановлен")
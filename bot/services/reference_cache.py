@@ -0,0 +1,264 @@
+"""
+Кэш справочников: категорий, городов и подкатегорий.
+
+Справочники меняются редко, поэтому загружаются в память целиком и
+перечитываются только после изменения версии (invalidate() вызывается
+обработчиками админ-панели после записи в базу данных) или по истечении
+REFERENCE_CACHE_TTL, если справочник изменили в обход бота. Вместе с
+данными кэшируются готовые клавиатуры меню и индекс диапазонов площади.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
+
+from bot.database.setup import get_session
+from bot.models import Category, City, SubCategory
+from bot.utils.interval_index import IntervalIndex
+from config import REFERENCE_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество готовых клавиатур в кэше
+KEYBOARD_CACHE_SIZE = 1024
+
+# Названия типов подкатегорий на кнопках
+SUBCATEGORY_TYPE_TITLES = {
+    'house_type': '🏠 Тип дома',
+    'design_project': '📐 Дизайн-проект',
+    'area': '📏 Площадь'
+}
+
+class ReferenceItem(NamedTuple):
+    """Элемент справочника категорий или городов"""
+    id: int
+    name: str
+    is_active: bool
+
+class SubCategoryItem(NamedTuple):
+    """Подкатегория из справочника"""
+    id: int
+    name: str
+    type: str
+    category_id: int
+    min_value: Optional[float]
+    max_value: Optional[float]
+
+class ReferenceSnapshot(NamedTuple):
+    """Содержимое справочников на момент загрузки"""
+    version: int
+    categories: Tuple[ReferenceItem, ...]
+    cities: Tuple[ReferenceItem, ...]
+    subcategories: Tuple[SubCategoryItem, ...]
+    area_index: IntervalIndex
+
+class ReferenceCache:
+    """Кэш справочников с номером версии и готовыми клавиатурами"""
+
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL):
+        """
+        Инициализирует кэш
+
+        Args:
+            ttl: Через сколько секунд справочники перечитываются без изменения версии (0 - никогда)
+        """
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._loaded_at = 0.0
+        self._keyboards: Dict[Hashable, ReplyKeyboardMarkup] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Увеличивает версию справочников, следующее обращение перечитает их из базы данных"""
+        with self._lock:
+            self.version += 1
+        logger.debug(f"Версия справочников увеличена до {self.version}")
+
+    def snapshot(self) -> ReferenceSnapshot:
+        """
+        Возвращает актуальное содержимое справочников
+
+        Returns:
+            ReferenceSnapshot: Справочники текущей версии
+        """
+        snapshot = self._snapshot
+        expired = self.ttl and time.monotonic() - self._loaded_at >= self.ttl
+        if snapshot is not None and snapshot.version == self.version and not expired:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            expired = self.ttl and time.monotonic() - self._loaded_at >= self.ttl
+            if snapshot is None or snapshot.version != self.version or expired:
+                snapshot = self._load(self.version)
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+                self._keyboards.clear()
+            return snapshot
+
+    def _load(self, version: int) -> ReferenceSnapshot:
+        """Загружает справочники из базы данных"""
+        with get_session() as session:
+            categories = tuple(
+                ReferenceItem(*row) for row in
+                session.query(Category.id, Category.name, Category.is_active).order_by(Category.id)
+            )
+            cities = tuple(
+                ReferenceItem(*row) for row in
+                session.query(City.id, City.name, City.is_active).order_by(City.id)
+            )
+            subcategories = tuple(
+                SubCategoryItem(*row) for row in
+                session.query(
+                    SubCategory.id, SubCategory.name, SubCategory.type, SubCategory.category_id,
+                    SubCategory.min_value, SubCategory.max_value
+                ).filter(SubCategory.is_active == True).order_by(SubCategory.id)
+            )
+
+        # Диапазоны площади индексируются один раз на версию справочника
+        area_index = IntervalIndex(
+            (item.min_value, item.max_value, item) for item in subcategories if item.type == 'area'
+        )
+
+        logger.info(
+            f"Загружены справочники версии {version}: {len(categories)} категорий, "
+            f"{len(cities)} городов, {len(subcategories)} подкатегорий"
+        )
+        return ReferenceSnapshot(version, categories, cities, subcategories, area_index)
+
+    def categories(self, active_only: bool = True) -> List[ReferenceItem]:
+        """Возвращает категории (по умолчанию только активные)"""
+        return [item for item in self.snapshot().categories if item.is_active or not active_only]
+
+    def cities(self, active_only: bool = True) -> List[ReferenceItem]:
+        """Возвращает города (по умолчанию только активные)"""
+        return [item for item in self.snapshot().cities if item.is_active or not active_only]
+
+    def subcategories(self, category_ids: Iterable[int], subcategory_type: Optional[str] = None) -> List[SubCategoryItem]:
+        """
+        Возвращает активные подкатегории выбранных категорий
+
+        Args:
+            category_ids: ID категорий
+            subcategory_type: Фильтр по типу подкатегории
+
+        Returns:
+            List[SubCategoryItem]: Подкатегории
+        """
+        category_ids = set(category_ids)
+        return [
+            item for item in self.snapshot().subcategories
+            if item.category_id in category_ids and (subcategory_type is None or item.type == subcategory_type)
+        ]
+
+    def area_subcategory_ids(self, value: float, category_id: Optional[int] = None) -> List[int]:
+        """
+        Находит активные подкатегории типа 'area', диапазон которых содержит значение площади
+
+        Args:
+            value: Площадь
+            category_id: Только подкатегории указанной категории
+
+        Returns:
+            List[int]: ID подкатегорий
+        """
+        return [
+            item.id for item in self.snapshot().area_index.find(value)
+            if category_id is None or item.category_id == category_id
+        ]
+
+    def find_category(self, name: str, active_only: bool = True) -> Optional[ReferenceItem]:
+        """Находит категорию по названию"""
+        return next((item for item in self.categories(active_only) if item.name == name), None)
+
+    def find_city(self, name: str, active_only: bool = True) -> Optional[ReferenceItem]:
+        """Находит город по названию"""
+        return next((item for item in self.cities(active_only) if item.name == name), None)
+
+    def _keyboard(self, key: Hashable, build: Callable[[], List[List[str]]]) -> ReplyKeyboardMarkup:
+        """Возвращает готовую клавиатуру или строит ее по текстам кнопок"""
+        self.snapshot()
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            if len(self._keyboards) >= KEYBOARD_CACHE_SIZE:
+                self._keyboards.clear()
+            keyboard = ReplyKeyboardMarkup(
+                keyboard=[[KeyboardButton(text=text) for text in row] for row in build()],
+                resize_keyboard=True
+            )
+            self._keyboards[key] = keyboard
+        return keyboard
+
+    def selection_keyboard(self, kind: str, selected_ids: Iterable[int]) -> ReplyKeyboardMarkup:
+        """
+        Клавиатура выбора категорий или городов пользователем
+
+        Args:
+            kind: "categories" или "cities"
+            selected_ids: ID выбранных пользователем элементов
+
+        Returns:
+            ReplyKeyboardMarkup: Клавиатура с отметками выбранных элементов
+        """
+        selected = frozenset(selected_ids)
+        items = self.categories() if kind == "categories" else self.cities()
+        return self._keyboard(
+            ("selection", kind, selected),
+            lambda: [[f"{'✅' if item.id in selected else '❌'} {item.name}"] for item in items]
+            + [["✅ Готово"], ["🔙 Вернуться в главное меню"]]
+        )
+
+    def admin_keyboard(self, kind: str) -> ReplyKeyboardMarkup:
+        """
+        Клавиатура управления категориями или городами в админ-панели
+
+        Args:
+            kind: "categories" или "cities"
+
+        Returns:
+            ReplyKeyboardMarkup: Клавиатура со статусами всех элементов
+        """
+        items = self.categories(active_only=False) if kind == "categories" else self.cities(active_only=False)
+        add_button = "➕ Добавить категорию" if kind == "categories" else "➕ Добавить город"
+        return self._keyboard(
+            ("admin", kind),
+            lambda: [[f"{'✅' if item.is_active else '❌'} {item.name}"] for item in items]
+            + [[add_button], ["🔙 Назад в админ-меню"]]
+        )
+
+    def subcategory_types_keyboard(self, subcategory_types: Iterable[str]) -> ReplyKeyboardMarkup:
+        """Клавиатура выбора типа подкатегорий"""
+        subcategory_types = tuple(subcategory_types)
+        return self._keyboard(
+            ("subcategory_types", subcategory_types),
+            lambda: [[SUBCATEGORY_TYPE_TITLES.get(sc_type, sc_type)] for sc_type in subcategory_types]
+            + [["✅ Готово"], ["🔙 Вернуться в профиль"]]
+        )
+
+    def subcategories_keyboard(self, subcategory_type: str, category_ids: Iterable[int],
+                               selected_ids: Iterable[int]) -> ReplyKeyboardMarkup:
+        """
+        Клавиатура выбора подкатегорий одного типа
+
+        Args:
+            subcategory_type: Тип подкатегорий
+            category_ids: ID категорий пользователя
+            selected_ids: ID выбранных пользователем подкатегорий
+
+        Returns:
+            ReplyKeyboardMarkup: Клавиатура с отметками выбранных подкатегорий
+        """
+        category_ids = frozenset(category_ids)
+        items = self.subcategories(category_ids, subcategory_type)
+        selected = frozenset(item.id for item in items) & frozenset(selected_ids)
+        return self._keyboard(
+            ("subcategories", subcategory_type, category_ids, selected),
+            lambda: [[f"{'✅' if item.id in selected else '❌'} {item.name}"] for item in items]
+            + [["⬅️ Назад к типам"], ["✅ Готово"], ["🔙 Вернуться в профиль"]]
+        )
+
+# Общий кэш справочников
+reference_cache = ReferenceCache()
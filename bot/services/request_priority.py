@@ -0,0 +1,112 @@
+"""
+Очередь заявок на распределение с приоритетами.
+
+Заявки распределяются не в порядке создания, а по убыванию приоритета,
+поэтому дорогие заявки не ждут за десятками дешевых. Приоритет вычисляет
+подключаемая функция оценки, по умолчанию score_request:
+
+    вес cost * lg(1 + стоимость) + вес area * lg(1 + площадь)
+        + вес aging * время ожидания / срок SLA категории
+
+Слагаемое ожидания растет без ограничений, поэтому дешевые заявки тоже
+распределяются, а заявки категорий с коротким SLA поднимаются быстрее.
+"""
+import heapq
+import math
+from datetime import datetime
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.models import Category, Request
+from config import DISTRIBUTION_PRIORITY_WEIGHTS, DISTRIBUTION_DEFAULT_SLA, DISTRIBUTION_CATEGORY_SLA
+
+class QueuedRequest(NamedTuple):
+    """Заявка в очереди распределения"""
+    id: int
+    created_at: Optional[datetime]
+    estimated_cost: Optional[float]
+    area: Optional[float]
+    category_name: Optional[str]
+
+# Функция оценки: заявка и текущее время -> приоритет (больше - раньше)
+ScoreFunction = Callable[[QueuedRequest, datetime], float]
+
+def score_request(request: QueuedRequest, now: datetime) -> float:
+    """
+    Вычисляет приоритет заявки по стоимости, площади и времени ожидания.
+
+    Args:
+        request: Заявка
+        now: Текущее время (UTC)
+
+    Returns:
+        float: Приоритет заявки
+    """
+    score = DISTRIBUTION_PRIORITY_WEIGHTS["cost"] * math.log10(1 + max(request.estimated_cost or 0, 0))
+    score += DISTRIBUTION_PRIORITY_WEIGHTS["area"] * math.log10(1 + max(request.area or 0, 0))
+
+    if request.created_at is not None:
+        waited_hours = max((now - request.created_at).total_seconds(), 0) / 3600
+        sla_hours = DISTRIBUTION_CATEGORY_SLA.get(request.category_name, DISTRIBUTION_DEFAULT_SLA)
+        score += DISTRIBUTION_PRIORITY_WEIGHTS["aging"] * waited_hours / sla_hours
+
+    return score
+
+class RequestQueue:
+    """
+    Очередь заявок, упорядоченная по приоритету.
+
+    Приоритеты вычисляются один раз при построении очереди, heapify
+    работает за O(n), извлечение пакета из k заявок - за O(k log n).
+    """
+
+    def __init__(self, requests: Iterable[QueuedRequest], score: ScoreFunction = score_request, now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
+        # ID во втором элементе упорядочивает заявки с равным приоритетом по времени создания
+        self._heap = [(-score(request, now), request.id) for request in requests]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def pop_batch(self, size: int) -> List[int]:
+        """
+        Извлекает ID заявок с наибольшим приоритетом
+
+        Args:
+            size: Максимальное количество заявок
+
+        Returns:
+            List[int]: ID заявок по убыванию приоритета
+        """
+        return [heapq.heappop(self._heap)[1] for _ in range(min(size, len(self._heap)))]
+
+async def load_request_queue(session: AsyncSession, condition, score: ScoreFunction = score_request) -> RequestQueue:
+    """
+    Загружает заявки, подходящие под условие, в очередь распределения.
+
+    Загружаются только столбцы, нужные для оценки, поэтому очередь из тысяч
+    заявок занимает немного памяти.
+
+    Args:
+        session: Сессия базы данных
+        condition: Условие отбора заявок
+        score: Функция оценки приоритета
+
+    Returns:
+        RequestQueue: Очередь заявок
+    """
+    result = await session.execute(
+        select(
+            Request.id,
+            Request.created_at,
+            Request.estimated_cost,
+            func.coalesce(Request.area, Request.area_value),
+            Category.name
+        )
+        .outerjoin(Category, Category.id == Request.category_id)
+        .where(condition)
+    )
+    return RequestQueue((QueuedRequest(*row) for row in result), score)
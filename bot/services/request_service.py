@@ -4,13 +4,14 @@
 import logging
 import random
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_, select, update
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, desc, and_, or_, select, update, exists
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
 
-from bot.models import Request, User, Category, City, Distribution, RequestStatus, DistributionStatus, SubCategory
+from bot.models import Request, User, Category, City, Distribution, RequestStatus, DistributionStatus, SubCategory, UserStatistics
 from bot.utils import (
     encrypt_personal_data, 
     decrypt_personal_data,
@@ -24,12 +25,94 @@ from config import (
     RESERVE_USERS_PER_REQUEST,
     DEFAULT_MAX_DISTRIBUTIONS,
     DEMO_MODE,
-    DEMO_PHONE_MASK_PERCENT
+    DEMO_PHONE_MASK_PERCENT,
+    REQUESTS_PAGE_SIZE,
+    ADMIN_PAGE_SIZE,
+    ADMIN_COUNT_CACHE_TTL
 )
+from bot.database.pagination import keyset_page
 from bot.services.crm_service import send_request_to_crm
+from bot.services.reference_cache import reference_cache
+from bot.services.user_statistics import distributions_created, distribution_answered, distributions_expired
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Общее количество заявок по фильтрам для списков админ-панели
+_requests_count_cache = TTLCache(ADMIN_COUNT_CACHE_TTL)
+
+# Статусы заявок, в которых заявку еще может принять исполнитель
+CLAIMABLE_REQUEST_STATUSES = [
+    RequestStatus.NEW,
+    RequestStatus.ACTUAL,
+    RequestStatus.PENDING,
+    RequestStatus.DISTRIBUTING
+]
+
+metrics.describe("bot_request_claims_total", "Количество попыток принять заявку по результату")
+
+class RevokedOffer(NamedTuple):
+    """Предложение заявки, отозванное после того, как ее принял другой исполнитель"""
+    distribution_id: int
+    telegram_id: int
+    telegram_message_id: Optional[int]
+
+def insert_distributions(
+    session: Session,
+    request_id: int,
+    user_ids: List[int],
+    expires_at: Optional[datetime] = None,
+    status: DistributionStatus = DistributionStatus.PENDING
+) -> List[Distribution]:
+    """
+    Создает распределения заявки пользователям одним запросом.
+    
+    Все строки вставляются одним INSERT ... ON CONFLICT DO NOTHING RETURNING:
+    пары (заявка, пользователь), которые уже есть в таблице, пропускаются
+    уникальным индексом, без предварительной проверки каждого пользователя.
+    Статистика пользователей обновляется в той же транзакции. Изменения
+    не фиксируются, это делает вызывающий код.
+    
+    Args:
+        session: Сессия базы данных
+        request_id: ID заявки
+        user_ids: ID пользователей
+        expires_at: Время истечения срока действия распределений
+        status: Статус распределений
+        
+    Returns:
+        List[Distribution]: Созданные распределения в порядке user_ids
+    """
+    if not user_ids:
+        return []
+    
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    now = datetime.utcnow()
+    statement = (
+        dialect.insert(Distribution)
+        .values([
+            {
+                "request_id": request_id,
+                "user_id": user_id,
+                "status": status,
+                "created_at": now,
+                "updated_at": now,
+                "expires_at": expires_at
+            }
+            for user_id in dict.fromkeys(user_ids)
+        ])
+        .on_conflict_do_nothing(index_elements=["request_id", "user_id"])
+        .returning(Distribution)
+    )
+    created = {distribution.user_id: distribution for distribution in session.scalars(statement)}
+    
+    # Учитываем распределения в статистике пользователей в той же транзакции
+    if created:
+        session.execute(distributions_created(session, list(created)))
+    
+    return [created[user_id] for user_id in dict.fromkeys(user_ids) if user_id in created]
+
 class RequestService:
     """Сервис для работы с заявками"""
     
@@ -105,10 +188,13 @@ class RequestService:
                 has_design_project=data.get('has_design_project', False)
             )
             
-            # Добавляем подкатегории, если они указаны
-            if 'subcategory_ids' in data and data['subcategory_ids']:
+            # Добавляем подкатегории, если они указаны, и подкатегории площади по значению площади
+            subcategory_ids = set(data.get('subcategory_ids') or [])
+            if data.get('area_value') is not None:
+                subcategory_ids.update(reference_cache.area_subcategory_ids(data['area_value'], category.id))
+            if subcategory_ids:
                 subcategories = self.session.query(SubCategory).filter(
-                    SubCategory.id.in_(data['subcategory_ids'])
+                    SubCategory.id.in_(subcategory_ids)
                 ).all()
                 request.subcategories.extend(subcategories)
             
@@ -292,53 +378,43 @@ class RequestService:
             selected_users = list(reversed(users))[:DEFAULT_USERS_PER_REQUEST]
             reserve_users = list(reversed(users))[DEFAULT_USERS_PER_REQUEST:DEFAULT_USERS_PER_REQUEST + RESERVE_USERS_PER_REQUEST]
             
-        # Создаем распределения
-        distributions = []
-        
-        # Устанавливаем время истечения срока действия распределения
-        expires_at = datetime.utcnow() + timedelta(hours=24)  # Распределение действительно 24 часа
-        
-        # Основной поток
-        for user in selected_users:
-            distribution = Distribution(
-                request_id=request_id,
-                user_id=user.id,
-                status="отправлено",
-                expires_at=expires_at
-            )
-            self.session.add(distribution)
-            distributions.append(distribution)
-            
-        # Резервный поток (если основной поток не заполнен)
+        # Резервный поток дополняет основной, если основной поток не заполнен
+        user_ids = [user.id for user in selected_users]
         if len(selected_users) < DEFAULT_USERS_PER_REQUEST:
             remaining = DEFAULT_USERS_PER_REQUEST - len(selected_users)
-            for user in reserve_users[:remaining]:
-                distribution = Distribution(
-                    request_id=request_id,
-                    user_id=user.id,
-                    status="отправлено",
-                    expires_at=expires_at
-                )
-                self.session.add(distribution)
-                distributions.append(distribution)
-                
+            user_ids += [user.id for user in reserve_users[:remaining]]
+            
+        # Создаем распределения одним запросом, распределение действительно 24 часа
+        distributions = insert_distributions(
+            self.session,
+            request_id,
+            user_ids,
+            expires_at=datetime.utcnow() + timedelta(hours=24)
+        )
         self.session.commit()
         
         logger.info(f"Заявка #{request_id} распределена между {len(distributions)} пользователями")
         return distributions
         
-    def _get_users_for_request(self, request: Request) -> List[User]:
+    def _get_users_for_request(self, request: Request, limit: Optional[int] = None) -> List[User]:
         """
         Получает список пользователей, подходящих для заявки
         
+        Пользователи упорядочены по нагрузке: сначала по количеству заявок,
+        ожидающих ответа, затем по общему количеству полученных заявок.
+        
         Args:
             request: Заявка
+            limit: Максимальное количество пользователей (по умолчанию основной и резервный поток)
             
         Returns:
             List[User]: Список пользователей
         """
+        if limit is None:
+            limit = DEFAULT_USERS_PER_REQUEST + RESERVE_USERS_PER_REQUEST
+            
         # Базовый запрос: активные пользователи
-        query = self.session.query(User).filter(User.is_active == True)
+        query = self.session.query(User.id).filter(User.is_active == True)
         
         # Фильтр по категории
         if request.category_id:
@@ -377,64 +453,94 @@ class RequestService:
             )
             
         if request.area_value:
-            # Находим подкатегории с типом 'area' и подходящим диапазоном значений
-            query = query.join(User.subcategories).filter(
-                and_(
-                    SubCategory.type == 'area',
-                    or_(
-                        and_(
-                            SubCategory.min_value <= request.area_value,
-                            SubCategory.max_value >= request.area_value
-                        ),
-                        and_(
-                            SubCategory.min_value <= request.area_value,
-                            SubCategory.max_value.is_(None)
-                        ),
-                        and_(
-                            SubCategory.min_value.is_(None),
-                            SubCategory.max_value >= request.area_value
-                        )
-                    )
-                )
-            )
+            # Находим подкатегории с типом 'area' и подходящим диапазоном значений по индексу диапазонов
+            area_subcategory_ids = reference_cache.area_subcategory_ids(request.area_value)
+            query = query.filter(User.subcategories.any(SubCategory.id.in_(area_subcategory_ids)))
             
-        # Получаем всех подходящих пользователей
-        users = query.all()
+        # Выбираем наименее загруженных подходящих пользователей
+        users = self._least_loaded_users(query, limit, request.id)
         
         # Если нет пользователей с точным совпадением, ищем с частичным совпадением
         if not users:
             logger.info(f"Не найдено пользователей с точным совпадением для заявки #{request.id}, ищем с частичным совпадением")
             
             # Сначала пробуем найти по основным критериям (категория и город)
-            query = self.session.query(User).filter(User.is_active == True)
-            
             if request.category_id:
+                query = self.session.query(User.id).filter(User.is_active == True)
                 query = query.join(User.categories).filter(Category.id == request.category_id)
-                users = query.all()
+                users = self._least_loaded_users(query, limit, request.id)
                 
             if not users and request.city_id:
-                query = self.session.query(User).filter(User.is_active == True)
+                query = self.session.query(User.id).filter(User.is_active == True)
                 query = query.join(User.cities).filter(City.id == request.city_id)
-                users = query.all()
+                users = self._least_loaded_users(query, limit, request.id)
                 
             # Если все еще нет пользователей, пробуем найти по подкатегориям
             if not users and request.subcategories:
                 subcategory_ids = [sc.id for sc in request.subcategories]
                 if subcategory_ids:
-                    query = self.session.query(User).filter(User.is_active == True)
+                    query = self.session.query(User.id).filter(User.is_active == True)
                     query = query.join(User.subcategories).filter(SubCategory.id.in_(subcategory_ids))
-                    users = query.all()
+                    users = self._least_loaded_users(query, limit, request.id)
             
-        # Если все еще нет пользователей, возвращаем всех активных
+        # Если все еще нет пользователей, берем наименее загруженных из всех активных
         if not users:
-            logger.warning(f"Не найдено подходящих пользователей для заявки #{request.id}, возвращаем всех активных")
-            users = self.session.query(User).filter(User.is_active == True).all()
+            logger.warning(f"Не найдено подходящих пользователей для заявки #{request.id}, выбираем из всех активных")
+            query = self.session.query(User.id).filter(User.is_active == True)
+            users = self._least_loaded_users(query, limit, request.id)
             
-        # Сортируем пользователей по количеству полученных заявок (в порядке возрастания)
-        users.sort(key=lambda user: len(user.distributions))
-        
         return users
         
+    def _least_loaded_users(self, candidates_query, limit: int, request_id: Optional[int] = None) -> List[User]:
+        """
+        Выбирает наименее загруженных пользователей среди кандидатов
+        
+        Общее количество полученных заявок берется из строки статистики
+        пользователя (user_statistics), а по распределениям считаются только
+        ожидающие ответа - по индексу (status, user_id), без чтения всей
+        истории кандидатов. Пользователи сортируются и ограничиваются limit
+        в том же запросе, в Python читаются только выбранные.
+        
+        Args:
+            candidates_query: Запрос ID подходящих пользователей
+            limit: Количество пользователей
+            request_id: ID заявки, пользователи которой исключаются из кандидатов
+            
+        Returns:
+            List[User]: Пользователи в порядке возрастания нагрузки
+        """
+        if request_id is not None:
+            # Заявка не распределяется повторно пользователю, который ее уже получал
+            candidates_query = candidates_query.filter(
+                ~User.id.in_(select(Distribution.user_id).where(Distribution.request_id == request_id))
+            )
+        candidates = candidates_query.distinct().subquery()
+        pending = (
+            self.session.query(
+                Distribution.user_id.label("user_id"),
+                func.count(Distribution.id).label("open")
+            )
+            .filter(
+                Distribution.status == DistributionStatus.PENDING,
+                Distribution.user_id.in_(select(candidates.c.id))
+            )
+            .group_by(Distribution.user_id)
+            .subquery()
+        )
+        return (
+            self.session.query(User)
+            .join(candidates, candidates.c.id == User.id)
+            .outerjoin(pending, pending.c.user_id == User.id)
+            .outerjoin(UserStatistics, UserStatistics.user_id == User.id)
+            .order_by(
+                func.coalesce(pending.c.open, 0),
+                func.coalesce(UserStatistics.total_requests, 0),
+                User.id
+            )
+            .limit(limit)
+            .all()
+        )
+        
     def get_request_statistics(self) -> Dict[str, Any]:
         """
         Получает статистику по заявкам
@@ -489,6 +595,81 @@ class RequestService:
             "acceptance_rate": round(accepted_distributions / total_distributions * 100, 2) if total_distributions > 0 else 0
         }
         
+    def _filter_requests(self, query, status: Optional[RequestStatus] = None,
+                         category_id: Optional[int] = None, city_id: Optional[int] = None):
+        """Добавляет к запросу фильтры списка заявок"""
+        if status is not None:
+            query = query.filter(Request.status == status)
+        if category_id is not None:
+            query = query.filter(Request.category_id == category_id)
+        if city_id is not None:
+            query = query.filter(Request.city_id == city_id)
+        return query
+        
+    async def get_requests_page(
+        self,
+        status: Optional[RequestStatus] = None,
+        category_id: Optional[int] = None,
+        city_id: Optional[int] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        direction: str = "next",
+        limit: int = ADMIN_PAGE_SIZE
+    ) -> Tuple[List[Request], bool, bool]:
+        """
+        Получает страницу заявок для админ-панели, начиная с самых новых.
+        
+        Используется пагинация по ключу (created_at, id), фильтры применяются
+        в запросе, а города и категории загружаются вместе со страницей.
+        
+        Args:
+            status: Фильтр по статусу заявки
+            category_id: Фильтр по категории
+            city_id: Фильтр по городу
+            cursor: Ключ (created_at, id) крайней заявки текущей страницы
+            direction: "next" - более старые заявки, "prev" - более новые
+            limit: Размер страницы
+            
+        Returns:
+            Tuple[List[Request], bool, bool]: Заявки страницы,
+                есть ли более новые и есть ли более старые заявки
+        """
+        query = self._filter_requests(
+            self.session.query(Request).options(
+                selectinload(Request.city),
+                selectinload(Request.category)
+            ),
+            status, category_id, city_id
+        )
+        
+        return keyset_page(query, (Request.created_at, Request.id), cursor, direction, limit)
+        
+    def count_requests(
+        self,
+        status: Optional[RequestStatus] = None,
+        category_id: Optional[int] = None,
+        city_id: Optional[int] = None
+    ) -> int:
+        """
+        Подсчитывает заявки по фильтрам.
+        
+        Результат кэшируется на ADMIN_COUNT_CACHE_TTL секунд, чтобы листание
+        списка не пересчитывало всю таблицу на каждой странице.
+        
+        Args:
+            status: Фильтр по статусу заявки
+            category_id: Фильтр по категории
+            city_id: Фильтр по городу
+            
+        Returns:
+            int: Количество заявок
+        """
+        return _requests_count_cache.get_or_set(
+            (status, category_id, city_id),
+            lambda: self._filter_requests(
+                self.session.query(func.count(Request.id)), status, category_id, city_id
+            ).scalar()
+        )
+        
     async def get_user_distributions(self, telegram_id: int) -> List[Distribution]:
         """
         Получает список распределений для пользователя
@@ -520,6 +701,48 @@ class RequestService:
                     
         return distributions
         
+    async def get_user_distributions_page(
+        self,
+        telegram_id: int,
+        status: Optional[DistributionStatus] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        direction: str = "next",
+        limit: int = REQUESTS_PAGE_SIZE
+    ) -> Tuple[List[Distribution], bool, bool]:
+        """
+        Получает страницу распределений пользователя, начиная с самых новых.
+        
+        Используется пагинация по ключу (created_at, id), поэтому стоимость
+        запроса не зависит от количества распределений пользователя. Заявки,
+        города и категории загружаются вместе со страницей через selectinload.
+        
+        Args:
+            telegram_id: Telegram ID пользователя
+            status: Фильтр по статусу распределения
+            cursor: Ключ (created_at, id) крайнего распределения текущей страницы
+            direction: "next" - более старые распределения, "prev" - более новые
+            limit: Размер страницы
+            
+        Returns:
+            Tuple[List[Distribution], bool, bool]: Распределения страницы,
+                есть ли более новые и есть ли более старые распределения
+        """
+        user_id = select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
+        
+        query = (
+            self.session.query(Distribution)
+            .options(
+                selectinload(Distribution.request).selectinload(Request.city),
+                selectinload(Distribution.request).selectinload(Request.category)
+            )
+            .filter(Distribution.user_id == user_id)
+        )
+        
+        if status is not None:
+            query = query.filter(Distribution.status == status)
+        
+        return keyset_page(query, (Distribution.created_at, Distribution.id), cursor, direction, limit)
+        
     async def get_distribution(self, distribution_id: int) -> Optional[Distribution]:
         """
         Получает распределение по ID
@@ -543,7 +766,120 @@ class RequestService:
                 
         return distribution
         
-    async def update_distribution_status(self, distribution_id: int, status: str) -> Optional[Distribution]:
+    def remember_offer_message(self, distribution_id: int, message_id: int) -> bool:
+        """
+        Запоминает сообщение, в котором пользователю показано предложение заявки
+        
+        Когда заявку принимает другой исполнитель, кнопки в этом сообщении
+        убираются (info_service.edit_revoked_offers). Запоминается только
+        предложение, ожидающее ответа.
+        
+        Args:
+            distribution_id: ID распределения
+            message_id: ID сообщения Telegram
+            
+        Returns:
+            bool: True, если ID сообщения сохранен
+        """
+        result = self.session.execute(
+            update(Distribution)
+            .where(Distribution.id == distribution_id, Distribution.status == DistributionStatus.PENDING)
+            .values(telegram_message_id=message_id)
+            .execution_options(synchronize_session=False)
+        )
+        self.session.commit()
+        return result.rowcount == 1
+        
+    def accept_distribution(self, distribution_id: int) -> Tuple[Optional[Distribution], List[RevokedOffer]]:
+        """
+        Принимает заявку по распределению: заявку получает первый принявший
+        
+        Заявка захватывается одним условным UPDATE, который срабатывает только
+        для ожидающего ответа распределения и заявки, которую еще никто не
+        принял, поэтому из одновременных нажатий "Принять" побеждает ровно одно.
+        В той же транзакции остальные ожидающие распределения заявки
+        отзываются одним запросом.
+        
+        Args:
+            distribution_id: ID распределения
+            
+        Returns:
+            Tuple[Optional[Distribution], List[RevokedOffer]]: Распределение (None, если не найдено;
+                статус ACCEPTED, если заявка досталась этому пользователю) и отозванные предложения
+        """
+        distribution = self.session.query(Distribution).filter_by(id=distribution_id).first()
+        if not distribution:
+            logger.warning(f"Распределение #{distribution_id} не найдено")
+            return None, []
+            
+        now = datetime.utcnow()
+        claimed = self.session.execute(
+            update(Request)
+            .where(Request.id == select(Distribution.request_id).where(
+                Distribution.id == distribution_id,
+                Distribution.status == DistributionStatus.PENDING
+            ).scalar_subquery())
+            .where(Request.status.in_(CLAIMABLE_REQUEST_STATUSES))
+            .values(status=RequestStatus.IN_PROGRESS, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if claimed.rowcount != 1:
+            self.session.rollback()
+            self.session.refresh(distribution)
+            metrics.inc("bot_request_claims_total", result="lost")
+            logger.info(f"Заявка #{distribution.request_id} уже принята, распределение #{distribution_id} не получило ее")
+            return distribution, []
+            
+        # Отмечаем победившее распределение
+        response_time = int((now - distribution.created_at).total_seconds()) if distribution.created_at else None
+        self.session.execute(
+            update(Distribution)
+            .where(Distribution.id == distribution_id)
+            .values(
+                status=DistributionStatus.ACCEPTED,
+                is_converted=True,
+                response_time=response_time,
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.session.execute(distribution_answered(self.session, distribution.user_id, True, response_time))
+        
+        # Отзываем остальные предложения этой заявки
+        pending = and_(
+            Distribution.request_id == distribution.request_id,
+            Distribution.status == DistributionStatus.PENDING,
+            Distribution.id != distribution_id
+        )
+        revoked = [
+            RevokedOffer(*row) for row in self.session.execute(
+                select(Distribution.id, User.telegram_id, Distribution.telegram_message_id)
+                .join(User, User.id == Distribution.user_id)
+                .where(pending)
+            )
+        ]
+        expired = self.session.execute(
+            update(Distribution)
+            .where(pending)
+            .values(status=DistributionStatus.EXPIRED, updated_at=now)
+            .returning(Distribution.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        # Отозванные предложения учитываются в статистике как закрытые без ответа
+        if expired:
+            self.session.execute(distributions_expired(self.session, expired))
+        
+        self.session.commit()
+        self.session.refresh(distribution)
+        
+        metrics.inc("bot_request_claims_total", result="won")
+        logger.info(
+            f"Заявка #{distribution.request_id} принята по распределению #{distribution_id}, "
+            f"отозвано {len(revoked)} предложений"
+        )
+        return distribution, revoked
+        
+    async def update_distribution_status(self, distribution_id: int, status: DistributionStatus) -> Optional[Distribution]:
         """
         Обновляет статус распределения
         
@@ -554,46 +890,49 @@ class RequestService:
         Returns:
             Optional[Distribution]: Обновленное распределение или None, если не найдено
         """
+        # Принятие заявки - атомарный захват, см. accept_distribution
+        if status == DistributionStatus.ACCEPTED:
+            distribution, _ = self.accept_distribution(distribution_id)
+            return distribution
+            
         distribution = self.session.query(Distribution).filter_by(id=distribution_id).first()
         if not distribution:
             logger.warning(f"Распределение #{distribution_id} не найдено")
             return None
             
-        # Обновляем статус
-        distribution.status = status
-        
-        # Если статус "принято", обновляем статус заявки
-        if status == "принято":
-            distribution.is_converted = True
-            distribution.request.status = RequestStatus.IN_PROGRESS
-            
-        # Если статус "отклонено", проверяем, остались ли активные распределения
-        elif status == "отклонено":
-            active_distributions = self.session.query(func.count(Distribution.id)).filter(
-                Distribution.request_id == distribution.request_id,
-                Distribution.status.in_(["отправлено", "просмотрено"])
-            ).scalar()
-            
-            # Если нет активных распределений, обновляем статус заявки
-            if active_distributions == 0:
-                # Проверяем, есть ли принятые распределения
-                accepted_distributions = self.session.query(func.count(Distribution.id)).filter(
-                    Distribution.request_id == distribution.request_id,
-                    Distribution.status == "принято"
-                ).scalar()
-                
-                if accepted_distributions == 0:
-                    # Если нет принятых распределений, помечаем заявку как неактуальную
-                    distribution.request.status = RequestStatus.NOT_ACTUAL
-                    
-        # Если статус "просмотрено", обновляем время ответа
-        elif status == "просмотрено":
-            # Вычисляем время ответа в секундах
-            response_time = (datetime.utcnow() - distribution.created_at).total_seconds()
-            distribution.response_time = int(response_time)
+        now = datetime.utcnow()
+        response_time = int((now - distribution.created_at).total_seconds()) if distribution.created_at else None
+        
+        # Ответить можно только на предложение, которое еще ожидает ответа
+        updated = self.session.execute(
+            update(Distribution)
+            .where(Distribution.id == distribution_id, Distribution.status == DistributionStatus.PENDING)
+            .values(status=status, response_time=response_time, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Учитываем отказ в статистике пользователя
+        if updated.rowcount and status == DistributionStatus.REJECTED:
+            self.session.execute(distribution_answered(self.session, distribution.user_id, False, response_time))
+        
+        # Если статус "отклонено" и активных или принятых распределений не осталось, заявка неактуальна
+        if updated.rowcount and status == DistributionStatus.REJECTED:
+            self.session.execute(
+                update(Request)
+                .where(
+                    Request.id == distribution.request_id,
+                    Request.status.in_(CLAIMABLE_REQUEST_STATUSES),
+                    ~exists().where(
+                        Distribution.request_id == distribution.request_id,
+                        Distribution.status.in_([DistributionStatus.PENDING, DistributionStatus.ACCEPTED])
+                    )
+                )
+                .values(status=RequestStatus.NOT_ACTUAL, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
             
-        distribution.updated_at = datetime.utcnow()
-        await self.session.commit()
+        self.session.commit()
+        self.session.refresh(distribution)
         
-        logger.info(f"Статус распределения #{distribution_id} обновлен на '{status}'")
-        return distribution 
\ No newline at end of file
+        logger.info(f"Статус распределения #{distribution_id} обновлен на '{distribution.status.value}'")
+        return distribution
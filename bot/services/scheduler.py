@@ -1,101 +1,394 @@
 """
 Модуль для планировщика задач.
+
+Планировщик может работать в нескольких экземплярах бота одновременно:
+каждую периодическую задачу выполняет только экземпляр, арендовавший ее в
+таблице job_leases. Аренда продлевается, пока экземпляр работает, а если он
+остановился, через SCHEDULER_LEASE_TTL секунд задачу перехватывает другой.
+Время последнего запуска хранится там же, поэтому после перезапуска задачи
+не выполняются раньше срока.
+
+У каждой задачи есть максимальное время выполнения, после которого она
+отменяется, и политика для пропущенных запусков: MISFIRE_COALESCE выполняет
+все пропущенные запуски одним запуском сразу, MISFIRE_SKIP пропускает их и
+ждет следующего запуска по расписанию. Задача, не завершившаяся после отмены,
+не запускается повторно, пока не завершится. Одновременно выполняется не
+больше SCHEDULER_MAX_CONCURRENT_JOBS задач. Время выполнения и задержка
+запуска задач выводятся командой /jobs.
 """
 import logging
 import asyncio
+import random
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
 
+from bot.database.setup import async_session
+from bot.models import JobLease
 from bot.services.demo_service import generate_demo_requests
 from bot.services.distribution_service import process_distributions
 from bot.services.cleanup_service import cleanup_old_requests, cleanup_old_distributions
-from config import DEMO_MODE, DEBUG_MODE
+from bot.utils.metrics import metrics
+from config import (
+    DEMO_MODE, DEBUG_MODE, WORKER_ID,
+    SCHEDULER_LEASE_TTL, SCHEDULER_JITTER, SCHEDULER_MAX_CONCURRENT_JOBS, SCHEDULER_CANCEL_GRACE
+)
+
+# Политики для пропущенных запусков
+MISFIRE_COALESCE = "coalesce"
+MISFIRE_SKIP = "skip"
 
 # Словарь для хранения задач
 tasks = {}
 
+# Последний запуск каждой задачи, в том числе отмененный, но еще не завершившийся
+running: Dict[str, asyncio.Task] = {}
+
+# Ограничение количества одновременно выполняющихся задач
+job_slots = asyncio.Semaphore(SCHEDULER_MAX_CONCURRENT_JOBS)
+
+metrics.describe("bot_job_leader", "1, если экземпляр бота арендовал периодическую задачу")
+metrics.describe("bot_job_lag_seconds", "Задержка запуска задач планировщика относительно расписания")
+metrics.describe("bot_job_timeouts_total", "Количество запусков задач, отмененных по времени выполнения")
+metrics.describe("bot_job_skipped_total", "Количество пропущенных запусков задач планировщика")
+metrics.describe("bot_job_lease_lost_total", "Количество запусков задач, отмененных из-за потери аренды")
+
+class LeaseLostError(Exception):
+    """Аренду задачи перехватил другой экземпляр бота во время ее выполнения"""
+
+async def acquire_lease(key: str, owner: str = WORKER_ID, ttl: int = SCHEDULER_LEASE_TTL) -> Tuple[bool, Optional[datetime]]:
+    """
+    Арендует периодическую задачу или продлевает аренду.
+
+    Аренда переходит к экземпляру одним условным UPDATE, только если она
+    принадлежит ему же или истекла, поэтому задачу одновременно держит не
+    больше одного экземпляра.
+
+    Args:
+        key: Имя задачи
+        owner: Идентификатор экземпляра бота
+        ttl: Срок аренды в секундах
+
+    Returns:
+        Tuple[bool, Optional[datetime]]: Получена ли аренда и время последнего запуска задачи
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+
+    async with async_session() as session:
+        result = await session.execute(
+            update(JobLease)
+            .where(JobLease.name == key)
+            .where(or_(
+                JobLease.owner == owner,
+                JobLease.expires_at.is_(None),
+                JobLease.expires_at < now
+            ))
+            .values(owner=owner, expires_at=expires_at)
+            .returning(JobLease.last_run_at)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is not None:
+            await session.commit()
+            return True, row.last_run_at
+
+        # Задачу арендовал другой экземпляр
+        if await session.scalar(select(JobLease.name).where(JobLease.name == key)):
+            await session.rollback()
+            return False, None
+
+        # Задача запускается впервые
+        session.add(JobLease(name=key, owner=owner, expires_at=expires_at))
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Другой экземпляр создал запись одновременно с нами
+            await session.rollback()
+            return False, None
+        return True, None
+
+async def record_run(key: str, started_at: datetime, owner: str = WORKER_ID) -> None:
+    """Сохраняет время запуска задачи"""
+    async with async_session() as session:
+        await session.execute(
+            update(JobLease)
+            .where(JobLease.name == key, JobLease.owner == owner)
+            .values(last_run_at=started_at)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+async def release_lease(key: str, owner: str = WORKER_ID) -> None:
+    """Освобождает аренду задачи, чтобы другой экземпляр перехватил ее без ожидания"""
+    async with async_session() as session:
+        await session.execute(
+            update(JobLease)
+            .where(JobLease.name == key, JobLease.owner == owner)
+            .values(owner=None, expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
 async def start_scheduler():
     """
     Запускает планировщик задач.
     """
-    logging.info("Запуск планировщика задач...")
-    
+    logging.info(f"Запуск планировщика задач (экземпляр {WORKER_ID})...")
+
     # Запускаем задачи
     if DEMO_MODE:
         tasks["demo_generator"] = asyncio.create_task(
             schedule_task(
                 generate_demo_requests,
                 interval=300 if DEBUG_MODE else 3600,  # 5 минут в режиме отладки, 1 час в обычном режиме
-                name="Генератор демо-заявок"
+                name="Генератор демо-заявок",
+                key="demo_generator",
+                timeout=60,
+                misfire=MISFIRE_SKIP  # Пропущенные демо-заявки не нужны
             )
         )
-    
+
     tasks["distribution_processor"] = asyncio.create_task(
         schedule_task(
             process_distributions,
             interval=60 if DEBUG_MODE else 300,  # 1 минута в режиме отладки, 5 минут в обычном режиме
-            name="Обработчик распределений"
+            name="Обработчик распределений",
+            key="distribution_processor"
         )
     )
-    
+
     tasks["cleanup_old_requests"] = asyncio.create_task(
         schedule_task(
             cleanup_old_requests,
             interval=3600 if DEBUG_MODE else 86400,  # 1 час в режиме отладки, 1 день в обычном режиме
-            name="Очистка старых заявок"
+            name="Очистка старых заявок",
+            key="cleanup_old_requests",
+            timeout=1800
         )
     )
-    
+
     tasks["cleanup_old_distributions"] = asyncio.create_task(
         schedule_task(
             cleanup_old_distributions,
             interval=3600 if DEBUG_MODE else 86400,  # 1 час в режиме отладки, 1 день в обычном режиме
-            name="Очистка старых распределений"
+            name="Очистка старых распределений",
+            key="cleanup_old_distributions",
+            timeout=1800
         )
     )
-    
+
     logging.info(f"Запущено {len(tasks)} задач")
 
-async def schedule_task(task_func, interval, name="Задача"):
+async def acquire_slot(key: str) -> None:
+    """
+    Ждет свободного места для выполнения задачи, продлевая ее аренду.
+
+    Args:
+        key: Имя задачи
+    """
+    while True:
+        try:
+            await asyncio.wait_for(job_slots.acquire(), timeout=SCHEDULER_LEASE_TTL / 3)
+            return
+        except asyncio.TimeoutError:
+            await acquire_lease(key)
+
+async def run_with_heartbeat(task_func, key: str, timeout: float):
+    """
+    Выполняет задачу, продлевая ее аренду, пока она работает.
+
+    Args:
+        task_func: Функция задачи
+        key: Имя задачи
+        timeout: Максимальное время выполнения в секундах
+
+    Raises:
+        asyncio.TimeoutError: Задача не завершилась за отведенное время и была отменена
+        LeaseLostError: Аренду перехватил другой экземпляр, задача была отменена
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    job = asyncio.create_task(task_func())
+    running[key] = job
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Отменяем задачу и даем ей время освободить ресурсы
+                job.cancel()
+                await asyncio.wait({job}, timeout=SCHEDULER_CANCEL_GRACE)
+                metrics.inc("bot_job_timeouts_total", job=key)
+                raise asyncio.TimeoutError(f"задача выполнялась дольше {timeout} секунд и была отменена")
+
+            done, _ = await asyncio.wait({job}, timeout=min(SCHEDULER_LEASE_TTL / 3, remaining))
+            if done:
+                return job.result()
+            held, _ = await acquire_lease(key)
+            if not held:
+                # Задачу уже запустил новый владелец аренды, два запуска одновременно недопустимы
+                job.cancel()
+                await asyncio.wait({job}, timeout=SCHEDULER_CANCEL_GRACE)
+                metrics.inc("bot_job_lease_lost_total", job=key)
+                raise LeaseLostError("аренда перехвачена другим экземпляром, задача отменена")
+    finally:
+        if not job.done():
+            job.cancel()
+
+async def schedule_task(task_func, interval, name="Задача", key=None, timeout=None, misfire=MISFIRE_COALESCE):
     """
     Планирует выполнение задачи с заданным интервалом.
-    
+
     Args:
         task_func: Функция задачи
         interval: Интервал выполнения в секундах
         name: Название задачи
+        key: Имя задачи в таблице аренды и метриках (по умолчанию имя функции)
+        timeout: Максимальное время выполнения в секундах (по умолчанию интервал)
+        misfire: Политика для пропущенных запусков (MISFIRE_COALESCE или MISFIRE_SKIP)
     """
+    key = key or task_func.__name__
+    timeout = timeout or interval
     logging.info(f"Запуск задачи '{name}' с интервалом {interval} секунд")
-    
+
+    leader = False
+    due_at = None
     while True:
+        try:
+            held, last_run_at = await acquire_lease(key)
+        except Exception as e:
+            logging.error(f"Ошибка при аренде задачи '{name}': {e}")
+            held, last_run_at = False, None
+
+        if held != leader:
+            leader = held
+            metrics.set_gauge("bot_job_leader", 1 if leader else 0, job=key)
+            logging.info(f"Задача '{name}' {'арендована' if leader else 'выполняется другим экземпляром'}")
+
+            # Пока задача была у другого экземпляра, расписание могло сдвинуться
+            if leader:
+                due_at = last_run_at + timedelta(seconds=interval) if last_run_at else datetime.utcnow()
+
+        if not held:
+            # Проверяем, не освободилась ли аренда
+            await asyncio.sleep(SCHEDULER_LEASE_TTL / 2 * (1 + random.uniform(0, SCHEDULER_JITTER)))
+            continue
+
+        if due_at <= datetime.utcnow():
+            due_at = await run_due_task(task_func, interval, name, key, timeout, misfire, due_at)
+
+        # Ждем до следующего запуска со случайным смещением, но продлеваем аренду до ее истечения
+        sleep_time = (due_at - datetime.utcnow()).total_seconds() + random.uniform(0, SCHEDULER_JITTER * interval)
+        sleep_time = min(max(sleep_time, 1), SCHEDULER_LEASE_TTL / 2)
+        logging.debug(f"Задача '{name}' будет проверена снова через {sleep_time:.1f} секунд")
+        await asyncio.sleep(sleep_time)
+
+async def run_due_task(task_func, interval, name, key, timeout, misfire, due_at: datetime) -> datetime:
+    """
+    Выполняет задачу, срок запуска которой наступил, с учетом политики пропущенных запусков.
+
+    Args:
+        task_func: Функция задачи
+        interval: Интервал выполнения в секундах
+        name: Название задачи
+        key: Имя задачи
+        timeout: Максимальное время выполнения в секундах
+        misfire: Политика для пропущенных запусков
+        due_at: Время, на которое был запланирован запуск
+
+    Returns:
+        datetime: Время следующего запуска
+    """
+    await acquire_slot(key)
+    try:
+        started_at = datetime.utcnow()
+        lag = (started_at - due_at).total_seconds()
+
+        previous = running.get(key)
+        if previous is not None and not previous.done():
+            # Отмененный по времени запуск еще не завершился
+            metrics.inc("bot_job_skipped_total", job=key, reason="running")
+            logging.warning(f"Задача '{name}' пропущена: предыдущий запуск еще выполняется")
+            return started_at + timedelta(seconds=interval)
+
+        if misfire == MISFIRE_SKIP and lag >= interval:
+            missed = int(lag // interval)
+            metrics.inc("bot_job_skipped_total", missed, job=key, reason="missed")
+            logging.info(f"Задача '{name}' пропустила {missed} запусков, следующий запуск по расписанию")
+            return due_at + timedelta(seconds=interval * (missed + 1))
+
+        metrics.observe("bot_job_lag_seconds", max(lag, 0.0), job=key)
         start_time = datetime.now()
         try:
+            await record_run(key, started_at)
             logging.debug(f"Выполнение задачи '{name}'")
-            await task_func()
+            with metrics.track("job", key):
+                await run_with_heartbeat(task_func, key, timeout)
             logging.debug(f"Задача '{name}' выполнена успешно")
+        except (asyncio.TimeoutError, LeaseLostError) as e:
+            logging.error(f"Задача '{name}' прервана: {e}")
         except Exception as e:
             logging.error(f"Ошибка при выполнении задачи '{name}': {e}")
-        
-        # Вычисляем время до следующего запуска
+
         execution_time = (datetime.now() - start_time).total_seconds()
-        sleep_time = max(0, interval - execution_time)
-        
-        if sleep_time > 0:
-            logging.debug(f"Задача '{name}' будет выполнена снова через {sleep_time:.1f} секунд")
-            await asyncio.sleep(sleep_time)
-        else:
+        if execution_time > interval:
             logging.warning(f"Задача '{name}' выполнялась дольше интервала ({execution_time:.1f} > {interval} секунд)")
-            await asyncio.sleep(1)  # Небольшая пауза, чтобы избежать перегрузки CPU
+
+        # Пропущенные за время выполнения запуски объединяются в один
+        return started_at + timedelta(seconds=interval)
+    finally:
+        job_slots.release()
+
+def job_summary() -> List[Dict[str, Any]]:
+    """
+    Возвращает сводку по задачам планировщика: время выполнения, задержку запуска,
+    отмены по времени и пропуски
+
+    Returns:
+        List[Dict[str, Any]]: Сводка, отсортированная по суммарному времени выполнения
+    """
+    lags = metrics.histograms.get("bot_job_lag_seconds", {})
+    timeouts = metrics.counters.get("bot_job_timeouts_total", {})
+    skipped = metrics.counters.get("bot_job_skipped_total", {})
+    leaders = metrics.gauges.get("bot_job_leader", {})
+
+    rows = metrics.summary("job")
+    for row in rows:
+        labels = (("job", row["name"]),)
+        lag = lags.get(labels)
+        row["lag_avg"] = lag.sum / lag.count if lag and lag.count else 0.0
+        row["lag_p95"] = lag.quantile(0.95) if lag else 0.0
+        row["timeouts"] = int(timeouts.get(labels, 0))
+        row["skipped"] = int(sum(value for key, value in skipped.items() if dict(key).get("job") == row["name"]))
+        row["leader"] = bool(leaders.get(labels))
+    return rows
 
 async def stop_scheduler():
     """
     Останавливает планировщик задач.
     """
     logging.info("Остановка планировщика задач...")
-    
+
     for name, task in tasks.items():
         if not task.done():
             task.cancel()
             logging.info(f"Задача '{name}' остановлена")
-    
+
+    # Дожидаемся остановки, иначе выполняющийся запуск продлит аренду уже после освобождения
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    jobs = [job for job in running.values() if not job.done()]
+    if jobs:
+        await asyncio.wait(jobs, timeout=SCHEDULER_CANCEL_GRACE)
+
+    for name in tasks:
+        # Освобождаем аренду, чтобы другой экземпляр сразу перехватил задачу
+        try:
+            await release_lease(name)
+        except Exception as e:
+            logging.error(f"Ошибка при освобождении аренды задачи '{name}': {e}")
+
     tasks.clear()
-    logging.info("Планировщик задач остановлен") 
\ No newline at end of file
+    logging.info("Планировщик задач остановлен")
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from bot.models import SubCategory, User, Category
+from bot.services.reference_cache import reference_cache
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -125,6 +126,7 @@ class SubCategoryService:
             
             self.session.add(subcategory)
             self.session.commit()
+            reference_cache.invalidate()
             
             return subcategory
         except SQLAlchemyError as e:
@@ -146,6 +148,7 @@ class SubCategoryService:
                     setattr(subcategory, key, value)
             
             self.session.commit()
+            reference_cache.invalidate()
             return True
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при обновлении подкатегории {subcategory_id}: {e}")
@@ -1,14 +1,19 @@
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, exists
 
-from bot.models import User, Category, City, Distribution, SubCategory
-from config import ADMIN_IDS
+from bot.database.pagination import keyset_page
+from bot.models import User, UserStatistics, Category, City, Distribution, DistributionStatus, SubCategory, user_category, user_city
+from bot.utils.cache import TTLCache
+from config import ADMIN_IDS, ADMIN_PAGE_SIZE, ADMIN_COUNT_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
+# Общее количество пользователей по фильтрам для списков админ-панели
+_users_count_cache = TTLCache(ADMIN_COUNT_CACHE_TTL)
+
 class UserService:
     """Сервис для работы с пользователями"""
     
@@ -143,6 +148,70 @@ class UserService:
         """
         return self.session.query(User).all()
     
+    def _filter_users(self, query, is_active: Optional[bool] = None,
+                      category_id: Optional[int] = None, city_id: Optional[int] = None):
+        """Добавляет к запросу фильтры списка пользователей"""
+        if is_active is not None:
+            query = query.filter(User.is_active == is_active)
+        if category_id is not None:
+            query = query.filter(exists().where(
+                user_category.c.user_id == User.id,
+                user_category.c.category_id == category_id
+            ))
+        if city_id is not None:
+            query = query.filter(exists().where(
+                user_city.c.user_id == User.id,
+                user_city.c.city_id == city_id
+            ))
+        return query
+    
+    def get_users_page(self, is_active: Optional[bool] = None, category_id: Optional[int] = None,
+                       city_id: Optional[int] = None, cursor: Optional[int] = None,
+                       direction: str = "next", limit: int = ADMIN_PAGE_SIZE) -> Tuple[List[User], bool, bool]:
+        """
+        Получает страницу пользователей, начиная с последних зарегистрированных.
+        
+        Используется пагинация по ключу (id), фильтры применяются в запросе.
+        
+        Args:
+            is_active (Optional[bool]): Фильтр по активности
+            category_id (Optional[int]): Только пользователи, выбравшие категорию
+            city_id (Optional[int]): Только пользователи, выбравшие город
+            cursor (Optional[int]): ID крайнего пользователя текущей страницы
+            direction (str): "next" - более ранние пользователи, "prev" - более поздние
+            limit (int): Размер страницы
+        
+        Returns:
+            Tuple[List[User], bool, bool]: Пользователи страницы,
+                есть ли предыдущая и есть ли следующая страница
+        """
+        query = self._filter_users(self.session.query(User), is_active, category_id, city_id)
+        
+        return keyset_page(query, (User.id,), None if cursor is None else (cursor,), direction, limit)
+    
+    def count_users(self, is_active: Optional[bool] = None, category_id: Optional[int] = None,
+                    city_id: Optional[int] = None) -> int:
+        """
+        Подсчитывает пользователей по фильтрам.
+        
+        Результат кэшируется на ADMIN_COUNT_CACHE_TTL секунд, чтобы листание
+        списка не пересчитывало всю таблицу на каждой странице.
+        
+        Args:
+            is_active (Optional[bool]): Фильтр по активности
+            category_id (Optional[int]): Только пользователи, выбравшие категорию
+            city_id (Optional[int]): Только пользователи, выбравшие город
+        
+        Returns:
+            int: Количество пользователей
+        """
+        return _users_count_cache.get_or_set(
+            (is_active, category_id, city_id),
+            lambda: self._filter_users(
+                self.session.query(func.count(User.id)), is_active, category_id, city_id
+            ).scalar()
+        )
+    
     def get_active_users(self) -> List[User]:
         """
         Получает список активных пользователей
@@ -165,30 +234,35 @@ class UserService:
         """
         Получает статистику по пользователю
         
+        Итоговые показатели поддерживаются при создании распределений, ответах
+        на них и их закрытии без ответа (bot/services/user_statistics.py) и читаются вместе с пользователем,
+        а не пересчитываются по всем распределениям.
+        
         Args:
             user_id (int): ID пользователя
         
         Returns:
             Dict[str, Any]: Статистика по пользователю
         """
-        user = self.get_user_by_id(user_id)
-        if not user:
+        row = self.session.query(User, UserStatistics).outerjoin(
+            UserStatistics, UserStatistics.user_id == User.id
+        ).options(
+            selectinload(User.categories),
+            selectinload(User.cities)
+        ).filter(User.id == user_id).first()
+        if not row:
             logger.warning(f"Пользователь с ID={user_id} не найден")
             return {}
         
-        # Количество полученных заявок
-        total_distributions = self.session.query(func.count(Distribution.id)).filter(
+        user, statistics = row
+        
+        # Статистика по статусам распределений одним запросом по индексу (user_id, created_at, id)
+        status_stats = {status.value: 0 for status in DistributionStatus}
+        for status, count in self.session.query(Distribution.status, func.count(Distribution.id)).filter(
             Distribution.user_id == user_id
-        ).scalar()
-        
-        # Статистика по статусам распределений
-        status_stats = {}
-        for status in ["отправлено", "просмотрено", "принято", "отклонено"]:
-            count = self.session.query(func.count(Distribution.id)).filter(
-                Distribution.user_id == user_id,
-                Distribution.status == status
-            ).scalar()
-            status_stats[status] = count
+        ).group_by(Distribution.status):
+            if status is not None:
+                status_stats[status.value] = count
         
         return {
             "user_id": user.id,
@@ -198,14 +272,37 @@ class UserService:
             "last_name": user.last_name,
             "is_admin": user.is_admin,
             "is_active": user.is_active,
-            "created_at": user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "last_activity": user.last_activity.strftime("%Y-%m-%d %H:%M:%S"),
-            "total_distributions": total_distributions,
+            "created_at": user.created_at.strftime("%Y-%m-%d %H:%M:%S") if user.created_at else None,
+            "last_activity": user.last_activity.strftime("%Y-%m-%d %H:%M:%S") if user.last_activity else None,
+            "total_distributions": statistics.total_requests if statistics else 0,
+            "processed_requests": statistics.processed_requests if statistics else 0,
+            "successful_requests": statistics.successful_requests if statistics else 0,
+            "expired_requests": (statistics.expired_requests or 0) if statistics else 0,
+            "avg_response_time": statistics.avg_response_time if statistics else 0.0,
+            "conversion_rate": statistics.conversion_rate if statistics else 0.0,
             "status_stats": status_stats,
             "categories": [category.name for category in user.categories],
             "cities": [city.name for city in user.cities]
         }
     
+    def get_top_users(self, limit: int = 10) -> List[Tuple[User, UserStatistics]]:
+        """
+        Получает пользователей с наибольшим количеством принятых заявок
+        
+        Args:
+            limit (int): Количество пользователей
+        
+        Returns:
+            List[Tuple[User, UserStatistics]]: Пользователи и их статистика по убыванию принятых заявок
+        """
+        return self.session.query(User, UserStatistics).join(
+            UserStatistics, UserStatistics.user_id == User.id
+        ).filter(User.is_active == True).order_by(
+            UserStatistics.successful_requests.desc(),
+            UserStatistics.conversion_rate.desc(),
+            User.id
+        ).limit(limit).all()
+    
     def add_category_to_user(self, user_id: int, category_id: int) -> bool:
         """
         Добавляет категорию пользователю
@@ -0,0 +1,192 @@
+"""
+Инкрементальное обновление статистики пользователей (таблица user_statistics).
+
+Статистика не пересчитывается по распределениям, а обновляется в той же
+транзакции, в которой распределение создается или получает ответ:
+
+    total_requests       +1 за каждое полученное распределение
+    processed_requests   +1 за каждый ответ (принято или отклонено)
+    successful_requests  +1 за каждую принятую заявку
+    expired_requests     +1 за каждое распределение, закрытое без ответа
+                         (истек срок или заявку принял другой исполнитель)
+    avg_response_time    скользящее среднее времени ответа
+    conversion_rate      successful_requests / total_requests * 100
+
+Каждое обновление - один INSERT ... ON CONFLICT DO UPDATE, поэтому строка
+статистики создается при первом распределении пользователю, а одновременные
+обновления не теряются. Удаление старых распределений статистику не меняет.
+
+Для распределений, записанных в обход сервисов (генератор нагрузочных
+данных), статистика заполняется одним запросом statistics_backfill().
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from bot.models import Distribution, DistributionStatus, UserStatistics
+
+# Статусы распределений, на которые пользователь ответил
+ANSWERED_STATUSES = (DistributionStatus.ACCEPTED, DistributionStatus.REJECTED, DistributionStatus.COMPLETED)
+SUCCESSFUL_STATUSES = (DistributionStatus.ACCEPTED, DistributionStatus.COMPLETED)
+
+def _insert(session):
+    """Создает INSERT с поддержкой ON CONFLICT для диалекта базы данных сессии"""
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(UserStatistics)
+
+def _conversion_rate(successful, total):
+    """Выражение процента конверсии"""
+    return case((total > 0, successful * 100.0 / total), else_=0.0)
+
+def distributions_created(session, user_ids: Iterable[int]):
+    """
+    Создает запрос, учитывающий новые распределения пользователям.
+
+    Args:
+        session: Сессия базы данных (синхронная или асинхронная), нужна для выбора диалекта
+        user_ids: ID пользователей, по одному на каждое созданное распределение
+
+    Returns:
+        Запрос для session.execute() или None, если распределений нет
+    """
+    counts = Counter(user_ids)
+    if not counts:
+        return None
+
+    now = datetime.utcnow()
+    statement = _insert(session).values([
+        {
+            "user_id": user_id,
+            "total_requests": count,
+            "processed_requests": 0,
+            "successful_requests": 0,
+            "avg_response_time": 0.0,
+            "conversion_rate": 0.0,
+            "last_updated": now
+        }
+        for user_id, count in sorted(counts.items())
+    ])
+    current = UserStatistics.__table__.c
+    total = func.coalesce(current.total_requests, 0) + statement.excluded.total_requests
+    return statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "total_requests": total,
+            "conversion_rate": _conversion_rate(func.coalesce(current.successful_requests, 0), total),
+            "last_updated": statement.excluded.last_updated
+        }
+    )
+
+def distribution_answered(session, user_id: int, accepted: bool, response_time: Optional[float] = None):
+    """
+    Создает запрос, учитывающий ответ пользователя на распределение.
+
+    Args:
+        session: Сессия базы данных (синхронная или асинхронная), нужна для выбора диалекта
+        user_id: ID пользователя
+        accepted: Пользователь принял заявку
+        response_time: Время ответа в секундах (None - не учитывать в среднем)
+
+    Returns:
+        Запрос для session.execute()
+    """
+    statement = _insert(session).values(
+        user_id=user_id,
+        total_requests=1,
+        processed_requests=1,
+        successful_requests=int(accepted),
+        avg_response_time=float(response_time or 0.0),
+        conversion_rate=100.0 if accepted else 0.0,
+        last_updated=datetime.utcnow()
+    )
+    current = UserStatistics.__table__.c
+    processed = func.coalesce(current.processed_requests, 0)
+    successful = func.coalesce(current.successful_requests, 0) + statement.excluded.successful_requests
+    average = func.coalesce(current.avg_response_time, 0.0)
+
+    values = {
+        "processed_requests": processed + 1,
+        "successful_requests": successful,
+        "conversion_rate": _conversion_rate(successful, func.coalesce(current.total_requests, 0)),
+        "last_updated": statement.excluded.last_updated
+    }
+    if response_time is not None:
+        # Скользящее среднее: avg += (x - avg) / n
+        values["avg_response_time"] = average + (statement.excluded.avg_response_time - average) / (processed + 1)
+
+    return statement.on_conflict_do_update(index_elements=["user_id"], set_=values)
+
+def distributions_expired(session, user_ids: Iterable[int]):
+    """
+    Создает запрос, учитывающий распределения, закрытые без ответа пользователя.
+
+    Args:
+        session: Сессия базы данных (синхронная или асинхронная), нужна для выбора диалекта
+        user_ids: ID пользователей, по одному на каждое закрытое распределение
+
+    Returns:
+        Запрос для session.execute() или None, если распределений нет
+    """
+    counts = Counter(user_ids)
+    if not counts:
+        return None
+
+    now = datetime.utcnow()
+    statement = _insert(session).values([
+        {
+            "user_id": user_id,
+            "total_requests": count,
+            "processed_requests": 0,
+            "successful_requests": 0,
+            "expired_requests": count,
+            "avg_response_time": 0.0,
+            "conversion_rate": 0.0,
+            "last_updated": now
+        }
+        for user_id, count in sorted(counts.items())
+    ])
+    current = UserStatistics.__table__.c
+    return statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "expired_requests": func.coalesce(current.expired_requests, 0) + statement.excluded.expired_requests,
+            "last_updated": statement.excluded.last_updated
+        }
+    )
+
+def statistics_backfill(condition=None):
+    """
+    Создает запрос, заполняющий статистику по существующим распределениям.
+
+    Строк статистики для выбранных пользователей еще не должно быть.
+
+    Args:
+        condition: Условие отбора распределений (по умолчанию все)
+
+    Returns:
+        Запрос INSERT ... SELECT для connection.execute()
+    """
+    def count(statuses):
+        return func.sum(case((Distribution.status.in_(statuses), 1), else_=0))
+
+    total = func.count(Distribution.id)
+    query = select(
+        Distribution.user_id,
+        total,
+        count(ANSWERED_STATUSES),
+        count(SUCCESSFUL_STATUSES),
+        count([DistributionStatus.EXPIRED]),
+        func.coalesce(func.avg(case((Distribution.status.in_(ANSWERED_STATUSES), Distribution.response_time))), 0.0),
+        _conversion_rate(count(SUCCESSFUL_STATUSES), total),
+        func.now()
+    ).group_by(Distribution.user_id)
+    if condition is not None:
+        query = query.where(condition)
+
+    return insert(UserStatistics).from_select([
+        "user_id", "total_requests", "processed_requests", "successful_requests", "expired_requests",
+        "avg_response_time", "conversion_rate", "last_updated"
+    ], query)
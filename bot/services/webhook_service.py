@@ -0,0 +1,141 @@
+"""
+Сервис для получения обновлений через вебхук
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (
+    BOT_MODE,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT
+)
+
+logger = logging.getLogger(__name__)
+
+def create_webhook_app(
+    dp: Dispatcher,
+    bot: Bot,
+    path: str = WEBHOOK_PATH,
+    secret_token: Optional[str] = WEBHOOK_SECRET
+) -> web.Application:
+    """
+    Создает aiohttp-приложение, принимающее обновления от Telegram.
+
+    Запросы без правильного заголовка X-Telegram-Bot-Api-Secret-Token
+    отклоняются с кодом 401. На остальные запросы сразу отправляется ответ,
+    а обновление обрабатывается диспетчером в фоновой задаче, поэтому
+    медленные обработчики не задерживают ответ Telegram.
+
+    Args:
+        dp: Диспетчер
+        bot: Экземпляр бота
+        path: Путь для приема обновлений
+        secret_token: Секретный токен вебхука
+
+    Returns:
+        web.Application: Настроенное приложение
+    """
+    app = web.Application()
+
+    handler = SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token
+    )
+    # Маршрут добавляется без register(): он закрывал бы сессию бота при остановке
+    # приложения, а ее закрывает код, который создал бота
+    app.router.add_route("POST", path, handler.handle)
+
+    # Вызывает обработчики startup/shutdown диспетчера вместе с приложением
+    setup_application(app, dp, bot=bot)
+
+    return app
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    allowed_updates: Optional[List[str]] = None,
+    drop_pending_updates: bool = False
+) -> None:
+    """
+    Регистрирует вебхук в Telegram и запускает веб-сервер до остановки процесса
+
+    Args:
+        dp: Диспетчер
+        bot: Экземпляр бота
+        allowed_updates: Типы обновлений, которые нужно получать
+        drop_pending_updates: Пропустить накопившиеся обновления
+    """
+    if not WEBHOOK_BASE_URL:
+        raise ValueError("Для работы в режиме webhook необходимо указать WEBHOOK_BASE_URL")
+    if not WEBHOOK_SECRET:
+        raise ValueError("Для работы в режиме webhook необходимо указать WEBHOOK_SECRET")
+
+    webhook_url = f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}"
+    app = create_webhook_app(dp, bot)
+
+    async def on_startup(app: web.Application) -> None:
+        await bot.set_webhook(
+            url=webhook_url,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=drop_pending_updates
+        )
+        logger.info(f"Вебхук установлен: {webhook_url}")
+
+    app.on_startup.append(on_startup)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+
+    try:
+        await site.start()
+        logger.info(f"Веб-сервер запущен на {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+        # Работаем, пока задачу не отменят
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        logger.info("Веб-сервер остановлен")
+
+async def start_bot(
+    dp: Dispatcher,
+    bot: Bot,
+    allowed_updates: Optional[List[str]] = None,
+    drop_pending_updates: bool = False
+) -> None:
+    """
+    Запускает получение обновлений в режиме, заданном настройкой BOT_MODE
+
+    Сессию бота закрывает вызывающий код после остановки.
+
+    Args:
+        dp: Диспетчер
+        bot: Экземпляр бота
+        allowed_updates: Типы обновлений, которые нужно получать
+        drop_pending_updates: Пропустить накопившиеся обновления
+    """
+    if BOT_MODE == "webhook":
+        logger.info("Запуск бота в режиме webhook")
+        await run_webhook(
+            dp,
+            bot,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=drop_pending_updates
+        )
+        return
+
+    # Пока установлен вебхук, Telegram не отдает обновления через getUpdates
+    await bot.delete_webhook(drop_pending_updates=drop_pending_updates)
+
+    logger.info("Запуск бота в режиме polling")
+    await dp.start_polling(bot, allowed_updates=allowed_updates, close_bot_session=False)
@@ -0,0 +1,25 @@
+"""
+Разбиение потоков значений на пакеты фиксированного размера
+"""
+import itertools
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+def batched(rows: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Разбивает поток значений на пакеты
+
+    Args:
+        rows: Поток значений
+        size: Размер пакета
+
+    Yields:
+        List[T]: Пакет значений
+    """
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
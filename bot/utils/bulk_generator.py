@@ -0,0 +1,288 @@
+"""
+Генератор больших объемов синтетических данных для нагрузочного тестирования.
+
+Пользователи, их подписки на категории и города, заявки и распределения
+генерируются потоком и записываются пакетами через вставки SQLAlchemy Core,
+без создания ORM-объектов. При одинаковом seed генерируются одинаковые данные.
+Статистика новых пользователей (user_statistics) считается по записанным
+распределениям одним запросом в конце генерации.
+"""
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from bot.models import (
+    Category, City, Distribution, DistributionStatus, Request, RequestStatus, User,
+    user_category, user_city
+)
+from bot.services.user_statistics import statistics_backfill
+from bot.utils.batching import batched
+from bot.utils.demo_config import DEMO_CLIENTS, DEMO_REQUEST_TEMPLATES
+from config import DEFAULT_CATEGORIES, DEFAULT_CITIES, DEFAULT_USERS_PER_REQUEST
+
+logger = logging.getLogger(__name__)
+
+# Количество строк в одной пакетной вставке
+DEFAULT_BATCH_SIZE = 5000
+
+# Telegram ID синтетических пользователей начинаются с этого значения,
+# чтобы не пересекаться с настоящими пользователями
+SYNTHETIC_TELEGRAM_ID_BASE = 9_000_000_000
+
+# Доли статусов распределений
+DISTRIBUTION_STATUS_WEIGHTS = (
+    (DistributionStatus.ACCEPTED, 0.35),
+    (DistributionStatus.REJECTED, 0.25),
+    (DistributionStatus.EXPIRED, 0.25),
+    (DistributionStatus.COMPLETED, 0.10),
+    (DistributionStatus.PENDING, 0.05)
+)
+
+# Доли статусов заявок старше недели (более свежие заявки остаются новыми или в работе)
+REQUEST_STATUS_WEIGHTS = (
+    (RequestStatus.COMPLETED, 0.45),
+    (RequestStatus.EXPIRED, 0.25),
+    (RequestStatus.IN_PROGRESS, 0.10),
+    (RequestStatus.CLIENT_REJECTED, 0.10),
+    (RequestStatus.NOT_ACTUAL, 0.10)
+)
+
+STREETS = ["Ленина", "Пушкина", "Гагарина", "Мира", "Советская", "Центральная", "Молодежная", "Школьная", "Лесная", "Садовая"]
+
+class BulkDataGenerator:
+    """Детерминированный генератор пользователей, заявок и распределений"""
+
+    def __init__(self, seed: int = 42, batch_size: int = DEFAULT_BATCH_SIZE, days: int = 365,
+                 now: Optional[datetime] = None):
+        """
+        Инициализирует генератор
+
+        Args:
+            seed: Начальное значение генератора случайных чисел
+            batch_size: Количество строк в одной пакетной вставке
+            days: За сколько последних дней распределяются даты создания
+            now: Момент, от которого отсчитываются даты (по умолчанию текущее время)
+        """
+        self.seed = seed
+        self.batch_size = batch_size
+        self.days = days
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        self.random = random.Random(seed)
+
+    def _choices(self, weighted: Tuple[Tuple[Any, float], ...]) -> Iterator[Any]:
+        """Бесконечный поток значений с заданными долями"""
+        values = [value for value, _ in weighted]
+        weights = [weight for _, weight in weighted]
+        while True:
+            yield from self.random.choices(values, weights, k=1024)
+
+    def _random_date(self) -> datetime:
+        """Случайный момент за последние self.days дней"""
+        return self.now - timedelta(seconds=self.random.randrange(self.days * 86400))
+
+    def user_rows(self, first_id: int, count: int) -> Iterator[Dict[str, Any]]:
+        """Генерирует строки таблицы users"""
+        for user_id in range(first_id, first_id + count):
+            first_name, last_name = self.random.choice(DEMO_CLIENTS)[0].split(" ", 1)
+            created_at = self._random_date()
+            yield {
+                "id": user_id,
+                "telegram_id": SYNTHETIC_TELEGRAM_ID_BASE + user_id,
+                "username": f"load_user_{user_id}",
+                "first_name": first_name,
+                "last_name": last_name,
+                "phone": None,
+                "is_admin": False,
+                "is_active": self.random.random() < 0.9,
+                "created_at": created_at,
+                "last_activity": created_at + timedelta(seconds=self.random.randrange(86400 * 30)),
+                "rating": round(self.random.uniform(0, 5), 2)
+            }
+
+    def subscription_rows(self, first_user_id: int, count: int, category_ids: List[int],
+                          city_ids: List[int], subscribers: Dict[Tuple[int, int], List[int]]
+                          ) -> Tuple[Iterator[Dict[str, int]], Iterator[Dict[str, int]]]:
+        """
+        Генерирует подписки пользователей на категории и города
+
+        Заполняет subscribers: {(категория, город): [ID пользователей]}, по
+        которому затем выбираются получатели распределений.
+
+        Returns:
+            Tuple: Строки user_category и строки user_city
+        """
+        category_rows: List[Dict[str, int]] = []
+        city_rows: List[Dict[str, int]] = []
+        for user_id in range(first_user_id, first_user_id + count):
+            categories = self.random.sample(category_ids, min(len(category_ids), self.random.randint(1, 3)))
+            cities = self.random.sample(city_ids, min(len(city_ids), self.random.randint(1, 2)))
+            category_rows.extend({"user_id": user_id, "category_id": category_id} for category_id in categories)
+            city_rows.extend({"user_id": user_id, "city_id": city_id} for city_id in cities)
+            for category_id in categories:
+                for city_id in cities:
+                    subscribers.setdefault((category_id, city_id), []).append(user_id)
+        return iter(category_rows), iter(city_rows)
+
+    def request_rows(self, first_id: int, count: int, categories: List[Tuple[int, str]],
+                     city_ids: List[int]) -> Iterator[Dict[str, Any]]:
+        """Генерирует строки таблицы requests"""
+        statuses = self._choices(REQUEST_STATUS_WEIGHTS)
+        week_ago = self.now - timedelta(days=7)
+        for request_id in range(first_id, first_id + count):
+            category_id, category_name = self.random.choice(categories)
+            client_name, client_phone = self.random.choice(DEMO_CLIENTS)
+            created_at = self._random_date()
+            area = round(self.random.uniform(20, 200), 2)
+            templates = DEMO_REQUEST_TEMPLATES.get(category_name) or ["Требуется консультация специалиста."]
+            if created_at >= week_ago:
+                status = RequestStatus.NEW if self.random.random() < 0.7 else RequestStatus.IN_PROGRESS
+            else:
+                status = next(statuses)
+            yield {
+                "id": request_id,
+                "client_name": client_name,
+                "client_phone": client_phone,
+                "description": self.random.choice(templates),
+                "status": status,
+                "area": area,
+                "area_value": area,
+                "address": f"ул. {self.random.choice(STREETS)}, д. {self.random.randint(1, 150)}",
+                "is_demo": True,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "estimated_cost": round(self.random.uniform(5000, 100000), 2),
+                "category_id": category_id,
+                "city_id": self.random.choice(city_ids),
+                "has_design_project": self.random.random() < 0.2
+            }
+
+    def distribution_rows(self, requests: Iterable[Dict[str, Any]], first_id: int, per_request: int,
+                          subscribers: Dict[Tuple[int, int], List[int]], all_user_ids: range
+                          ) -> Iterator[Dict[str, Any]]:
+        """
+        Генерирует распределения для потока заявок
+
+        Получатели выбираются среди пользователей, подписанных на категорию и
+        город заявки, а если таких нет - среди всех пользователей.
+        """
+        statuses = self._choices(DISTRIBUTION_STATUS_WEIGHTS)
+        distribution_id = first_id
+        for request in requests:
+            candidates = subscribers.get((request["category_id"], request["city_id"])) or all_user_ids
+            recipients = self.random.sample(candidates, min(per_request, len(candidates)))
+            for user_id in recipients:
+                created_at = request["created_at"] + timedelta(seconds=self.random.randrange(600))
+                status = next(statuses)
+                answered = status in (DistributionStatus.ACCEPTED, DistributionStatus.REJECTED, DistributionStatus.COMPLETED)
+                response_time = self.random.randrange(60, 86400) if answered else None
+                yield {
+                    "id": distribution_id,
+                    "request_id": request["id"],
+                    "user_id": user_id,
+                    "status": status,
+                    "created_at": created_at,
+                    "updated_at": created_at + timedelta(seconds=response_time or 0),
+                    "response_time": response_time,
+                    "is_converted": status == DistributionStatus.COMPLETED,
+                    "expires_at": created_at + timedelta(days=1)
+                }
+                distribution_id += 1
+
+    def _insert(self, connection: Connection, table, rows: Iterable[Dict[str, Any]]) -> int:
+        """Записывает поток строк пакетами и возвращает их количество"""
+        total = 0
+        statement = insert(table)
+        for batch in batched(rows, self.batch_size):
+            connection.execute(statement, batch)
+            total += len(batch)
+        return total
+
+    def _reference_data(self, connection: Connection) -> Tuple[List[Tuple[int, str]], List[int]]:
+        """Возвращает активные категории и города, создавая стандартные при их отсутствии"""
+        categories = [tuple(row) for row in connection.execute(
+            select(Category.id, Category.name).where(Category.is_active == True).order_by(Category.id)
+        )]
+        if not categories:
+            connection.execute(insert(Category.__table__), [{"name": name, "is_active": True} for name in DEFAULT_CATEGORIES])
+            return self._reference_data(connection)
+
+        city_ids = [row[0] for row in connection.execute(
+            select(City.id).where(City.is_active == True).order_by(City.id)
+        )]
+        if not city_ids:
+            connection.execute(insert(City.__table__), [{"name": name, "is_active": True} for name in DEFAULT_CITIES])
+            return self._reference_data(connection)
+
+        return categories, city_ids
+
+    def populate(self, engine: Engine, users: int, requests: int,
+                 distributions_per_request: int = DEFAULT_USERS_PER_REQUEST) -> Dict[str, int]:
+        """
+        Заполняет базу данных синтетическими данными
+
+        Новые строки получают ID после уже существующих, поэтому генератор
+        можно запускать на непустой базе.
+
+        Args:
+            engine: Движок базы данных
+            users: Количество пользователей
+            requests: Количество заявок
+            distributions_per_request: Сколько пользователей получает каждую заявку
+
+        Returns:
+            Dict[str, int]: Количество записанных строк по таблицам
+        """
+        started = time.monotonic()
+        counts: Dict[str, int] = {}
+
+        with engine.begin() as connection:
+            categories, city_ids = self._reference_data(connection)
+            first_user_id = (connection.execute(select(func.max(User.id))).scalar() or 0) + 1
+            first_request_id = (connection.execute(select(func.max(Request.id))).scalar() or 0) + 1
+            first_distribution_id = (connection.execute(select(func.max(Distribution.id))).scalar() or 0) + 1
+
+            counts["users"] = self._insert(connection, User.__table__, self.user_rows(first_user_id, users))
+
+            subscribers: Dict[Tuple[int, int], List[int]] = {}
+            category_rows, city_rows = self.subscription_rows(
+                first_user_id, users, [category_id for category_id, _ in categories], city_ids, subscribers
+            )
+            counts["user_categories"] = self._insert(connection, user_category, category_rows)
+            counts["user_cities"] = self._insert(connection, user_city, city_rows)
+            logger.info(f"Записано {counts['users']} пользователей за {time.monotonic() - started:.1f} с")
+
+        # Заявки и распределения записываются вместе, каждая пара пакетов - отдельной транзакцией,
+        # чтобы не держать в памяти весь поток и не раздувать журнал базы данных
+        counts["requests"] = counts["distributions"] = 0
+        all_user_ids = range(first_user_id, first_user_id + users)
+        request_stream = self.request_rows(first_request_id, requests, categories, city_ids)
+        next_distribution_id = first_distribution_id
+
+        for batch in batched(request_stream, self.batch_size):
+            with engine.begin() as connection:
+                connection.execute(insert(Request.__table__), batch)
+                counts["requests"] += len(batch)
+                if users and distributions_per_request:
+                    inserted = self._insert(connection, Distribution.__table__, self.distribution_rows(
+                        batch, next_distribution_id, distributions_per_request, subscribers, all_user_ids
+                    ))
+                    counts["distributions"] += inserted
+                    next_distribution_id += inserted
+
+            if counts["requests"] % (self.batch_size * 20) == 0:
+                elapsed = time.monotonic() - started
+                logger.info(f"Записано {counts['requests']} заявок за {elapsed:.1f} с ({counts['requests'] / elapsed:.0f} заявок/с)")
+
+        # Распределения записаны в обход сервисов, поэтому статистику новых пользователей считаем по ним
+        with engine.begin() as connection:
+            result = connection.execute(statistics_backfill(Distribution.user_id >= first_user_id))
+            counts["user_statistics"] = result.rowcount
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Генерация завершена за {elapsed:.1f} с: {counts}")
+        return counts
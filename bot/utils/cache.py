@@ -0,0 +1,67 @@
+"""
+Простой кэш значений с ограниченным временем жизни
+"""
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Кэш, в котором каждое значение хранится не дольше ttl секунд"""
+
+    def __init__(self, ttl: float, max_size: int = 1000):
+        """
+        Инициализирует кэш
+
+        Args:
+            ttl: Время жизни значения в секундах
+            max_size: Максимальное количество значений (при переполнении кэш очищается)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._values: Dict[Hashable, Tuple[Any, float]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение, если оно есть в кэше и не устарело
+
+        Args:
+            key: Ключ значения
+
+        Returns:
+            Optional[Any]: Значение или None
+        """
+        cached = self._values.get(key)
+        if cached is None:
+            return None
+
+        value, expires_at = cached
+        if time.monotonic() >= expires_at:
+            del self._values[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохраняет значение в кэше"""
+        if len(self._values) >= self.max_size and key not in self._values:
+            self._values.clear()
+        self._values[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Возвращает значение из кэша или вычисляет и сохраняет его
+
+        Args:
+            key: Ключ значения
+            factory: Функция, вычисляющая значение при промахе
+
+        Returns:
+            Any: Значение
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Удаляет все значения"""
+        self._values.clear()
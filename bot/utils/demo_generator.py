@@ -19,6 +19,7 @@ from bot.utils.demo_config import (
     DEMO_INFO_MESSAGES
 )
 from bot.utils.encryption import mask_phone_number
+from bot.services.reference_cache import reference_cache, ReferenceItem
 
 logger = logging.getLogger(__name__)
 
@@ -108,35 +109,27 @@ def should_generate_demo_request() -> bool:
         if 'session' in locals():
             session.close()
 
-def get_active_categories() -> List[Category]:
+def get_active_categories() -> List[ReferenceItem]:
     """
-    Получает список активных категорий
+    Получает список активных категорий из кэша справочников
     
     Returns:
-        List[Category]: Список активных категорий
+        List[ReferenceItem]: Список активных категорий
     """
-    session = get_session()
-    try:
-        categories = session.query(Category).filter(Category.is_active == True).all()
-        logger.debug(f"Найдено {len(categories)} активных категорий")
-        return categories
-    finally:
-        session.close()
+    categories = reference_cache.categories()
+    logger.debug(f"Найдено {len(categories)} активных категорий")
+    return categories
 
-def get_active_cities() -> List[City]:
+def get_active_cities() -> List[ReferenceItem]:
     """
-    Получает список активных городов
+    Получает список активных городов из кэша справочников
     
     Returns:
-        List[City]: Список активных городов
+        List[ReferenceItem]: Список активных городов
     """
-    session = get_session()
-    try:
-        cities = session.query(City).filter(City.is_active == True).all()
-        logger.debug(f"Найдено {len(cities)} активных городов")
-        return cities
-    finally:
-        session.close()
+    cities = reference_cache.cities()
+    logger.debug(f"Найдено {len(cities)} активных городов")
+    return cities
 
 def generate_demo_request() -> Optional[Dict[str, Any]]:
     """
@@ -0,0 +1,55 @@
+"""
+Индекс числовых диапазонов для поиска диапазонов, содержащих значение.
+"""
+from bisect import bisect_left
+from typing import Hashable, Iterable, Optional, Tuple
+
+class IntervalIndex:
+    """
+    Индекс отрезков [min, max] с открытыми концами.
+
+    Границы всех отрезков сортируются и делят числовую ось на точки и
+    промежутки между ними. Для каждой точки и промежутка заранее
+    вычисляются ключи содержащих их отрезков, поэтому поиск - это один
+    бинарный поиск, O(log n). Память в худшем случае O(n²), что приемлемо
+    для справочников из десятков диапазонов.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[Optional[float], Optional[float], Hashable]]):
+        """
+        Строит индекс
+
+        Args:
+            intervals: Тройки (min, max, ключ). None вместо границы означает открытый конец,
+                отрезки без обеих границ не индексируются
+        """
+        intervals = [(low, high, key) for low, high, key in intervals if low is not None or high is not None]
+        self._points = sorted({point for low, high, _ in intervals for point in (low, high) if point is not None})
+
+        # Ячейка 2i - промежуток перед i-й границей, 2i+1 - сама граница,
+        # последняя ячейка - промежуток после последней границы
+        slots = [[] for _ in range(2 * len(self._points) + 1)]
+        for low, high, key in intervals:
+            first = 0 if low is None else 2 * bisect_left(self._points, low) + 1
+            last = len(slots) - 1 if high is None else 2 * bisect_left(self._points, high) + 1
+            for slot in range(first, last + 1):
+                slots[slot].append(key)
+        self._slots = [tuple(keys) for keys in slots]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def find(self, value: float) -> Tuple[Hashable, ...]:
+        """
+        Находит отрезки, содержащие значение (границы включительно)
+
+        Args:
+            value: Значение
+
+        Returns:
+            Tuple[Hashable, ...]: Ключи отрезков в порядке добавления
+        """
+        position = bisect_left(self._points, value)
+        if position < len(self._points) and self._points[position] == value:
+            return self._slots[2 * position + 1]
+        return self._slots[2 * position]
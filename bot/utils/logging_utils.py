@@ -0,0 +1,157 @@
+"""
+Утилиты для неблокирующего структурированного логирования
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Union
+
+# Стандартные атрибуты LogRecord, которые не нужно дублировать в JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует записи лога в JSON, по одной записи на строку.
+
+    Поля, переданные через extra, добавляются в запись как есть.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Форматирует запись
+
+        Args:
+            record: Запись лога
+
+        Returns:
+            str: Строка JSON
+        """
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Обработчик, передающий записи в очередь без форматирования.
+
+    Стандартный QueueHandler форматирует запись в потоке, который ее создал,
+    то есть в цикле событий. Здесь подставляются только аргументы сообщения,
+    а форматирование и запись в файл выполняются в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Фиксирует текст сообщения, чтобы аргументы не изменились до записи"""
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class LogSampler:
+    """Выборочное логирование событий с заданной для каждого типа долей"""
+
+    def __init__(self, rates: Dict[str, float]):
+        """
+        Инициализирует выборку
+
+        Args:
+            rates: Доля логируемых событий для каждого типа (от 0 до 1),
+                ключ "default" задает долю для остальных типов
+        """
+        self.rates = rates
+        self.default_rate = rates.get("default", 1.0)
+
+    def should_log(self, event_type: str) -> bool:
+        """
+        Определяет, нужно ли логировать событие
+
+        Args:
+            event_type: Тип события
+
+        Returns:
+            bool: True, если событие попало в выборку
+        """
+        rate = self.rates.get(event_type, self.default_rate)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+def setup_queue_logging(
+    level: Union[int, str],
+    log_file: str,
+    log_format: str,
+    json_format: bool = True
+) -> QueueListener:
+    """
+    Настраивает корневой логгер на запись через очередь.
+
+    Записи передаются в очередь обработчиком LazyQueueHandler, а файловый и
+    консольный обработчики работают в отдельном потоке QueueListener, поэтому
+    запись на диск не блокирует цикл событий.
+
+    Args:
+        level: Уровень логирования
+        log_file: Путь к файлу лога
+        log_format: Формат для консоли (и для файла, если json_format=False)
+        json_format: Записывать файл лога в формате JSON
+
+    Returns:
+        QueueListener: Запущенный обработчик очереди
+    """
+    global _listener
+
+    stop_queue_logging()
+
+    file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(log_format))
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(log_format))
+
+    handlers: List[logging.Handler] = [file_handler, console_handler]
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        handler.close()
+    root_logger.addHandler(LazyQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    return _listener
+
+def stop_queue_logging() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток логирования"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_queue_logging)
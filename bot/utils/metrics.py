@@ -0,0 +1,232 @@
+"""
+Утилиты для сбора метрик: гистограммы времени выполнения, счетчики ошибок
+и количество выполняющихся обработчиков и задач
+"""
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Границы корзин гистограмм в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение"""
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценивает квантиль по границам корзин
+
+        Args:
+            q: Квантиль от 0 до 1
+
+        Returns:
+            float: Верхняя граница корзины, в которую попадает квантиль
+        """
+        if not self.count:
+            return 0.0
+
+        threshold = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    """Хранилище метрик с выводом в текстовом формате Prometheus"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # {имя метрики: {метки: значение}}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.help: Dict[str, str] = {}
+        # Дополнительные контекстные менеджеры, которые открываются в track()
+        self.scope_hooks: List[Callable[[str, str], Any]] = []
+
+    def describe(self, name: str, text: str) -> None:
+        """Задает описание метрики для вывода в HELP"""
+        self.help[name] = text
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Добавляет наблюдение в гистограмму"""
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Увеличивает счетчик"""
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def add_gauge(self, name: str, amount: float, **labels: str) -> None:
+        """Изменяет значение датчика на amount"""
+        series = self.gauges.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Устанавливает значение датчика"""
+        self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def add_scope_hook(self, hook: Callable[[str, str], Any]) -> None:
+        """
+        Регистрирует контекстный менеджер, оборачивающий каждый отслеживаемый блок
+
+        Args:
+            hook: Фабрика контекстного менеджера, принимающая тип операции и имя
+        """
+        if hook not in self.scope_hooks:
+            self.scope_hooks.append(hook)
+
+    def clear(self) -> None:
+        """Удаляет все накопленные значения"""
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+    @contextmanager
+    def track(self, kind: str, name: str) -> Iterator[None]:
+        """
+        Замеряет время выполнения блока и учитывает ошибки и выполняющиеся операции
+
+        Args:
+            kind: Тип операции (handler или job), он же имя метки
+            name: Имя обработчика или задачи
+        """
+        labels = {kind: name}
+        self.add_gauge(f"bot_{kind}_in_progress", 1, **labels)
+        start_time = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for hook in self.scope_hooks:
+                    stack.enter_context(hook(kind, name))
+                yield
+        except Exception:
+            self.inc(f"bot_{kind}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"bot_{kind}_duration_seconds", time.perf_counter() - start_time, **labels)
+            self.add_gauge(f"bot_{kind}_in_progress", -1, **labels)
+
+    def render(self) -> str:
+        """
+        Формирует текст в формате Prometheus
+
+        Returns:
+            str: Метрики в текстовом формате
+        """
+        lines: List[str] = []
+
+        def header(name: str, metric_type: str) -> None:
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for name, series in sorted(self.counters.items()):
+            header(name, "counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, series in sorted(self.gauges.items()):
+            header(name, "gauge")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, series in sorted(self.histograms.items()):
+            header(name, "histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    bucket_labels = labels + (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self, kind: str) -> List[Dict[str, Any]]:
+        """
+        Возвращает сводку по обработчикам или задачам
+
+        Args:
+            kind: Тип операции (handler или job)
+
+        Returns:
+            List[Dict[str, Any]]: Сводка, отсортированная по суммарному времени выполнения
+        """
+        errors = self.counters.get(f"bot_{kind}_errors_total", {})
+        statements = self.counters.get(f"bot_{kind}_db_statements_total", {})
+        in_progress = self.gauges.get(f"bot_{kind}_in_progress", {})
+
+        rows = []
+        for labels, histogram in self.histograms.get(f"bot_{kind}_duration_seconds", {}).items():
+            rows.append({
+                "name": dict(labels).get(kind, ""),
+                "count": histogram.count,
+                "avg": histogram.sum / histogram.count if histogram.count else 0.0,
+                "p95": histogram.quantile(0.95),
+                "total": histogram.sum,
+                "errors": int(errors.get(labels, 0)),
+                "in_progress": int(in_progress.get(labels, 0)),
+                "db_statements": statements.get(labels, 0) / histogram.count if histogram.count else 0.0
+            })
+
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+def _format_labels(labels: Labels) -> str:
+    """Форматирует метки в виде {key="value",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+def _escape_label(value: str) -> str:
+    """Экранирует значение метки"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    """Форматирует число без лишних нулей"""
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+# Общее хранилище метрик
+metrics = MetricsRegistry()
+metrics.describe("bot_handler_duration_seconds", "Время выполнения обработчиков обновлений")
+metrics.describe("bot_handler_errors_total", "Количество ошибок в обработчиках обновлений")
+metrics.describe("bot_handler_in_progress", "Количество выполняющихся обработчиков обновлений")
+metrics.describe("bot_job_duration_seconds", "Время выполнения задач планировщика")
+metrics.describe("bot_job_errors_total", "Количество ошибок в задачах планировщика")
+metrics.describe("bot_job_in_progress", "Количество выполняющихся задач планировщика")
+for _kind, _title in (("handler", "обработчиках обновлений"), ("job", "задачах планировщика")):
+    metrics.describe(f"bot_{_kind}_db_statements_total", f"Количество SQL-запросов в {_title}")
+    metrics.describe(f"bot_{_kind}_db_seconds_total", f"Время выполнения SQL-запросов в {_title}")
+    metrics.describe(f"bot_{_kind}_n_plus_one_total", f"Количество вызовов с повторяющимися SQL-запросами в {_title}")
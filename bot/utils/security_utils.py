@@ -3,17 +3,156 @@ import json
 import hashlib
 import base64
 import re
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from cryptography.fernet import Fernet
 import os
-from config import SECRET_KEY, MAX_REQUESTS_PER_MINUTE, MAX_WARNINGS, BLOCK_DURATION_HOURS, ADMIN_IDS
+from config import (
+    SECRET_KEY,
+    MAX_REQUESTS_PER_MINUTE,
+    MAX_WARNINGS,
+    BLOCK_DURATION_HOURS,
+    ADMIN_IDS,
+    SPAM_IDLE_TIMEOUT,
+    SPAM_MAX_TRACKED_USERS,
+    SPAM_BLOCKS_FILE
+)
 
 logger = logging.getLogger(__name__)
 
-# Словарь для хранения временных данных о запросах пользователей
-# {user_id: {'requests': [timestamp1, timestamp2, ...], 'warnings': 0, 'blocked_until': datetime}}
-user_requests = {}
+# Окно подсчета запросов для проверки на спам (в секундах)
+SPAM_WINDOW = 60
+
+class SpamWindow:
+    """
+    Счетчик запросов пользователя в скользящем окне.
+    
+    Хранит только два счетчика (текущее и предыдущее окно фиксированной длины),
+    поэтому память на пользователя постоянна, а проверка выполняется за O(1).
+    Количество запросов за последнюю минуту оценивается как
+    previous * (доля предыдущего окна, попадающая в скользящее) + current.
+    """
+    __slots__ = ('window_index', 'current', 'previous', 'warnings', 'last_seen')
+    
+    def __init__(self, now: float):
+        self.window_index = int(now // SPAM_WINDOW)
+        self.current = 0
+        self.previous = 0
+        self.warnings = 0
+        self.last_seen = now
+    
+    def hit(self, now: float) -> float:
+        """
+        Регистрирует запрос и возвращает оценку числа запросов в окне
+        
+        Args:
+            now: Текущее время (timestamp)
+            
+        Returns:
+            float: Оценка количества запросов за последние SPAM_WINDOW секунд
+        """
+        index = int(now // SPAM_WINDOW)
+        if index != self.window_index:
+            # Если прошло больше одного окна, предыдущие запросы уже не учитываются
+            self.previous = self.current if index == self.window_index + 1 else 0
+            self.current = 0
+            self.window_index = index
+        
+        self.current += 1
+        self.last_seen = now
+        
+        elapsed_fraction = (now % SPAM_WINDOW) / SPAM_WINDOW
+        return self.previous * (1 - elapsed_fraction) + self.current
+
+# Счетчики запросов пользователей в порядке последней активности (LRU)
+# {user_id: SpamWindow}
+user_requests: "OrderedDict[int, SpamWindow]" = OrderedDict()
+
+# Заблокированные пользователи, сохраняются в SPAM_BLOCKS_FILE
+# {user_id: datetime}
+blocked_users: Dict[int, datetime] = {}
+_blocked_users_loaded = False
+
+def _load_blocked_users() -> None:
+    """Загружает сохраненные блокировки пользователей из файла"""
+    global _blocked_users_loaded
+    if _blocked_users_loaded:
+        return
+    _blocked_users_loaded = True
+    
+    if not os.path.exists(SPAM_BLOCKS_FILE):
+        return
+    
+    try:
+        with open(SPAM_BLOCKS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        now = datetime.now()
+        for user_id, blocked_until in data.items():
+            blocked_until = datetime.fromisoformat(blocked_until)
+            if blocked_until > now:
+                blocked_users[int(user_id)] = blocked_until
+        
+        logger.info(f"Загружено {len(blocked_users)} активных блокировок пользователей")
+    except (OSError, ValueError) as e:
+        logger.error(f"Ошибка при загрузке блокировок пользователей: {e}")
+
+def _save_blocked_users(current_time: datetime) -> None:
+    """Сохраняет активные блокировки пользователей в файл"""
+    # Удаляем истекшие блокировки, чтобы файл не рос бесконечно
+    for user_id in [uid for uid, until in blocked_users.items() if until <= current_time]:
+        del blocked_users[user_id]
+    
+    try:
+        tmp_file = f"{SPAM_BLOCKS_FILE}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(
+                {str(user_id): until.isoformat() for user_id, until in blocked_users.items()},
+                f
+            )
+        os.replace(tmp_file, SPAM_BLOCKS_FILE)
+    except OSError as e:
+        logger.error(f"Ошибка при сохранении блокировок пользователей: {e}")
+
+def _evict_idle_users(now: float) -> None:
+    """
+    Удаляет счетчики неактивных пользователей
+    
+    Пользователи упорядочены по времени последнего запроса, поэтому
+    достаточно проверять начало словаря.
+    """
+    while user_requests:
+        user_id, window = next(iter(user_requests.items()))
+        if now - window.last_seen < SPAM_IDLE_TIMEOUT and len(user_requests) <= SPAM_MAX_TRACKED_USERS:
+            break
+        del user_requests[user_id]
+
+def get_blocked_until(user_id: int, current_time: datetime = None) -> Optional[datetime]:
+    """
+    Возвращает время окончания блокировки пользователя
+    
+    Args:
+        user_id: ID пользователя
+        current_time: Текущее время (для тестирования)
+        
+    Returns:
+        Optional[datetime]: Время окончания блокировки или None, если пользователь не заблокирован
+    """
+    _load_blocked_users()
+    
+    blocked_until = blocked_users.get(user_id)
+    if blocked_until is None:
+        return None
+    
+    if current_time is None:
+        current_time = datetime.now()
+    
+    if blocked_until <= current_time:
+        del blocked_users[user_id]
+        return None
+    
+    return blocked_until
 
 def check_spam(user_id: int, current_time: datetime = None) -> bool:
     """
@@ -31,36 +170,35 @@ def check_spam(user_id: int, current_time: datetime = None) -> bool:
         
     if current_time is None:
         current_time = datetime.now()
-        
-    # Инициализируем данные пользователя, если их нет
-    if user_id not in user_requests:
-        user_requests[user_id] = {
-            'requests': [],
-            'warnings': 0,
-            'blocked_until': None
-        }
-        
-    user_data = user_requests[user_id]
     
     # Проверяем, не заблокирован ли пользователь
-    if user_data['blocked_until'] and user_data['blocked_until'] > current_time:
+    if get_blocked_until(user_id, current_time):
         return True
-        
-    # Удаляем устаревшие запросы (старше 1 минуты)
-    one_minute_ago = current_time - timedelta(minutes=1)
-    user_data['requests'] = [ts for ts in user_data['requests'] if ts > one_minute_ago]
     
-    # Добавляем текущий запрос
-    user_data['requests'].append(current_time)
+    now = current_time.timestamp()
+    
+    # Получаем счетчик пользователя и помечаем его как недавно использованный
+    window = user_requests.get(user_id)
+    if window is None:
+        window = SpamWindow(now)
+        user_requests[user_id] = window
+    else:
+        user_requests.move_to_end(user_id)
+    
+    # Запрос учитывается до удаления неактивных счетчиков: счетчик текущего
+    # пользователя становится самым свежим и не удаляется вместе с ними
+    requests_count = window.hit(now)
+    _evict_idle_users(now)
     
     # Проверяем, не превышен ли лимит
-    if len(user_data['requests']) > MAX_REQUESTS_PER_MINUTE:
-        user_data['warnings'] += 1
+    if requests_count > MAX_REQUESTS_PER_MINUTE:
+        window.warnings += 1
         
         # Если превышено максимальное количество предупреждений, блокируем пользователя
-        if user_data['warnings'] >= MAX_WARNINGS:
-            user_data['blocked_until'] = current_time + timedelta(hours=BLOCK_DURATION_HOURS)
-            logger.warning(f"Пользователь {user_id} заблокирован до {user_data['blocked_until']}")
+        if window.warnings >= MAX_WARNINGS:
+            blocked_users[user_id] = current_time + timedelta(hours=BLOCK_DURATION_HOURS)
+            _save_blocked_users(current_time)
+            logger.warning(f"Пользователь {user_id} заблокирован до {blocked_users[user_id]}")
             
         return True
         
@@ -211,14 +349,14 @@ def verify_user_access(user_id: int, required_role: str = None) -> bool:
         return False
         
     # Проверка на блокировку
-    if user_id in user_requests and user_requests[user_id].get('blocked_until'):
-        if user_requests[user_id]['blocked_until'] > datetime.now():
-            log_security_event('access_denied', user_id, {
-                'required_role': required_role,
-                'reason': 'user_blocked',
-                'blocked_until': user_requests[user_id]['blocked_until'].isoformat()
-            })
-            return False
+    blocked_until = get_blocked_until(user_id)
+    if blocked_until:
+        log_security_event('access_denied', user_id, {
+            'required_role': required_role,
+            'reason': 'user_blocked',
+            'blocked_until': blocked_until.isoformat()
+        })
+        return False
             
     # Здесь могут быть дополнительные проверки доступа
     
@@ -3,6 +3,7 @@ import json
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 import secrets
+import socket
 import logging
 
 # Загрузка переменных окружения из файла .env
@@ -44,6 +45,23 @@ DEFAULT_DISTRIBUTION_INTERVAL = 3  # Интервал распределения
 DEFAULT_USERS_PER_REQUEST = 3  # Основной поток: до 3 пользователей
 RESERVE_USERS_PER_REQUEST = 2  # Резервный поток: до 2 дополнительных
 DEFAULT_MAX_DISTRIBUTIONS = 5  # Максимальное количество распределений одной заявки
+REQUESTS_PAGE_SIZE = 10  # Количество заявок на одной странице в разделе "Мои заявки"
+ADMIN_PAGE_SIZE = 10  # Количество записей на одной странице в списках админ-панели
+ADMIN_COUNT_CACHE_TTL = 30  # Время жизни кэша общего количества записей в списках админ-панели в секундах
+TOP_USERS_LIMIT = 5  # Количество лучших исполнителей в статистике админ-панели
+REFERENCE_CACHE_TTL = 300  # Через сколько секунд справочники категорий, городов и подкатегорий перечитываются из базы данных
+OFFER_EDIT_INTERVAL = 0.05  # Минимальный интервал между правками сообщений с отозванными предложениями в секундах
+DISTRIBUTION_CLAIM_BATCH = int(os.getenv("DISTRIBUTION_CLAIM_BATCH", "20"))  # Сколько заявок экземпляр бота захватывает за один раз
+DISTRIBUTION_CLAIM_LEASE = int(os.getenv("DISTRIBUTION_CLAIM_LEASE", "300"))  # Через сколько секунд захват заявки истекает, если экземпляр не завершил распределение
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"  # Идентификатор экземпляра бота
+DISTRIBUTION_TICK_BUDGET = int(os.getenv("DISTRIBUTION_TICK_BUDGET", "60"))  # Максимальная длительность одного запуска распределения в секундах
+DISTRIBUTION_PRIORITY_WEIGHTS = {
+    "cost": 1.0,   # За каждый порядок предполагаемой стоимости
+    "area": 0.5,   # За каждый порядок площади
+    "aging": 1.0   # За каждый срок SLA, который заявка ждет распределения
+}  # Веса приоритета заявок в очереди распределения
+DISTRIBUTION_DEFAULT_SLA = 2  # Срок распределения заявки в часах, если для категории он не указан
+DISTRIBUTION_CATEGORY_SLA = {}  # Сроки распределения по категориям в часах, например {"Сантехника": 1}
 
 # Режим отладки
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() in ("true", "1", "t")
@@ -52,10 +70,63 @@ DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() in ("true", "1", "t")
 LOG_LEVEL = "DEBUG" if DEBUG_MODE else "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = "bot.log"
+LOG_JSON = os.getenv("LOG_JSON", "True").lower() in ("true", "1", "t")  # Записывать файл лога в формате JSON
+LOG_SAMPLING = {
+    "message": float(os.getenv("LOG_SAMPLE_MESSAGE", "1.0")),
+    "callback_query": float(os.getenv("LOG_SAMPLE_CALLBACK", "1.0")),
+    "default": 1.0
+}  # Доля логируемых событий каждого типа (ошибки логируются всегда)
 
 # Настройки безопасности
 MAX_REQUESTS_PER_MINUTE = 30  # Максимальное количество запросов от одного пользователя в минуту
 SPAM_BLOCK_DURATION = 60  # Длительность блокировки при обнаружении спама (в секундах)
+SPAM_IDLE_TIMEOUT = 600  # Через сколько секунд неактивности счетчик запросов пользователя удаляется из памяти
+SPAM_MAX_TRACKED_USERS = 10000  # Максимальное количество пользователей, отслеживаемых в памяти
+SPAM_BLOCKS_FILE = os.getenv("SPAM_BLOCKS_FILE", "spam_blocks.json")  # Файл для сохранения блокировок между перезапусками
+
+# Настройки хранилища состояний FSM
+FSM_STORAGE = os.getenv("FSM_STORAGE", "database").lower()  # memory или database
+FSM_CACHE_SIZE = 10000  # Максимальное количество состояний в кэше
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "5"))  # Время жизни состояния в кэше в секундах: столько другие процессы могут видеть устаревшее состояние (0 - без ограничения, только для одного процесса)
+FSM_FLUSH_INTERVAL = 2.0  # Интервал записи измененных состояний в базу данных в секундах
+
+# Настройки режима получения обновлений
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()  # polling или webhook
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")  # Публичный адрес бота, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")  # Путь, на который Telegram отправляет обновления
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Секретный токен для проверки запросов от Telegram (обязателен в режиме webhook, общий для всех экземпляров)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")  # Адрес, на котором слушает веб-сервер
+WEBHOOK_PORT = int(os.getenv("PORT", os.getenv("WEBHOOK_PORT", "8080")))  # Порт веб-сервера (Railway передает его в PORT)
+
+# Настройки параллельной обработки обновлений
+UPDATE_SHARDS = int(os.getenv("UPDATE_SHARDS", "32"))  # Количество очередей, между которыми распределяются пользователи
+UPDATE_MAX_CONCURRENCY = int(os.getenv("UPDATE_MAX_CONCURRENCY", "16"))  # Максимальное количество одновременно обрабатываемых обновлений
+UPDATE_QUEUE_WARNING = 20  # Длина очереди, при которой в лог пишется предупреждение
+
+# Настройки кэша пользователей
+USER_CACHE_SIZE = 10000  # Максимальное количество пользователей в кэше
+USER_CACHE_TTL = 60  # Время жизни пользователя в кэше в секундах
+USER_FLUSH_INTERVAL = 5.0  # Интервал записи активности и профилей пользователей в базу данных в секундах
+
+# Настройки метрик
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "t")  # Включить HTTP-сервер метрик
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # Адрес сервера метрик (по умолчанию только локальный)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # Порт сервера метрик
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "False").lower() in ("true", "1", "t")  # Подсчет SQL-запросов в обработчиках и задачах
+QUERY_REPEAT_THRESHOLD = 5  # Сколько одинаковых запросов за одно обновление считается проблемой N+1
+
+# Настройки очистки старых данных
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "500"))  # Количество строк, удаляемых одной транзакцией
+CLEANUP_TIME_BUDGET = float(os.getenv("CLEANUP_TIME_BUDGET", "30"))  # Максимальная длительность одного запуска очистки в секундах
+CLEANUP_CHUNK_PAUSE = 0.05  # Пауза между пакетами в секундах, чтобы не удерживать блокировку базы данных
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "True").lower() in ("true", "1", "t")  # Архивировать строки перед удалением
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")  # Директория архива удаленных заявок и распределений
+
+# Настройки планировщика задач
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "60"))  # Срок аренды периодической задачи в секундах, после него задачу перехватывает другой экземпляр
+SCHEDULER_JITTER = 0.1  # Случайное смещение запуска задач (доля интервала), чтобы экземпляры не обращались к базе данных одновременно
+SCHEDULER_MAX_CONCURRENT_JOBS = int(os.getenv("SCHEDULER_MAX_CONCURRENT_JOBS", "2"))  # Максимальное количество одновременно выполняющихся задач
+SCHEDULER_CANCEL_GRACE = 5  # Время в секундах, которое дается задаче на завершение после отмены по таймауту
 
 # Настройки уведомлений
 NOTIFICATION_DELAY = 60  # Задержка между уведомлениями в секундах
@@ -186,18 +257,14 @@ GITHUB_SETTINGS = {
 # Инициализация логгера
 def setup_logging():
     """Настраивает логирование"""
+    from bot.utils.logging_utils import setup_queue_logging
+    
     numeric_level = getattr(logging, LOG_LEVEL.upper(), None)
     if not isinstance(numeric_level, int):
         numeric_level = logging.INFO
     
-    logging.basicConfig(
-        level=numeric_level,
-        format=LOG_FORMAT,
-        handlers=[
-            logging.FileHandler(LOG_FILE),
-            logging.StreamHandler()
-        ]
-    )
+    # Запись в файл и консоль выполняется в отдельном потоке
+    setup_queue_logging(numeric_level, LOG_FILE, LOG_FORMAT, json_format=LOG_JSON)
     
     # Отключаем логи от некоторых библиотек
     logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -0,0 +1,58 @@
+"""
+Общие фикстуры тестов
+"""
+import os
+from typing import NamedTuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from bot.database import setup
+from bot.services import request_service, user_service
+from bot.services.reference_cache import reference_cache
+
+class TestDatabase(NamedTuple):
+    """Отдельная база данных теста"""
+    __test__ = False
+
+    url: str
+    engine: Engine
+    async_engine: AsyncEngine
+
+@pytest.fixture
+def database(tmp_path, monkeypatch) -> TestDatabase:
+    """
+    Создает для теста пустую базу данных во временной директории.
+
+    Движки и фабрики сессий из bot.database.setup на время теста переключаются
+    на эту базу данных, поэтому get_session() и async_session() в коде бота
+    работают с ней, а рабочая база данных не затрагивается. Асинхронный движок
+    не держит соединения в пуле: каждый тест запускает свой цикл событий.
+    """
+    url = f"sqlite:///{os.path.join(tmp_path, 'test.db')}"
+    engine = create_engine(url, poolclass=NullPool)
+    async_engine = create_async_engine(url.replace("sqlite:///", "sqlite+aiosqlite:///"), poolclass=NullPool)
+
+    original_engine, original_async_engine = setup.engine, setup.async_engine
+    monkeypatch.setattr(setup, "engine", engine)
+    monkeypatch.setattr(setup, "async_engine", async_engine)
+    setup.session_factory.remove()
+    setup.Session.configure(bind=engine)
+    setup.async_session_factory.configure(bind=async_engine)
+
+    # Кэши процесса могут хранить данные базы данных предыдущего теста
+    reference_cache.invalidate()
+    request_service._requests_count_cache.clear()
+    user_service._users_count_cache.clear()
+
+    setup.setup_database()
+    try:
+        yield TestDatabase(url, engine, async_engine)
+    finally:
+        setup.session_factory.remove()
+        setup.Session.configure(bind=original_engine)
+        setup.async_session_factory.configure(bind=original_async_engine)
+        engine.dispose()
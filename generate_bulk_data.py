@@ -0,0 +1,49 @@
+"""
+Скрипт для заполнения базы данных синтетическими данными для нагрузочного тестирования
+"""
+import sys
+import logging
+import argparse
+from datetime import datetime
+
+from bot.database.setup import engine, setup_database
+from bot.utils.bulk_generator import BulkDataGenerator, DEFAULT_BATCH_SIZE
+from config import DATABASE_URL, DEFAULT_USERS_PER_REQUEST
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Основная функция скрипта"""
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных для нагрузочного тестирования")
+    parser.add_argument("--users", type=int, default=10000, help="Количество пользователей")
+    parser.add_argument("--requests", type=int, default=100000, help="Количество заявок")
+    parser.add_argument("--distributions", type=int, default=DEFAULT_USERS_PER_REQUEST,
+                        help="Количество распределений на одну заявку")
+    parser.add_argument("--days", type=int, default=365, help="За сколько последних дней распределяются даты")
+    parser.add_argument("--seed", type=int, default=42, help="Начальное значение генератора случайных чисел")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Количество строк в одной вставке")
+
+    args = parser.parse_args()
+
+    logger.info("=" * 50)
+    logger.info(f"Запуск генерации синтетических данных в {datetime.now()}")
+    logger.info(f"База данных: {DATABASE_URL}")
+
+    setup_database()
+
+    generator = BulkDataGenerator(seed=args.seed, batch_size=args.batch_size, days=args.days)
+    counts = generator.populate(engine, args.users, args.requests, args.distributions)
+
+    for table, count in counts.items():
+        logger.info(f"{table}: {count}")
+
+    logger.info("=" * 50)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,6 @@ from sqlalchemy import func
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from aiogram.client.default import DefaultBotProperties
 
@@ -29,8 +28,12 @@ from config import (
     LOG_LEVEL,
     LOG_FORMAT,
     LOG_FILE,
+    LOG_JSON,
     DEBUG_MODE,
-    CITY_PHONE_PREFIXES
+    CITY_PHONE_PREFIXES,
+    QUERY_STATS_ENABLED,
+    BOT_MODE,
+    WEBHOOK_SECRET
 )
 
 from bot.models import (
@@ -42,6 +45,7 @@ from bot.models import (
     DistributionStatus
 )
 
+from bot.utils.logging_utils import setup_queue_logging
 from bot.utils.demo_generator import (
     generate_demo_request,
     should_generate_demo_request,
@@ -63,32 +67,20 @@ from bot.services.user_service import UserService
 from bot.services.info_service import start_info_service
 from bot.handlers import setup_handlers
 from bot.middlewares import setup_middlewares
+from bot.middlewares.sharding import setup_update_sharding
+from bot.database.fsm_storage import create_fsm_storage
+from bot.services.webhook_service import start_bot
+from bot.services.metrics_service import start_metrics_server, stop_metrics_server
+from bot.database.query_counter import install_query_counter
 
 # Получаем логгер
 logger = logging.getLogger(__name__)
 
 # Настройка логирования
 def setup_logging():
-    # Создаем форматтер для логов
-    formatter = logging.Formatter(LOG_FORMAT)
-    
-    # Настраиваем корневой логгер
-    root_logger = logging.getLogger()
-    root_logger.setLevel(LOG_LEVEL)
-    
-    # Очищаем существующие обработчики
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
-    
-    # Добавляем обработчик для вывода в файл
-    file_handler = logging.FileHandler(LOG_FILE)
-    file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
-    
-    # Добавляем обработчик для вывода в консоль
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    # Настраиваем корневой логгер: запись в файл и консоль выполняется
+    # в отдельном потоке, чтобы не блокировать цикл событий
+    setup_queue_logging(LOG_LEVEL, LOG_FILE, LOG_FORMAT, json_format=LOG_JSON)
     
     # Настраиваем логгеры библиотек
     if DEBUG_MODE:
@@ -264,6 +256,12 @@ async def main():
         logging.critical("TELEGRAM_BOT_TOKEN не найден в переменных окружения")
         return
     
+    # Экземпляры за общим адресом вебхука должны проверять один и тот же секретный токен:
+    # Telegram хранит только токен, переданный последним в set_webhook
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        logging.critical("WEBHOOK_SECRET не найден в переменных окружения, он обязателен в режиме webhook")
+        return
+    
     # Инициализация базы данных
     initialize_database()
     
@@ -275,10 +273,11 @@ async def main():
         )
         
         # Создаем хранилище состояний
-        storage = MemoryStorage()
+        storage = create_fsm_storage()
         
         # Создаем диспетчер с хранилищем состояний
         dp = Dispatcher(storage=storage)
+        setup_update_sharding(dp)
         
         # Регистрация обработчиков
         router = setup_handlers()
@@ -299,6 +298,11 @@ async def main():
             await start_info_service(bot)
             logger.info("Запущен сервис информационных сообщений")
         
+        # Запуск сервера метрик
+        if QUERY_STATS_ENABLED:
+            install_query_counter()
+        await start_metrics_server()
+        
         # Запуск синхронизации с GitHub
         if GITHUB_TOKEN and GITHUB_REPO:
             start_github_sync()
@@ -309,17 +313,20 @@ async def main():
         if DEBUG_MODE:
             logger.info("Работа в режиме отладки")
         
-        # Запускаем поллинг с правильными параметрами
-        await dp.start_polling(
+        # Запускаем получение обновлений (polling или webhook)
+        await start_bot(
+            dp,
             bot,
             allowed_updates=dp.resolve_used_update_types(),
-            skip_updates=True
+            drop_pending_updates=True
         )
     except Exception as e:
         logger.critical(f"Критическая ошибка при запуске бота: {e}")
         logger.critical(traceback.format_exc())
     finally:
         # Закрываем соединения
+        await stop_metrics_server()
+        await dp.storage.close()
         await bot.session.close()
         logger.info("Бот остановлен")
 
@@ -0,0 +1,27 @@
+"""Add indexes for keyset pagination of admin request lists
+
+Revision ID: add_admin_list_indexes
+Revises: add_distribution_inbox_index
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_admin_list_indexes'
+down_revision = 'add_distribution_inbox_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индексы для постраничного вывода заявок по (created_at, id) с фильтром по статусу и без него
+    op.create_index('ix_requests_created', 'requests', ['created_at', 'id'])
+    op.create_index('ix_requests_status_created', 'requests', ['status', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    # Удаляем индексы
+    op.drop_index('ix_requests_status_created', table_name='requests')
+    op.drop_index('ix_requests_created', table_name='requests')
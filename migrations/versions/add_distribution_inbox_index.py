@@ -0,0 +1,29 @@
+"""Add index for keyset pagination of user distributions
+
+Revision ID: add_distribution_inbox_index
+Revises: add_fsm_storage
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_distribution_inbox_index'
+down_revision = 'add_fsm_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индекс для постраничного вывода раздела "Мои заявки" по (created_at, id)
+    op.create_index(
+        'ix_distributions_user_created',
+        'distributions',
+        ['user_id', 'created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    # Удаляем индекс
+    op.drop_index('ix_distributions_user_created', table_name='distributions')
@@ -0,0 +1,29 @@
+"""Add index for counting pending distributions per user
+
+Revision ID: add_distribution_status_index
+Revises: backfill_user_statistics
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_distribution_status_index'
+down_revision = 'backfill_user_statistics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индекс для подсчета ожидающих ответа распределений при выборе наименее загруженных пользователей
+    op.create_index(
+        'ix_distributions_status_user',
+        'distributions',
+        ['status', 'user_id']
+    )
+
+
+def downgrade() -> None:
+    # Удаляем индекс
+    op.drop_index('ix_distributions_status_user', table_name='distributions')
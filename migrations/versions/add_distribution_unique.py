@@ -0,0 +1,30 @@
+"""Add unique index on distributions (request_id, user_id)
+
+Revision ID: add_distribution_unique
+Revises: add_job_leases
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_distribution_unique'
+down_revision = 'add_job_leases'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Удаляем повторные распределения заявки одному пользователю, оставляя первое
+    op.execute(
+        "DELETE FROM distributions WHERE id NOT IN ("
+        "SELECT MIN(id) FROM distributions GROUP BY request_id, user_id)"
+    )
+    # Уникальный индекс, по которому пакетная вставка пропускает существующие распределения
+    op.create_index('uq_distributions_request_user', 'distributions', ['request_id', 'user_id'], unique=True)
+
+
+def downgrade() -> None:
+    # Удаляем индекс
+    op.drop_index('uq_distributions_request_user', table_name='distributions')
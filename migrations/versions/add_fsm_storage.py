@@ -0,0 +1,32 @@
+"""Add fsm_storage table for persistent FSM states
+
+Revision ID: add_fsm_storage
+Revises: add_test_subcategories
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_fsm_storage'
+down_revision = 'add_test_subcategories'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Создаем таблицу для хранения состояний FSM
+    op.create_table(
+        'fsm_storage',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('state', sa.String(length=255), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    # Удаляем таблицу состояний FSM
+    op.drop_table('fsm_storage')
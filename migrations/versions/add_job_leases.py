@@ -0,0 +1,32 @@
+"""Add job_leases table for leader-elected periodic jobs
+
+Revision ID: add_job_leases
+Revises: add_request_claims
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_job_leases'
+down_revision = 'add_request_claims'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Создаем таблицу аренды периодических задач
+    op.create_table(
+        'job_leases',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('owner', sa.String(length=100), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('last_run_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    # Удаляем таблицу аренды периодических задач
+    op.drop_table('job_leases')
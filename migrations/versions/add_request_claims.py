@@ -0,0 +1,27 @@
+"""Add distribution claim columns to requests table
+
+Revision ID: add_request_claims
+Revises: add_admin_list_indexes
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_request_claims'
+down_revision = 'add_admin_list_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Добавляем колонки захвата заявки экземпляром бота
+    op.add_column('requests', sa.Column('claimed_by', sa.String(length=100), nullable=True))
+    op.add_column('requests', sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    # Удаляем колонки захвата заявки
+    op.drop_column('requests', 'claim_expires_at')
+    op.drop_column('requests', 'claimed_by')
@@ -0,0 +1,35 @@
+"""Add expired_requests column to user_statistics table
+
+Revision ID: add_user_statistics_expired
+Revises: add_distribution_status_index
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_statistics_expired'
+down_revision = 'add_distribution_status_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Количество распределений, закрытых без ответа пользователя
+    op.add_column('user_statistics', sa.Column('expired_requests', sa.Integer(), nullable=True, server_default='0'))
+
+    # Начальные значения считаем по существующим распределениям
+    op.execute(
+        """
+        UPDATE user_statistics SET expired_requests = (
+            SELECT COUNT(*) FROM distributions
+            WHERE distributions.user_id = user_statistics.user_id AND distributions.status = 'EXPIRED'
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    # Удаляем колонку expired_requests из таблицы user_statistics
+    op.drop_column('user_statistics', 'expired_requests')
@@ -0,0 +1,43 @@
+"""Backfill user_statistics from existing distributions
+
+Revision ID: backfill_user_statistics
+Revises: add_distribution_unique
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'backfill_user_statistics'
+down_revision = 'add_distribution_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Статистика обновляется инкрементально, поэтому начальные значения считаем по существующим распределениям
+    op.execute("DELETE FROM user_statistics")
+    op.execute(
+        """
+        INSERT INTO user_statistics (
+            user_id, total_requests, processed_requests, successful_requests,
+            avg_response_time, conversion_rate, last_updated
+        )
+        SELECT
+            user_id,
+            COUNT(*),
+            SUM(CASE WHEN status IN ('ACCEPTED', 'REJECTED', 'COMPLETED') THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status IN ('ACCEPTED', 'COMPLETED') THEN 1 ELSE 0 END),
+            COALESCE(AVG(CASE WHEN status IN ('ACCEPTED', 'REJECTED', 'COMPLETED') THEN response_time END), 0),
+            SUM(CASE WHEN status IN ('ACCEPTED', 'COMPLETED') THEN 1 ELSE 0 END) * 100.0 / COUNT(*),
+            CURRENT_TIMESTAMP
+        FROM distributions
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    # Данные статистики не удаляем: таблица существовала и до этой миграции
+    pass
@@ -0,0 +1,60 @@
+"""
+Скрипт для просмотра и восстановления архива удаленных заявок и распределений
+"""
+import sys
+import json
+import logging
+import argparse
+from datetime import date, datetime
+
+from bot.database.setup import engine, setup_database
+from bot.services.archive_service import ARCHIVED_TABLES, encode_value, list_partitions, read_archive, restore_archive
+from config import ARCHIVE_DIR
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Основная функция скрипта"""
+    parser = argparse.ArgumentParser(description="Просмотр и восстановление архива заявок и распределений")
+    parser.add_argument("command", choices=["list", "export", "restore"],
+                        help="list - дни в архиве, export - вывести строки в JSONL, restore - вернуть строки в базу данных")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="Первый день диапазона (ГГГГ-ММ-ДД)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Последний день диапазона (ГГГГ-ММ-ДД)")
+    parser.add_argument("--table", choices=list(ARCHIVED_TABLES), default="requests", help="Таблица для export")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Директория архива")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for table_name in ARCHIVED_TABLES:
+            for day, segments in list_partitions(table_name, args.dir):
+                print(f"{table_name}\t{day.isoformat()}\t{segments}")
+        return 0
+
+    if args.start is None or args.end is None:
+        logger.error("Для export и restore нужно указать --from и --to")
+        return 1
+
+    if args.command == "export":
+        for row in read_archive(args.table, args.start, args.end, args.dir):
+            print(json.dumps({key: encode_value(value) for key, value in row.items()}, ensure_ascii=False))
+        return 0
+
+    logger.info("=" * 50)
+    logger.info(f"Запуск восстановления архива в {datetime.now()} за {args.start} - {args.end}")
+
+    setup_database()
+    counts = restore_archive(engine, args.start, args.end, args.dir)
+    for table_name, count in counts.items():
+        logger.info(f"{table_name}: {count}")
+
+    logger.info("=" * 50)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
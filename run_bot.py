@@ -15,19 +15,23 @@ import re
 import subprocess
 from datetime import datetime
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
 from aiogram.exceptions import TelegramAPIError
 
 from bot.handlers import setup_handlers
 from bot.middlewares import setup_middlewares
+from bot.middlewares.sharding import setup_update_sharding
 from bot.database.setup import setup_database
+from bot.database.fsm_storage import create_fsm_storage
 from bot.services.scheduler import start_scheduler, stop_scheduler
 from bot.services.demo_service import generate_demo_requests
 from bot.services.info_service import start_info_service
+from bot.services.webhook_service import start_bot
+from bot.services.metrics_service import start_metrics_server, stop_metrics_server
+from bot.database.query_counter import install_query_counter
 from bot.utils.github_utils import start_github_sync
-from config import TELEGRAM_BOT_TOKEN, ADMIN_IDS, DEMO_MODE, setup_logging
+from config import TELEGRAM_BOT_TOKEN, ADMIN_IDS, DEMO_MODE, QUERY_STATS_ENABLED, setup_logging
 
 # Настройка логирования
 logging.basicConfig(
@@ -156,7 +160,8 @@ async def main():
         # Создаем экземпляр бота и диспетчера
         session = AiohttpSession()
         bot = Bot(token=TELEGRAM_BOT_TOKEN, session=session)
-        dp = Dispatcher(storage=MemoryStorage())
+        dp = Dispatcher(storage=create_fsm_storage())
+        setup_update_sharding(dp)
         
         # Настраиваем обработчики и промежуточное ПО
         router = setup_handlers()
@@ -173,6 +178,11 @@ async def main():
         # Запускаем сервис информационных сообщений
         await start_info_service(bot)
         
+        # Запускаем сервер метрик
+        if QUERY_STATS_ENABLED:
+            install_query_counter()
+        await start_metrics_server()
+        
         # Запускаем синхронизацию с GitHub
         start_github_sync()
         
@@ -196,9 +206,9 @@ async def main():
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        # Запускаем поллинг
-        logger.info("Запускаем поллинг бота...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        # Запускаем получение обновлений (polling или webhook)
+        logger.info("Запускаем получение обновлений...")
+        await start_bot(dp, bot, allowed_updates=dp.resolve_used_update_types())
     except Exception as e:
         logger.critical(f"Критическая ошибка при запуске бота: {e}")
         logger.critical(traceback.format_exc())
@@ -206,6 +216,17 @@ async def main():
         # Останавливаем планировщик задач
         await stop_scheduler()
         
+        # Останавливаем сервер метрик
+        await stop_metrics_server()
+        
+        # Сохраняем состояния пользователей
+        if 'dp' in locals():
+            await dp.storage.close()
+        
+        # Закрываем сессию бота
+        if 'bot' in locals():
+            await bot.session.close()
+        
         # Удаляем файл блокировки
         if os.path.exists(LOCK_FILE):
             os.remove(LOCK_FILE)
@@ -8,7 +8,6 @@ import asyncio
 import traceback
 from datetime import datetime
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
@@ -16,10 +15,13 @@ from aiogram.fsm.state import State, StatesGroup
 
 from config import TELEGRAM_BOT_TOKEN, ADMIN_IDS, setup_logging
 from bot.database.setup import setup_database, get_session
+from bot.database.fsm_storage import create_fsm_storage
+from bot.middlewares.sharding import setup_update_sharding
 from bot.models import User, Category, City, Request, Distribution, SubCategory
 from bot.services.user_service import UserService
 from bot.services.request_service import RequestService
 from bot.services.subcategory_service import SubCategoryService
+from bot.services.webhook_service import start_bot
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -53,7 +55,8 @@ async def main():
         # Создаем экземпляр бота и диспетчера
         session = AiohttpSession()
         bot = Bot(token=TELEGRAM_BOT_TOKEN, session=session)
-        dp = Dispatcher(storage=MemoryStorage())
+        dp = Dispatcher(storage=create_fsm_storage())
+        setup_update_sharding(dp)
         
         # Обработчик команды /start
         @dp.message(CommandStart())
@@ -775,9 +778,14 @@ async def main():
             except Exception as e:
                 logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
         
-        # Запускаем поллинг
-        logger.info("Запускаем поллинг бота...")
-        await dp.start_polling(bot)
+        # Запускаем получение обновлений (polling или webhook)
+        logger.info("Запускаем получение обновлений...")
+        try:
+            await start_bot(dp, bot)
+        finally:
+            # Сохраняем состояния пользователей
+            await dp.storage.close()
+            await bot.session.close()
     except Exception as e:
         logger.critical(f"Критическая ошибка при запуске бота: {e}")
         traceback.print_exc()
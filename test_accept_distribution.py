@@ -0,0 +1,155 @@
+"""
+Скрипт для проверки атомарного принятия заявки при одновременных нажатиях
+"""
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from bot.database.setup import get_session
+from bot.models import Distribution, DistributionStatus, Request, RequestStatus, User
+from bot.handlers.user_handlers import accept_request, show_request
+from bot.services.info_service import REVOKED_OFFER_TEXT, edit_revoked_offers
+from bot.services.request_service import RequestService
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+CONTRACTORS = 8
+BOT_ID = 123456
+
+class FakeMessage:
+    """Сообщение Telegram, которое запоминает новый текст и кнопки"""
+
+    def __init__(self, message_id: int, chat_id: int):
+        self.message_id = message_id
+        self.chat_id = chat_id
+        self.text = None
+        self.buttons = []
+        self.answers = []
+        # Сообщение со списком заявок отправлено ботом
+        self.from_user = SimpleNamespace(id=BOT_ID, is_bot=True)
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        self.buttons = [button.text for row in reply_markup.inline_keyboard for button in row] if reply_markup else []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+class FakeCallback:
+    """Нажатие кнопки с заявкой в списке"""
+
+    def __init__(self, data: str, message: FakeMessage):
+        self.data = data
+        self.message = message
+        self.from_user = SimpleNamespace(id=message.chat_id, is_bot=False)
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+class FakeState:
+    """Состояние FSM, которое ничего не хранит"""
+
+    async def set_state(self, state):
+        pass
+
+class FakeBot:
+    """Бот, который запоминает правки сообщений"""
+
+    def __init__(self):
+        self.edited = []
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        self.edited.append((chat_id, message_id, text))
+
+def create_offers() -> list:
+    """Создает заявку и предложения для нескольких исполнителей, возвращает ID заявки и распределений"""
+    with get_session() as session:
+        request = Request(description="Ремонт", status=RequestStatus.DISTRIBUTING)
+        session.add(request)
+        for index in range(CONTRACTORS):
+            user = User(telegram_id=7_000_000 + index, is_active=True)
+            session.add(user)
+            session.flush()
+            session.add(Distribution(
+                request=request,
+                user_id=user.id,
+                status=DistributionStatus.PENDING
+            ))
+        session.commit()
+        return request.id, [distribution.id for distribution in request.distributions]
+
+def show_offers(distribution_ids: list) -> dict:
+    """Открывает предложения в обработчике show_request, возвращает показанные сообщения по ID распределения"""
+    messages = {}
+    for index, distribution_id in enumerate(distribution_ids):
+        message = FakeMessage(message_id=500 + index, chat_id=7_000_000 + index)
+        asyncio.run(show_request(FakeCallback(f"show_request_{distribution_id}", message), FakeState()))
+        assert "✅ Принять" in message.buttons, message.text
+        messages[distribution_id] = message
+    return messages
+
+def test_accept_distribution(database):
+    """Проверяет, что из одновременных нажатий "Принять" заявку получает ровно один исполнитель"""
+    request_id, distribution_ids = create_offers()
+    messages = show_offers(distribution_ids)
+
+    barrier = threading.Barrier(len(distribution_ids))
+    results = {}
+
+    def accept(distribution_id: int) -> None:
+        with get_session() as session:
+            barrier.wait()
+            distribution, revoked = RequestService(session).accept_distribution(distribution_id)
+            results[distribution_id] = (distribution.status, revoked)
+
+    threads = [threading.Thread(target=accept, args=(distribution_id,)) for distribution_id in distribution_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [distribution_id for distribution_id, (status, _) in results.items() if status == DistributionStatus.ACCEPTED]
+    assert len(winners) == 1, f"Заявку приняли {len(winners)} исполнителей"
+
+    # Победитель получает список всех отозванных предложений для правки сообщений
+    revoked = results[winners[0]][1]
+    assert sorted(offer.distribution_id for offer in revoked) == sorted(set(distribution_ids) - set(winners))
+    
+    # Сообщения, показанные проигравшим, правятся по сохраненным ID
+    bot = FakeBot()
+    assert asyncio.run(edit_revoked_offers(bot, revoked)) == len(revoked)
+    expected = {(messages[offer.distribution_id].chat_id, messages[offer.distribution_id].message_id) for offer in revoked}
+    assert {(chat_id, message_id) for chat_id, message_id, _ in bot.edited} == expected
+    assert all(text == REVOKED_OFFER_TEXT for _, _, text in bot.edited)
+
+    with get_session() as session:
+        statuses = dict(session.query(Distribution.id, Distribution.status).filter(Distribution.request_id == request_id))
+        request = session.query(Request).filter_by(id=request_id).first()
+        assert request.status == RequestStatus.IN_PROGRESS
+        assert statuses[winners[0]] == DistributionStatus.ACCEPTED
+        assert all(statuses[distribution_id] == DistributionStatus.EXPIRED
+                   for distribution_id in distribution_ids if distribution_id != winners[0])
+
+        # Повторное принятие отозванного предложения не меняет заявку
+        loser = next(distribution_id for distribution_id in distribution_ids if distribution_id != winners[0])
+        distribution, revoked = RequestService(session).accept_distribution(loser)
+        assert distribution.status == DistributionStatus.EXPIRED and not revoked
+
+    # Проигравший после нажатия кнопки видит свой список заявок, а не список бота
+    message = messages[loser]
+    asyncio.run(accept_request(FakeCallback(f"accept_request_{loser}", message), FakeState()))
+    assert message.answers[0] == REVOKED_OFFER_TEXT
+    assert f"Заявка #{request_id}" in message.answers[-1], message.answers
+
+    logger.info(f"Заявку принял только исполнитель с распределением #{winners[0]}")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,159 @@
+"""
+Скрипт для проверки постраничного вывода пользователей и заявок в админ-панели
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from bot.database.setup import get_session
+from bot.models import Category, City, Request, RequestStatus, User
+from bot.services import request_service, user_service
+from bot.services.request_service import RequestService
+from bot.services.user_service import UserService
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 3
+
+def test_users_page(database):
+    """Проверяет листание пользователей в обе стороны с фильтрами"""
+    with get_session() as session:
+        category = Category(name="Проверка списка пользователей")
+        city = City(name="Проверка списка пользователей")
+        users = [User(telegram_id=8_600_000 + index, is_active=index % 4 != 3) for index in range(8)]
+        session.add_all(users)
+        session.commit()
+        for user in users[::2]:
+            user.categories.append(category)
+        users[0].cities.append(city)
+        session.commit()
+        ids = [user.id for user in users]
+        service = UserService(session)
+
+        # Вперед: от последних зарегистрированных к первым
+        page, has_prev, has_next = service.get_users_page(limit=PAGE_SIZE)
+        assert [user.id for user in page] == ids[:4:-1] and not has_prev and has_next
+        page, has_prev, has_next = service.get_users_page(cursor=page[-1].id, limit=PAGE_SIZE)
+        assert [user.id for user in page] == ids[4:1:-1] and has_prev and has_next
+        last, has_prev, has_next = service.get_users_page(cursor=page[-1].id, limit=PAGE_SIZE)
+        assert [user.id for user in last] == ids[1::-1] and has_prev and not has_next
+
+        # Назад: страница перед последней совпадает с пройденной
+        back, has_prev, has_next = service.get_users_page(cursor=last[0].id, direction="prev", limit=PAGE_SIZE)
+        assert back == page and has_prev and has_next
+        first, has_prev, has_next = service.get_users_page(cursor=back[0].id, direction="prev", limit=PAGE_SIZE)
+        assert [user.id for user in first] == ids[:4:-1] and not has_prev and has_next
+
+        # Фильтры применяются в запросе
+        active, _, has_next = service.get_users_page(is_active=True, limit=PAGE_SIZE)
+        assert [user.id for user in active] == [ids[6], ids[5], ids[4]] and has_next
+        in_category, _, has_next = service.get_users_page(category_id=category.id, limit=10)
+        assert [user.id for user in in_category] == ids[-2::-2] and not has_next
+        in_city, _, _ = service.get_users_page(city_id=city.id, is_active=True)
+        assert [user.id for user in in_city] == [ids[0]]
+
+def test_requests_page(database):
+    """Проверяет листание заявок в обе стороны, в том числе с одинаковым временем создания"""
+    with get_session() as session:
+        category = Category(name="Проверка списка заявок")
+        city = City(name="Проверка списка заявок")
+        created_at = datetime(2024, 1, 1, 12, 0, 0)
+        # Заявки 2 и 3, 4 и 5 созданы в одну и ту же секунду
+        offsets = [0, 1, 2, 2, 3, 3, 4]
+        requests = [
+            Request(
+                description=f"Заявка {index}",
+                created_at=created_at + timedelta(seconds=offset),
+                status=RequestStatus.NEW if index % 2 else RequestStatus.COMPLETED,
+                category=category if index < 4 else None,
+                city=city
+            )
+            for index, offset in enumerate(offsets)
+        ]
+        session.add_all([category, city, *requests])
+        session.commit()
+        ids = [request.id for request in requests]
+        service = RequestService(session)
+
+        def key(request):
+            return request.created_at, request.id
+
+        # Вперед: от самых новых заявок к самым старым, город загружен вместе со страницей
+        page, has_newer, has_older = asyncio.run(service.get_requests_page(limit=PAGE_SIZE))
+        assert [request.id for request in page] == ids[:3:-1] and not has_newer and has_older
+        assert "city" in page[0].__dict__
+        middle, has_newer, has_older = asyncio.run(service.get_requests_page(cursor=key(page[-1]), limit=PAGE_SIZE))
+        assert [request.id for request in middle] == ids[3:0:-1] and has_newer and has_older
+        last, has_newer, has_older = asyncio.run(service.get_requests_page(cursor=key(middle[-1]), limit=PAGE_SIZE))
+        assert [request.id for request in last] == [ids[0]] and has_newer and not has_older
+
+        # Назад
+        back, has_newer, has_older = asyncio.run(
+            service.get_requests_page(cursor=key(last[0]), direction="prev", limit=PAGE_SIZE)
+        )
+        assert back == middle and has_newer and has_older
+        first, has_newer, has_older = asyncio.run(
+            service.get_requests_page(cursor=key(back[0]), direction="prev", limit=PAGE_SIZE)
+        )
+        assert first == page and not has_newer and has_older
+
+        # Фильтры
+        new, _, has_older = asyncio.run(service.get_requests_page(status=RequestStatus.NEW, limit=PAGE_SIZE))
+        assert [request.id for request in new] == [ids[5], ids[3], ids[1]] and not has_older
+        in_category, _, _ = asyncio.run(
+            service.get_requests_page(status=RequestStatus.COMPLETED, category_id=category.id, city_id=city.id)
+        )
+        assert [request.id for request in in_category] == [ids[2], ids[0]]
+
+def test_count_cache(database, monkeypatch):
+    """Проверяет, что количество записей кэшируется по набору фильтров"""
+    with get_session() as session:
+        session.add_all([User(telegram_id=8_700_000 + index, is_active=index < 2) for index in range(3)])
+        session.add_all([Request(description=f"Заявка {index}", status=RequestStatus.NEW) for index in range(2)])
+        session.commit()
+        users, requests = UserService(session), RequestService(session)
+
+        counts = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if "count(" in statement.lower():
+                counts.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", count_statement)
+        try:
+            assert users.count_users() == 3 and users.count_users(is_active=True) == 2
+            assert requests.count_requests() == 2 and requests.count_requests(status=RequestStatus.NEW) == 2
+            assert len(counts) == 4
+
+            # Повторные подсчеты с теми же фильтрами берутся из кэша, даже если данные изменились
+            session.add(User(telegram_id=8_700_100, is_active=True))
+            session.add(Request(description="Новая заявка", status=RequestStatus.NEW))
+            session.commit()
+            assert users.count_users() == 3 and users.count_users(is_active=True) == 2
+            assert requests.count_requests(status=RequestStatus.NEW) == 2
+            assert len(counts) == 4
+
+            # Другой набор фильтров считается отдельно
+            assert users.count_users(is_active=False) == 1
+            assert len(counts) == 5
+
+            # После истечения времени жизни значения пересчитываются
+            for cache in (user_service._users_count_cache, request_service._requests_count_cache):
+                monkeypatch.setattr(cache, "ttl", 0)
+                cache.clear()
+            assert users.count_users() == 4 and requests.count_requests() == 3
+            assert users.count_users() == 4
+            assert len(counts) == 8
+        finally:
+            event.remove(database.engine, "before_cursor_execute", count_statement)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
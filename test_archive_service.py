@@ -0,0 +1,121 @@
+"""
+Скрипт для проверки архивирования заявок перед удалением и восстановления из архива
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select, update
+
+from bot.database.setup import get_session
+from bot.models import Category, Distribution, Request, ServicePackage, SubCategory, request_package, request_subcategory
+from bot.services.archive_service import list_partitions, read_archive, restore_archive
+from bot.services.cleanup_service import FINISHED_REQUEST_STATUSES, cleanup_old_requests
+from bot.utils.bulk_generator import BulkDataGenerator
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def links(database, ids) -> dict:
+    """Возвращает связи заявок с подкатегориями и пакетами услуг"""
+    with database.engine.connect() as connection:
+        return {
+            table.name: sorted(tuple(row) for row in connection.execute(
+                select(table).where(table.c.request_id.in_(ids))
+            ))
+            for table in (request_subcategory, request_package)
+        }
+
+def snapshot(database, model, ids) -> dict:
+    """Возвращает строки таблицы с указанными ID заявок"""
+    column = Request.id if model is Request else Distribution.request_id
+    with database.engine.connect() as connection:
+        rows = connection.execute(select(model.__table__).where(column.in_(ids))).mappings()
+        return {row["id"]: dict(row) for row in rows}
+
+async def run_archive_test(database, root: str) -> None:
+    """Удаляет старые заявки с архивированием во временную директорию и восстанавливает их"""
+    BulkDataGenerator(seed=3, batch_size=200, days=400).populate(database.engine, 50, 600, 2)
+
+    with get_session() as session:
+        session.query(Request).update({"is_demo": False})
+        session.commit()
+        cutoff = datetime.now() - timedelta(days=90)
+        ids = [request_id for (request_id,) in session.query(Request.id).filter(
+            Request.created_at < cutoff,
+            Request.status.in_(FINISHED_REQUEST_STATUSES)
+        )]
+    assert ids
+
+    # Подкатегории и пакеты услуг первых заявок
+    with get_session() as session:
+        category = session.query(Category).first()
+        subcategory = SubCategory(name="Площадь", category_id=category.id, type="area")
+        package = ServicePackage(name="Под ключ", services=[category.id])
+        session.add_all([subcategory, package])
+        session.flush()
+        session.execute(insert(request_subcategory), [
+            {"request_id": request_id, "subcategory_id": subcategory.id, "value": str(index)}
+            for index, request_id in enumerate(ids[:3])
+        ])
+        session.execute(insert(request_package), [{"request_id": ids[0], "package_id": package.id}])
+
+        # Распределения первой заявки созданы через два дня после нее
+        first = session.get(Request, ids[0])
+        late_day = first.created_at + timedelta(days=2)
+        session.execute(update(Distribution).where(Distribution.request_id == first.id).values(created_at=late_day))
+        late = session.query(func.count(Distribution.id)).filter(Distribution.request_id == first.id).scalar()
+        session.commit()
+    assert late
+
+    links_before = links(database, ids)
+    requests_before = snapshot(database, Request, ids)
+    distributions_before = snapshot(database, Distribution, ids)
+
+    # Распределения старше 30 дней удаляются отдельно, до заявок
+    await cleanup_old_requests(days=90, archive_root=root)
+    with get_session() as session:
+        assert session.query(func.count(Request.id)).filter(Request.id.in_(ids)).scalar() == 0
+    assert links(database, ids) == {"request_subcategory": [], "request_package": []}
+
+    start, end = date.today() - timedelta(days=400), date.today()
+    archived = {row["id"]: row for row in read_archive("requests", start, end, root)}
+    assert set(requests_before) <= set(archived)
+    assert archived[ids[0]] == requests_before[ids[0]]
+    assert list_partitions("requests", root)
+
+    # Распределения за день без своей заявки пропускаются и учитываются
+    partial = restore_archive(database.engine, late_day.date(), late_day.date(), root)
+    assert partial["skipped_distributions"] >= late
+    assert snapshot(database, Distribution, [ids[0]]) == {}
+
+    counts = restore_archive(database.engine, start, end, root)
+    assert counts["requests"] + partial["requests"] == len(archived)
+    assert counts["request_subcategory"] == 3 and counts["request_package"] == 1
+    assert snapshot(database, Request, ids) == requests_before
+    assert snapshot(database, Distribution, ids) == distributions_before
+    assert links(database, ids) == links_before
+
+    # Повторное восстановление не создает дубликатов
+    assert restore_archive(database.engine, start, end, root) == {
+        "requests": 0,
+        "request_subcategory": 0,
+        "skipped_request_subcategory": 0,
+        "request_package": 0,
+        "skipped_request_package": 0,
+        "distributions": 0,
+        "skipped_distributions": 0
+    }
+    logger.info(f"Из архива восстановлено {counts}")
+
+def test_archive_service(database, tmp_path):
+    """Проверяет, что удаленные заявки и распределения можно прочитать и восстановить из архива"""
+    asyncio.run(run_archive_test(database, str(tmp_path)))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,98 @@
+"""
+Скрипт для проверки резервного копирования базы данных во время записи
+"""
+import gzip
+import importlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import pytest
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+ROWS = 20000
+
+def create_source(path: str) -> None:
+    """Создает базу данных из нескольких сотен страниц"""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload BLOB)")
+    connection.executemany("INSERT INTO items (payload) VALUES (?)", [(os.urandom(512),) for _ in range(ROWS)])
+    connection.commit()
+    connection.close()
+
+def test_backup_during_writes(tmp_path, monkeypatch):
+    """Проверяет, что копия снимается и проходит проверки, пока другое соединение пишет в базу данных"""
+    # Журнал backup.log создается при импорте скрипта в текущей директории
+    monkeypatch.chdir(tmp_path)
+    backup_database = importlib.import_module("backup_database")
+
+    source_path = str(tmp_path / "bot.db")
+    create_source(source_path)
+    monkeypatch.setattr(backup_database, "DB_PATH", source_path)
+    monkeypatch.setattr(backup_database, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(backup_database, "BACKUP_PAGES_PER_STEP", 1)
+    monkeypatch.setattr(backup_database, "BACKUP_STEP_SLEEP", 0.001)
+
+    stop = threading.Event()
+    writes = []
+
+    def writer():
+        connection = sqlite3.connect(source_path, timeout=30)
+        while not stop.is_set():
+            connection.execute("INSERT INTO items (payload) VALUES (?)", (os.urandom(512),))
+            connection.commit()
+            writes.append(True)
+            time.sleep(0.001)
+        connection.close()
+
+    restarts = []
+    copy_database = backup_database.copy_database
+
+    def counted_copy(target_path):
+        restarts.append(copy_database(target_path))
+        return restarts[-1]
+
+    monkeypatch.setattr(backup_database, "copy_database", counted_copy)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not writes:
+        time.sleep(0.001)
+    try:
+        backup_path = backup_database.create_backup()
+    finally:
+        stop.set()
+        thread.join()
+
+    assert writes, "Запись во время копирования не выполнялась"
+    assert backup_path is not None
+    # Постоянная запись перезапускала копирование, копия снята за один шаг
+    assert restarts == [backup_database.BACKUP_MAX_RESTARTS]
+
+    stats_path = backup_path.replace("bot_db_backup_", "bot_db_stats_").replace(".db.gz", ".json")
+    with open(stats_path) as f:
+        stats = json.load(f)
+    assert backup_database.verify_backup(backup_path, stats["sha256"])
+
+    restored_path = str(tmp_path / "restored.db")
+    with gzip.open(backup_path, "rb") as f_in, open(restored_path, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    assert backup_database.check_integrity(restored_path)
+    connection = sqlite3.connect(restored_path)
+    assert connection.execute("SELECT COUNT(*) FROM items").fetchone()[0] >= ROWS
+    connection.close()
+
+    logger.info(f"Копия снята после {restarts[0]} перезапусков, во время копирования записано {len(writes)} строк")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,89 @@
+"""
+Скрипт для проверки генератора синтетических данных
+"""
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+
+from bot.database.base import Base
+from bot.models import Distribution, DistributionStatus, Request, User, UserStatistics, user_category
+from bot.utils.bulk_generator import BulkDataGenerator
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+USERS = 200
+REQUESTS = 1000
+PER_REQUEST = 3
+
+def populate(seed: int):
+    """Заполняет новую базу данных и возвращает движок и количество строк"""
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_bulk.db')}")
+    Base.metadata.create_all(engine)
+    generator = BulkDataGenerator(seed=seed, batch_size=128, now=datetime(2026, 1, 1))
+    return engine, generator.populate(engine, USERS, REQUESTS, PER_REQUEST)
+
+def snapshot(engine) -> list:
+    """Возвращает содержимое заявок и распределений для сравнения"""
+    with engine.connect() as connection:
+        requests = connection.execute(
+            select(Request.id, Request.category_id, Request.city_id, Request.status, Request.created_at).order_by(Request.id)
+        ).all()
+        distributions = connection.execute(
+            select(Distribution.request_id, Distribution.user_id, Distribution.status).order_by(Distribution.id)
+        ).all()
+    return requests + distributions
+
+def test_bulk_generator():
+    """Проверяет количество записанных строк и повторяемость данных при одинаковом seed"""
+    engine, counts = populate(seed=7)
+
+    assert counts["users"] == USERS
+    assert counts["requests"] == REQUESTS
+    assert counts["distributions"] == REQUESTS * PER_REQUEST
+
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count(User.id))).scalar() == USERS
+        assert connection.execute(select(func.count(Request.id))).scalar() == REQUESTS
+        assert connection.execute(select(func.count(Distribution.id))).scalar() == REQUESTS * PER_REQUEST
+        assert connection.execute(select(func.count()).select_from(user_category)).scalar() == counts["user_categories"]
+
+        # Статистика пользователей заполнена по записанным распределениям
+        total, successful, expired = connection.execute(select(
+            func.sum(UserStatistics.total_requests),
+            func.sum(UserStatistics.successful_requests),
+            func.sum(UserStatistics.expired_requests)
+        )).one()
+        assert total == REQUESTS * PER_REQUEST
+        assert successful == connection.execute(select(func.count(Distribution.id)).where(
+            Distribution.status.in_([DistributionStatus.ACCEPTED, DistributionStatus.COMPLETED])
+        )).scalar()
+        assert expired == connection.execute(select(func.count(Distribution.id)).where(
+            Distribution.status == DistributionStatus.EXPIRED
+        )).scalar()
+        assert counts["user_statistics"] == connection.execute(select(func.count(UserStatistics.id))).scalar()
+
+        # Один пользователь не получает одну заявку дважды
+        duplicates = connection.execute(
+            select(Distribution.request_id, Distribution.user_id)
+            .group_by(Distribution.request_id, Distribution.user_id)
+            .having(func.count() > 1)
+        ).all()
+        assert not duplicates
+
+    same_engine, _ = populate(seed=7)
+    other_engine, _ = populate(seed=8)
+    assert snapshot(engine) == snapshot(same_engine)
+    assert snapshot(engine) != snapshot(other_engine)
+
+    logger.info(f"Генератор записал {counts}")
+
+if __name__ == "__main__":
+    test_bulk_generator()
@@ -0,0 +1,92 @@
+"""
+Скрипт для проверки захвата заявок несколькими экземплярами бота
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import and_, select, update
+
+from bot.database.setup import async_session, get_session
+from bot.models import Category, City, Distribution, Request, RequestStatus, User
+from bot.services.distribution_service import claim_requests, distribute_claimed_requests
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+REQUESTS = 60
+
+def create_requests() -> tuple:
+    """Создает новые заявки и исполнителей для них, возвращает ID категории и заявок"""
+    with get_session() as session:
+        category = Category(name="Проверка захвата заявок")
+        city = City(name="Проверка захвата заявок")
+        session.add_all([category, city])
+        for index in range(3):
+            session.add(User(telegram_id=8_000_000 + index, is_active=True, categories=[category], cities=[city]))
+        requests = [Request(description=f"Заявка {index}", category=category, city=city, has_design_project=None)
+                    for index in range(REQUESTS)]
+        session.add_all(requests)
+        session.commit()
+        return category.id, [request.id for request in requests]
+
+async def worker(owner: str, category_id: int) -> list:
+    """Захватывает заявки пакетами от имени экземпляра бота, пока они не закончатся"""
+    claimed = []
+    new_requests = and_(Request.status == RequestStatus.NEW, Request.category_id == category_id)
+    async with async_session() as session:
+        while True:
+            request_ids = await claim_requests(session, new_requests, limit=7, owner=owner)
+            if not request_ids:
+                return claimed
+            claimed.extend(request_ids)
+            await asyncio.sleep(0)
+
+async def run_claims_test() -> None:
+    """Запускает несколько экземпляров одновременно и проверяет, что заявки не захвачены дважды"""
+    category_id, request_ids = create_requests()
+
+    # Первое подключение движка выполняем заранее, а не одновременно из нескольких экземпляров
+    async with async_session() as session:
+        await session.execute(select(1))
+
+    claimed = await asyncio.gather(*(worker(f"worker-{index}", category_id) for index in range(4)))
+    all_claimed = [request_id for worker_ids in claimed for request_id in worker_ids]
+    assert len(all_claimed) == len(set(all_claimed)), "Одна заявка захвачена несколькими экземплярами"
+    assert sorted(all_claimed) == sorted(request_ids)
+
+    async with async_session() as session:
+        # Заявки, захваченные другим экземпляром, недоступны до истечения захвата
+        undistributed = and_(Request.status == RequestStatus.DISTRIBUTING, Request.category_id == category_id)
+        assert await claim_requests(session, undistributed, owner="worker-new") == []
+
+        # После истечения захвата (экземпляр остановился) заявки захватываются снова
+        stopped = max(claimed, key=len)
+        await session.execute(
+            update(Request).where(Request.id.in_(stopped)).values(claim_expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await session.commit()
+        taken_over = await claim_requests(session, undistributed, limit=REQUESTS, owner="worker-new")
+        assert sorted(taken_over) == sorted(stopped)
+
+        # Распределение снимает захват
+        await distribute_claimed_requests(session, taken_over[:1], owner="worker-new")
+
+    with get_session() as session:
+        request = session.query(Request).filter_by(id=taken_over[0]).populate_existing().first()
+        assert request.claimed_by is None and request.claim_expires_at is None
+        assert session.query(Distribution).filter_by(request_id=request.id).count() == 3
+
+    logger.info(f"Заявки распределены между экземплярами: {[len(worker_ids) for worker_ids in claimed]}")
+
+def test_claim_requests(database):
+    """Проверяет, что несколько экземпляров бота делят заявки без повторов"""
+    asyncio.run(run_claims_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,96 @@
+"""
+Скрипт для проверки пакетной очистки старых заявок и распределений
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from bot.database.setup import get_session
+from bot.models import Distribution, Request, Setting
+from bot.services import cleanup_service
+from bot.utils.bulk_generator import BulkDataGenerator
+from bot.utils.metrics import metrics
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def count_old_finished_requests(cutoff: datetime) -> int:
+    """Количество заявок, которые должны быть удалены"""
+    with get_session() as session:
+        return session.query(func.count(Request.id)).filter(
+            Request.created_at < cutoff,
+            Request.is_demo == False,
+            Request.status.in_(cleanup_service.FINISHED_REQUEST_STATUSES)
+        ).scalar()
+
+async def run_cleanup_test(database, archive_root: str) -> None:
+    """Заполняет базу данных и очищает ее несколькими запусками с ограничением по времени"""
+    BulkDataGenerator(seed=1, batch_size=500, days=400).populate(database.engine, 100, 3000, 3)
+
+    # Генератор помечает заявки как демо, здесь нужны обычные
+    with get_session() as session:
+        session.query(Request).update({"is_demo": False})
+        session.commit()
+
+    cutoff = datetime.now() - timedelta(days=90)
+    expected = count_old_finished_requests(cutoff)
+    assert expected > 500
+
+    purged_key = (("table", "requests"),)
+    purged_before = metrics.counters.get("bot_cleanup_rows_purged_total", {}).get(purged_key, 0)
+
+    async def purge_requests(batch_size: int, time_budget: float) -> int:
+        original = cleanup_service.purge_in_chunks
+
+        async def limited(name, select_ids, purge_chunk):
+            return await original(name, select_ids, purge_chunk, batch_size=batch_size, time_budget=time_budget)
+
+        cleanup_service.purge_in_chunks = limited
+        try:
+            return await cleanup_service.cleanup_old_requests(days=90, archive_root=archive_root)
+        finally:
+            cleanup_service.purge_in_chunks = original
+
+    # Нулевой бюджет - каждый запуск удаляет один пакет и сохраняет позицию
+    first = await purge_requests(batch_size=100, time_budget=0)
+    assert first == 100, f"Удалено {first} заявок вместо одного пакета"
+    with get_session() as session:
+        cursor = session.query(Setting.value).filter(Setting.key == "cleanup_cursor:requests").scalar()
+    assert int(cursor) > 0
+
+    purged = first
+    for _ in range(100):
+        removed = await purge_requests(batch_size=100, time_budget=0)
+        purged += removed
+        if removed < 100:
+            break
+
+    assert purged == expected, f"Удалено {purged} заявок из {expected}"
+    assert count_old_finished_requests(cutoff) == 0
+
+    # Распределения удаленных заявок удалены вместе с ними
+    with get_session() as session:
+        orphans = session.query(func.count(Distribution.id)).filter(
+            ~Distribution.request_id.in_(select(Request.id))
+        ).scalar()
+        cursor = session.query(Setting.value).filter(Setting.key == "cleanup_cursor:requests").scalar()
+    assert orphans == 0
+    assert cursor == "0", "После полного прохода позиция должна сбрасываться"
+
+    assert metrics.counters["bot_cleanup_rows_purged_total"][purged_key] - purged_before == expected
+    assert metrics.counters["bot_cleanup_budget_exhausted_total"][(("table", "requests"),)] > 0
+    logger.info(f"Удалено {purged} заявок за несколько запусков")
+
+def test_cleanup_service(database, tmp_path):
+    """Проверяет, что очистка удаляет старые заявки пакетами и продолжает с сохраненной позиции"""
+    asyncio.run(run_cleanup_test(database, str(tmp_path)))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,62 @@
+"""
+Скрипт для проверки пакетной записи распределений
+"""
+import logging
+
+import pytest
+from sqlalchemy import event
+
+from bot.database.setup import get_session
+from bot.models import Category, City, Distribution, DistributionStatus, Request, User
+from bot.services.distribution_service import DistributionService
+from bot.services.request_service import insert_distributions
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def test_distribution_writer(database):
+    """Проверяет, что распределения вставляются одним запросом без повторов"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with get_session() as session:
+        category = Category(name="Проверка записи распределений")
+        city = City(name="Проверка записи распределений")
+        users = [User(telegram_id=8_200_000 + index, is_active=True, categories=[category], cities=[city]) for index in range(4)]
+        request = Request(description="Заявка", category=category, city=city, has_design_project=None)
+        session.add_all([category, city, request, *users])
+        session.commit()
+        user_ids = [user.id for user in users]
+
+        event.listen(database.engine, "before_cursor_execute", count_statement)
+        try:
+            created = insert_distributions(session, request.id, user_ids[:2])
+            assert [distribution.user_id for distribution in created] == user_ids[:2]
+            assert all(distribution.status == DistributionStatus.PENDING for distribution in created)
+            # Одна вставка распределений и одно обновление статистики пользователей, без SELECT
+            assert len(statements) == 2 and all(statement.startswith("INSERT") for statement in statements)
+            assert statements[0].startswith("INSERT INTO distributions")
+
+            # Существующие пары и повторы в списке пропускаются
+            created = insert_distributions(session, request.id, [user_ids[3], user_ids[1], user_ids[3], user_ids[0]])
+            assert [distribution.user_id for distribution in created] == [user_ids[3]]
+            assert len(statements) == 4
+        finally:
+            event.remove(database.engine, "before_cursor_execute", count_statement)
+        session.commit()
+
+        # Сервис распределения создает только недостающие распределения
+        created = DistributionService(session).distribute_request(request)
+        assert [distribution.user_id for distribution in created] == [user_ids[2]]
+        assert session.query(Distribution).filter_by(request_id=request.id).count() == len(users)
+
+    logger.info("Распределения записаны без повторов")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,138 @@
+"""
+Скрипт для проверки обработки истекших распределений
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from bot.database.setup import async_session, get_session
+from bot.models import Category, City, Distribution, DistributionStatus, Request, RequestStatus, User
+from bot.services.distribution_service import process_expired_distributions, process_undistributed_requests
+from config import DEFAULT_MAX_DISTRIBUTIONS
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def create_requests() -> dict:
+    """Создает заявки с истекшими и действующими распределениями, возвращает их ID"""
+    past = datetime.utcnow() - timedelta(days=2)
+    with get_session() as session:
+        category = Category(name="Проверка истекших распределений")
+        city = City(name="Проверка истекших распределений")
+        users = [
+            User(telegram_id=8_300_000 + index, is_active=True, categories=[category], cities=[city])
+            for index in range(DEFAULT_MAX_DISTRIBUTIONS + 2)
+        ]
+        requests = {
+            name: Request(description=name, category=category, city=city, has_design_project=None,
+                          status=RequestStatus.DISTRIBUTING)
+            for name in ("redistribute", "exhausted", "active")
+        }
+        session.add_all([category, city, *users, *requests.values()])
+        session.flush()
+
+        def distribution(request, user, expired=True, status=DistributionStatus.PENDING):
+            return Distribution(request_id=request.id, user_id=user.id, status=status, created_at=past,
+                                expires_at=past + timedelta(days=1) if expired else datetime.utcnow() + timedelta(days=1))
+
+        # Одно истекшее распределение - заявка распределяется снова
+        session.add(distribution(requests["redistribute"], users[0]))
+        # Максимальное количество распределений - заявка становится просроченной
+        session.add(distribution(requests["exhausted"], users[0]))
+        session.add_all([
+            distribution(requests["exhausted"], user, status=DistributionStatus.REJECTED)
+            for user in users[1:DEFAULT_MAX_DISTRIBUTIONS]
+        ])
+        # Действующее распределение не затрагивается
+        session.add(distribution(requests["active"], users[0], expired=False))
+        session.commit()
+        return {name: request.id for name, request in requests.items()}
+
+async def run_expiry_test() -> None:
+    """Проверяет истечение распределений, просрочку заявок и повторное распределение"""
+    request_ids = create_requests()
+
+    async with async_session() as session:
+        await process_expired_distributions(session)
+
+        result = await session.execute(
+            select(Distribution.request_id, Distribution.user_id, Distribution.status)
+            .where(Distribution.request_id.in_(request_ids.values()))
+            .order_by(Distribution.id)
+        )
+        distributions = result.all()
+        result = await session.execute(
+            select(Request.id, Request.status, Request.claimed_by).where(Request.id.in_(request_ids.values()))
+        )
+        requests = {row.id: row for row in result}
+
+    def statuses(name):
+        return [row.status for row in distributions if row.request_id == request_ids[name]]
+
+    # Истекшее распределение отмечено, заявка распределена другим пользователям
+    redistributed = statuses("redistribute")
+    assert redistributed[0] == DistributionStatus.EXPIRED
+    assert redistributed[1:] and all(status == DistributionStatus.PENDING for status in redistributed[1:])
+    assert requests[request_ids["redistribute"]].status == RequestStatus.DISTRIBUTING
+    assert requests[request_ids["redistribute"]].claimed_by is None
+
+    # Заявка с максимальным количеством распределений просрочена и не распределяется снова
+    assert statuses("exhausted")[0] == DistributionStatus.EXPIRED
+    assert len(statuses("exhausted")) == DEFAULT_MAX_DISTRIBUTIONS
+    assert requests[request_ids["exhausted"]].status == RequestStatus.EXPIRED
+
+    # Действующее распределение не изменилось
+    assert statuses("active") == [DistributionStatus.PENDING]
+    assert requests[request_ids["active"]].status == RequestStatus.DISTRIBUTING
+
+    logger.info(f"Заявка распределена снова: {len(redistributed) - 1} новых распределений")
+
+async def run_stranded_test() -> None:
+    """Проверяет, что заявку без действующих предложений распределяет проход нераспределенных заявок"""
+    request_ids = create_requests()
+
+    async with async_session() as session:
+        # Истечение отмечено, но повторное распределение не состоялось (процесс остановился)
+        await session.execute(
+            update(Distribution)
+            .where(Distribution.status == DistributionStatus.PENDING, Distribution.expires_at < datetime.utcnow())
+            .values(status=DistributionStatus.EXPIRED)
+        )
+        await session.commit()
+
+        await process_undistributed_requests(session)
+
+        result = await session.execute(
+            select(Distribution.request_id, Distribution.status)
+            .where(Distribution.request_id.in_(request_ids.values()))
+            .order_by(Distribution.id)
+        )
+        distributions = result.all()
+
+    def statuses(name):
+        return [row.status for row in distributions if row.request_id == request_ids[name]]
+
+    # Заявка распределена снова
+    assert statuses("redistribute")[0] == DistributionStatus.EXPIRED
+    assert DistributionStatus.PENDING in statuses("redistribute")[1:]
+    # Заявка с максимальным количеством распределений и заявка с действующим предложением не затронуты
+    assert len(statuses("exhausted")) == DEFAULT_MAX_DISTRIBUTIONS
+    assert statuses("active") == [DistributionStatus.PENDING]
+
+def test_expiry_sweep(database):
+    """Проверяет обработку истекших распределений"""
+    asyncio.run(run_expiry_test())
+
+def test_stranded_requests(database):
+    """Проверяет повторное распределение заявок, оставшихся без предложений"""
+    asyncio.run(run_stranded_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
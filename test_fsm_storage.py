@@ -0,0 +1,123 @@
+"""
+Скрипт для проверки хранилища состояний FSM в базе данных
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy.exc import OperationalError
+
+from bot.database.fsm_storage import DatabaseStorage
+from bot.models import FSMRecord
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 0.2
+
+def storage_key(user_id: int) -> StorageKey:
+    """Ключ хранилища для личного чата пользователя"""
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+async def run_round_trip_test() -> None:
+    """Проверяет, что состояние и данные после сброса читает другое хранилище"""
+    writer = DatabaseStorage(flush_interval=60)
+    await writer.set_state(storage_key(1), "UserStates:PHONE_INPUT")
+    await writer.set_data(storage_key(1), {"phone": "+79990000000", "step": 2})
+    await writer.set_state(storage_key(2), "UserStates:MAIN_MENU")
+    await writer.set_state(storage_key(2), None)
+
+    # До сброса изменения видит только сам процесс
+    assert await writer.get_state(storage_key(1)) == "UserStates:PHONE_INPUT"
+    reader = DatabaseStorage(flush_interval=60)
+    assert await reader.get_state(storage_key(1)) is None
+
+    assert await writer.flush() == 2
+    reader = DatabaseStorage(flush_interval=60)
+    assert await reader.get_state(storage_key(1)) == "UserStates:PHONE_INPUT"
+    assert await reader.get_data(storage_key(1)) == {"phone": "+79990000000", "step": 2}
+    assert await reader.get_state(storage_key(2)) is None
+
+    await writer.close()
+    await reader.close()
+
+async def run_flush_failure_test(database) -> None:
+    """Проверяет, что несохраняемые данные не теряют изменения, а ошибка записи возвращает их в буфер"""
+    storage = DatabaseStorage(flush_interval=60)
+    await storage.set_data(storage_key(1), {"items": ["first"]})
+    await storage.flush()
+
+    # Данные, которые нельзя сохранить в JSON, не принимаются
+    with pytest.raises(TypeError):
+        await storage.set_data(storage_key(1), {"created_at": datetime(2024, 1, 1)})
+    assert await storage.get_data(storage_key(1)) == {"items": ["first"]}
+
+    # Вложенные данные изменены после set_data: ключ остается в буфере, остальные записываются
+    data = {"items": ["first"]}
+    await storage.set_data(storage_key(1), data)
+    data["items"].append(datetime(2024, 1, 1))
+    await storage.set_state(storage_key(2), "UserStates:MAIN_MENU")
+    assert await storage.flush() == 1
+    assert set(storage._dirty) == {storage.key_builder.build(storage_key(1))} and not storage._flushing
+    assert await DatabaseStorage().get_state(storage_key(2)) == "UserStates:MAIN_MENU"
+    assert (await storage.get_data(storage_key(1)))["items"][-1] == datetime(2024, 1, 1)
+
+    # После исправления данных ключ записывается при следующем сбросе
+    data["items"].pop()
+    assert await storage.flush() == 1
+    assert await DatabaseStorage().get_data(storage_key(1)) == {"items": ["first"]}
+
+    # Ошибка базы данных: изменения остаются в буфере до следующего сброса
+    await storage.set_state(storage_key(3), "UserStates:SETTINGS_MENU")
+    FSMRecord.__table__.drop(database.engine)
+    with pytest.raises(OperationalError):
+        await storage.flush()
+    assert set(storage._dirty) == {storage.key_builder.build(storage_key(3))}
+    assert not storage._flushing
+    assert await storage.get_state(storage_key(3)) == "UserStates:SETTINGS_MENU"
+
+    FSMRecord.__table__.create(database.engine)
+    assert await storage.flush() == 1
+    assert await DatabaseStorage().get_state(storage_key(3)) == "UserStates:SETTINGS_MENU"
+    await storage.close()
+
+async def run_cache_expiry_test() -> None:
+    """Проверяет, что изменения другого процесса видны после истечения времени жизни кэша"""
+    writer = DatabaseStorage(flush_interval=60)
+    reader = DatabaseStorage(cache_ttl=CACHE_TTL, flush_interval=60)
+
+    await writer.set_state(storage_key(1), "UserStates:MAIN_MENU")
+    await writer.flush()
+    assert await reader.get_state(storage_key(1)) == "UserStates:MAIN_MENU"
+
+    await writer.set_state(storage_key(1), "UserStates:PROFILE_MENU")
+    await writer.flush()
+    # Пока запись в кэше, читается прежнее состояние
+    assert await reader.get_state(storage_key(1)) == "UserStates:MAIN_MENU"
+
+    await asyncio.sleep(CACHE_TTL * 1.5)
+    assert await reader.get_state(storage_key(1)) == "UserStates:PROFILE_MENU"
+
+    await writer.close()
+    await reader.close()
+
+def test_fsm_round_trip(database):
+    """Проверяет сохранение состояний FSM в базе данных"""
+    asyncio.run(run_round_trip_test())
+
+def test_fsm_flush_failure(database):
+    """Проверяет обработку ошибок при сбросе состояний FSM"""
+    asyncio.run(run_flush_failure_test(database))
+
+def test_fsm_cache_expiry(database):
+    """Проверяет время жизни кэша состояний FSM"""
+    asyncio.run(run_cache_expiry_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
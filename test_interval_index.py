@@ -0,0 +1,50 @@
+"""
+Скрипт для проверки индекса числовых диапазонов
+"""
+import logging
+import random
+
+from bot.utils.interval_index import IntervalIndex
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def brute_force(intervals, value):
+    """Находит отрезки, содержащие значение, так же, как прежний SQL-фильтр"""
+    return tuple(
+        key for low, high, key in intervals
+        if (low is not None or high is not None)
+        and (low is None or low <= value)
+        and (high is None or value <= high)
+    )
+
+def test_interval_index():
+    """Сравнивает поиск по индексу с полным перебором на случайных диапазонах"""
+    # Типичные диапазоны площади
+    areas = [(0, 50, "до 50"), (50, 100, "50-100"), (100, None, "от 100"), (None, None, "любая")]
+    index = IntervalIndex(areas)
+    assert index.find(30) == ("до 50",)
+    assert index.find(50) == ("до 50", "50-100")
+    assert index.find(75.5) == ("50-100",)
+    assert index.find(1000) == ("от 100",)
+    assert index.find(-1) == ()
+
+    rng = random.Random(42)
+    for _ in range(200):
+        intervals = []
+        for key in range(rng.randint(0, 12)):
+            low = rng.choice([None, rng.randint(0, 100)])
+            high = rng.choice([None, rng.randint(0, 100)])
+            intervals.append((low, high, key))
+        index = IntervalIndex(intervals)
+        for value in [rng.uniform(-10, 110) for _ in range(20)] + list(range(-1, 102)):
+            assert index.find(value) == brute_force(intervals, value), (intervals, value)
+
+    logger.info("Индекс диапазонов совпадает с полным перебором")
+
+if __name__ == "__main__":
+    test_interval_index()
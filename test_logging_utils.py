@@ -0,0 +1,93 @@
+"""
+Скрипт для проверки структурированного логирования: формат JSON, выборка событий и запись через очередь
+"""
+import json
+import logging
+import sys
+from datetime import datetime
+
+import pytest
+
+from bot.utils import logging_utils
+from bot.utils.logging_utils import JsonFormatter, LazyQueueHandler, LogSampler, setup_queue_logging, stop_queue_logging
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def make_record(message: str, *args, exc_info=None, **extra) -> logging.LogRecord:
+    """Создает запись лога с дополнительными полями"""
+    return logging.getLogger("bot.test").makeRecord(
+        "bot.test", logging.WARNING, __file__, 1, message, args, exc_info, extra=extra
+    )
+
+def test_json_formatter():
+    """Проверяет поля записи JSON, дополнительные поля и исключения"""
+    record = make_record(
+        "Заявка #%d распределена", 42,
+        user_id=1001, expires_at=datetime(2024, 1, 1, 12, 0, 0), _private="скрыто"
+    )
+    line = JsonFormatter().format(record)
+    assert "\n" not in line and "Заявка" in line
+    entry = json.loads(line)
+
+    assert entry["level"] == "WARNING" and entry["logger"] == "bot.test"
+    assert entry["message"] == "Заявка #42 распределена"
+    assert entry["time"].endswith("+00:00")
+    # Дополнительные поля добавляются как есть, несериализуемые - строкой
+    assert entry["user_id"] == 1001
+    assert entry["expires_at"] == "2024-01-01 12:00:00"
+    # Служебные атрибуты записи и закрытые поля не дублируются
+    assert "_private" not in entry and "args" not in entry and "msg" not in entry
+
+    try:
+        raise ValueError("ошибка обработчика")
+    except ValueError:
+        record = make_record("Ошибка", exc_info=sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert "ValueError: ошибка обработчика" in entry["exception"]
+
+def test_log_sampler(monkeypatch):
+    """Проверяет долю логируемых событий по типам"""
+    sampler = LogSampler({"message": 1.0, "callback_query": 0.0, "edited_message": 0.25, "default": 0.5})
+    assert all(sampler.should_log("message") for _ in range(100))
+    assert not any(sampler.should_log("callback_query") for _ in range(100))
+
+    values = iter([0.1, 0.3, 0.2, 0.9])
+    monkeypatch.setattr(logging_utils.random, "random", lambda: next(values))
+    assert [sampler.should_log("edited_message") for _ in range(2)] == [True, False]
+    # Тип без своей доли использует долю по умолчанию
+    assert [sampler.should_log("inline_query") for _ in range(2)] == [True, False]
+
+    assert LogSampler({}).should_log("message")
+
+def test_queue_logging(tmp_path, monkeypatch):
+    """Проверяет запись лога в файл через очередь в формате JSON"""
+    root_logger = logging.getLogger()
+    monkeypatch.setattr(root_logger, "handlers", [])
+    monkeypatch.setattr(root_logger, "level", root_logger.level)
+    log_file = tmp_path / "bot.log"
+
+    listener = setup_queue_logging(logging.INFO, str(log_file), "%(levelname)s %(message)s")
+    try:
+        assert [type(handler) for handler in root_logger.handlers] == [LazyQueueHandler]
+        assert listener.handlers and logging_utils._listener is listener
+
+        # Аргументы сообщения подставляются в момент записи в лог, а не при выводе в файл
+        payload = {"step": 1}
+        logging.getLogger("bot.test").info("Состояние %s", payload, extra={"user_id": 1001})
+        payload["step"] = 2
+        logging.getLogger("bot.test").debug("Отладочное сообщение не записывается")
+    finally:
+        stop_queue_logging()
+
+    assert logging_utils._listener is None
+    entries = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert len(entries) == 1
+    assert entries[0]["message"] == "Состояние {'step': 1}" and entries[0]["user_id"] == 1001
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,125 @@
+"""
+Скрипт для проверки метрик: хранилище, middleware обработчиков и вывод /metrics
+"""
+import asyncio
+import logging
+
+import pytest
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.middlewares import metrics as metrics_middleware
+from bot.middlewares.metrics import MetricsMiddleware
+from bot.services import metrics_service
+from bot.services.metrics_service import create_metrics_app
+from bot.utils.metrics import MetricsRegistry
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+@pytest.fixture
+def registry(monkeypatch) -> MetricsRegistry:
+    """Пустое хранилище метрик вместо общего"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    monkeypatch.setattr(metrics_middleware, "metrics", registry)
+    monkeypatch.setattr(metrics_service, "metrics", registry)
+    monkeypatch.setattr("bot.utils.metrics.metrics", registry)
+    return registry
+
+def test_registry(registry):
+    """Проверяет гистограммы, счетчики, датчики и сводку"""
+    for value in (0.05, 0.05, 0.5, 5.0):
+        registry.observe("bot_handler_duration_seconds", value, handler="profile_menu")
+    histogram = registry.histograms["bot_handler_duration_seconds"][(("handler", "profile_menu"),)]
+    assert histogram.counts == [2, 1] and histogram.count == 4
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+    # Ошибка внутри track() учитывается, датчик возвращается к нулю
+    with pytest.raises(ValueError):
+        with registry.track("job", "process_distributions"):
+            assert registry.gauges["bot_job_in_progress"][(("job", "process_distributions"),)] == 1
+            raise ValueError("ошибка задачи")
+    labels = (("job", "process_distributions"),)
+    assert registry.counters["bot_job_errors_total"][labels] == 1
+    assert registry.gauges["bot_job_in_progress"][labels] == 0
+    assert registry.histograms["bot_job_duration_seconds"][labels].count == 1
+
+    rows = registry.summary("handler")
+    assert len(rows) == 1 and rows[0]["name"] == "profile_menu"
+    assert rows[0]["count"] == 4 and rows[0]["errors"] == 0
+    assert abs(rows[0]["avg"] - 1.4) < 1e-9
+
+async def run_middleware_test(registry: MetricsRegistry) -> None:
+    """Прогоняет обработчики через MetricsMiddleware"""
+    middleware = MetricsMiddleware()
+
+    async def accept_request(event, data):
+        return "ok"
+
+    async def reject_request(event, data):
+        raise RuntimeError("ошибка обработчика")
+
+    async def call(callback):
+        handler = HandlerObject(callback=callback)
+        return await middleware(lambda event, data: callback(event, data), object(), {"handler": handler})
+
+    assert await call(accept_request) == "ok"
+    assert await call(accept_request) == "ok"
+    with pytest.raises(RuntimeError):
+        await call(reject_request)
+
+    durations = registry.histograms["bot_handler_duration_seconds"]
+    assert durations[(("handler", "accept_request"),)].count == 2
+    assert durations[(("handler", "reject_request"),)].count == 1
+    assert registry.counters["bot_handler_errors_total"] == {(("handler", "reject_request"),): 1}
+    assert all(value == 0 for value in registry.gauges["bot_handler_in_progress"].values())
+
+    # Без объекта обработчика событие проходит без учета
+    assert await middleware(lambda event, data: accept_request(event, data), object(), {}) == "ok"
+    assert durations[(("handler", "accept_request"),)].count == 2
+
+def test_metrics_middleware(registry):
+    """Проверяет учет времени и ошибок обработчиков в middleware"""
+    asyncio.run(run_middleware_test(registry))
+
+async def run_endpoint_test(registry: MetricsRegistry) -> str:
+    """Запрашивает /metrics у приложения сервера метрик"""
+    registry.describe("bot_handler_duration_seconds", "Время выполнения обработчиков обновлений")
+    registry.observe("bot_handler_duration_seconds", 0.05, handler='say "hi"')
+    registry.inc("bot_handler_errors_total", handler="accept_request")
+    registry.set_gauge("bot_handler_in_progress", 2, handler="accept_request")
+
+    async with TestClient(TestServer(create_metrics_app())) as client:
+        response = await client.get("/metrics")
+        assert response.status == 200
+        assert response.content_type == "text/plain"
+        return await response.text()
+
+def test_metrics_endpoint(registry):
+    """Проверяет вывод /metrics в текстовом формате Prometheus"""
+    text = asyncio.run(run_endpoint_test(registry))
+    lines = text.splitlines()
+
+    assert "# TYPE bot_handler_errors_total counter" in lines
+    assert 'bot_handler_errors_total{handler="accept_request"} 1' in lines
+    assert "# TYPE bot_handler_in_progress gauge" in lines
+    assert 'bot_handler_in_progress{handler="accept_request"} 2' in lines
+
+    assert "# HELP bot_handler_duration_seconds Время выполнения обработчиков обновлений" in lines
+    assert "# TYPE bot_handler_duration_seconds histogram" in lines
+    labels = 'handler="say \\"hi\\""'
+    assert f'bot_handler_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'bot_handler_duration_seconds_bucket{{{labels},le="1"}} 1' in lines
+    assert f'bot_handler_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+    assert f"bot_handler_duration_seconds_sum{{{labels}}} 0.05" in lines
+    assert f"bot_handler_duration_seconds_count{{{labels}}} 1" in lines
+    assert text.endswith("\n")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
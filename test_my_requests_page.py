@@ -0,0 +1,94 @@
+"""
+Скрипт для проверки постраничного вывода раздела "Мои заявки"
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from bot.database.setup import get_session
+from bot.models import City, Distribution, DistributionStatus, Request, User
+from bot.services.request_service import RequestService, insert_distributions
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 2
+TELEGRAM_ID = 8_800_000
+
+def test_user_distributions_page(database):
+    """Проверяет листание распределений пользователя в обе стороны и фильтр по статусу"""
+    with get_session() as session:
+        city = City(name="Проверка раздела Мои заявки")
+        user, other = User(telegram_id=TELEGRAM_ID, is_active=True), User(telegram_id=TELEGRAM_ID + 1, is_active=True)
+        requests = [Request(description=f"Заявка {index}", city=city) for index in range(5)]
+        session.add_all([city, user, other, *requests])
+        session.commit()
+
+        # Распределения 1 и 2 созданы в одну и ту же секунду, у другого пользователя свои распределения
+        created_at = datetime(2024, 1, 1, 12, 0, 0)
+        statuses = [
+            DistributionStatus.ACCEPTED,
+            DistributionStatus.PENDING,
+            DistributionStatus.ACCEPTED,
+            DistributionStatus.REJECTED,
+            DistributionStatus.ACCEPTED
+        ]
+        ids = []
+        for index, (request, offset, status) in enumerate(zip(requests, [0, 1, 1, 2, 3], statuses)):
+            distribution, = insert_distributions(session, request.id, [user.id])
+            session.execute(
+                update(Distribution)
+                .where(Distribution.id == distribution.id)
+                .values(created_at=created_at + timedelta(seconds=offset), status=status)
+            )
+            ids.append(distribution.id)
+        insert_distributions(session, requests[4].id, [other.id])
+        session.commit()
+        session.expire_all()
+        service = RequestService(session)
+
+        def page(**kwargs):
+            return asyncio.run(service.get_user_distributions_page(TELEGRAM_ID, limit=PAGE_SIZE, **kwargs))
+
+        def key(distribution):
+            return distribution.created_at, distribution.id
+
+        # Вперед: от самых новых к самым старым, заявка и город загружены вместе со страницей
+        first, has_newer, has_older = page()
+        assert [d.id for d in first] == [ids[4], ids[3]] and not has_newer and has_older
+        assert "request" in first[0].__dict__ and "city" in first[0].request.__dict__
+        middle, has_newer, has_older = page(cursor=key(first[-1]))
+        assert [d.id for d in middle] == [ids[2], ids[1]] and has_newer and has_older
+        last, has_newer, has_older = page(cursor=key(middle[-1]))
+        assert [d.id for d in last] == [ids[0]] and has_newer and not has_older
+
+        # Назад: те же страницы в том же порядке
+        back, has_newer, has_older = page(cursor=key(last[0]), direction="prev")
+        assert back == middle and has_newer and has_older
+        back, has_newer, has_older = page(cursor=key(back[0]), direction="prev")
+        assert back == first and not has_newer and has_older
+
+        # Фильтр по статусу применяется в запросе, флаги считаются по отфильтрованному списку
+        accepted, has_newer, has_older = page(status=DistributionStatus.ACCEPTED)
+        assert [d.id for d in accepted] == [ids[4], ids[2]] and not has_newer and has_older
+        accepted, has_newer, has_older = page(status=DistributionStatus.ACCEPTED, cursor=key(accepted[-1]))
+        assert [d.id for d in accepted] == [ids[0]] and has_newer and not has_older
+        accepted, has_newer, has_older = page(
+            status=DistributionStatus.ACCEPTED, cursor=key(accepted[0]), direction="prev"
+        )
+        assert [d.id for d in accepted] == [ids[4], ids[2]] and not has_newer and has_older
+        pending, has_newer, has_older = page(status=DistributionStatus.PENDING)
+        assert [d.id for d in pending] == [ids[1]] and not has_newer and not has_older
+
+        # Неизвестный пользователь получает пустую страницу
+        assert asyncio.run(service.get_user_distributions_page(TELEGRAM_ID + 2)) == ([], False, False)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,96 @@
+"""
+Скрипт для проверки подсчета SQL-запросов в обработчиках и задачах
+"""
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import select, text
+
+from bot.database import query_counter
+from bot.database.query_counter import install_query_counter, statement_shape
+from bot.database.setup import async_session
+from bot.models import User
+from bot.utils.metrics import MetricsRegistry
+from config import QUERY_REPEAT_THRESHOLD
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+@pytest.fixture
+def registry(database, monkeypatch) -> MetricsRegistry:
+    """Хранилище метрик теста с подсчетом запросов к базе данных теста"""
+    registry = MetricsRegistry()
+    monkeypatch.setattr(query_counter, "metrics", registry)
+    monkeypatch.setattr(query_counter, "_installed_engines", [])
+    install_query_counter([database.engine, database.async_engine.sync_engine])
+    return registry
+
+def statements(registry: MetricsRegistry, kind: str, name: str) -> float:
+    """Количество запросов, учтенных за обработчиком или задачей"""
+    return registry.counters[f"bot_{kind}_db_statements_total"].get(((kind, name),), 0)
+
+def test_statement_shape():
+    """Проверяет, что форма запроса не зависит от значений параметров"""
+    assert statement_shape("SELECT *\n  FROM users WHERE id IN (?, ?, ?) LIMIT 10") == \
+        "SELECT * FROM users WHERE id IN (?) LIMIT N"
+    assert statement_shape("SELECT * FROM users WHERE id IN (?)") == statement_shape("SELECT * FROM users WHERE id IN (?, ?)")
+
+def test_scope_counts(registry, database, caplog):
+    """Проверяет подсчет запросов по обработчикам, вложенные блоки и предупреждение о проблеме N+1"""
+    with database.engine.connect() as connection:
+        # Запросы вне отслеживаемых блоков не учитываются
+        connection.execute(text("SELECT 1"))
+
+        with registry.track("handler", "profile_menu"):
+            connection.execute(select(User.id))
+            connection.execute(select(User.id).where(User.is_active == True))
+        assert statements(registry, "handler", "profile_menu") == 2
+        assert registry.counters["bot_handler_db_seconds_total"][(("handler", "profile_menu"),)] > 0
+
+        # Запросы вложенного обработчика учитываются и во внешней задаче
+        with registry.track("job", "process_distributions"):
+            connection.execute(text("SELECT 1"))
+            with registry.track("handler", "accept_request"):
+                connection.execute(text("SELECT 2"))
+        assert statements(registry, "handler", "accept_request") == 1
+        assert statements(registry, "job", "process_distributions") == 2
+
+        # Одинаковые запросы с разными параметрами - признак проблемы N+1
+        with caplog.at_level(logging.WARNING, logger=query_counter.__name__):
+            with registry.track("handler", "my_requests"):
+                for user_id in range(QUERY_REPEAT_THRESHOLD):
+                    connection.execute(select(User).where(User.id == user_id))
+        assert statements(registry, "handler", "my_requests") == QUERY_REPEAT_THRESHOLD
+        assert registry.counters["bot_handler_n_plus_one_total"] == {(("handler", "my_requests"),): 1}
+        assert any(record.query_owner == "my_requests" for record in caplog.records)
+
+    assert statements(registry, "handler", "profile_menu") == 2
+    assert registry.summary("handler")[0]["db_statements"] > 0
+
+async def run_concurrent_scopes_test(registry: MetricsRegistry) -> None:
+    """Выполняет обработчики с разным количеством запросов одновременно"""
+    async with async_session() as session:
+        await session.execute(select(1))
+
+    async def handler(name: str, count: int) -> None:
+        with registry.track("handler", name):
+            async with async_session() as session:
+                for _ in range(count):
+                    await session.execute(select(User.id))
+                    await asyncio.sleep(0)
+
+    await asyncio.gather(handler("show_request", 3), handler("reject_request", 1))
+
+def test_concurrent_scopes(registry):
+    """Проверяет, что одновременные обработчики считают только свои запросы"""
+    asyncio.run(run_concurrent_scopes_test(registry))
+    assert statements(registry, "handler", "show_request") == 3
+    assert statements(registry, "handler", "reject_request") == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,76 @@
+"""
+Скрипт для проверки кэша справочников и готовых клавиатур
+"""
+import logging
+
+import pytest
+from sqlalchemy import event
+
+from bot.database.setup import get_session
+from bot.models import Category, City, SubCategory
+from bot.services.reference_cache import ReferenceCache
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def button_texts(keyboard) -> list:
+    """Возвращает тексты кнопок клавиатуры"""
+    return [button.text for row in keyboard.keyboard for button in row]
+
+def test_reference_cache(database):
+    """Проверяет, что меню строятся без запросов к базе данных, а изменения справочника видны после invalidate()"""
+    with get_session() as session:
+        category = Category(name="Электрика", is_active=True)
+        session.add_all([category, City(name="Москва", is_active=True), City(name="Казань", is_active=False)])
+        session.flush()
+        session.add(SubCategory(name="До 50 м²", category_id=category.id, type="area", min_value=0, max_value=50))
+        session.commit()
+        category_id = category.id
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", count_statement)
+    try:
+        cache = ReferenceCache(ttl=0)
+
+        keyboard = cache.selection_keyboard("cities", [])
+        assert button_texts(keyboard) == ["❌ Москва", "✅ Готово", "🔙 Вернуться в главное меню"]
+        loaded = len(statements)
+        assert loaded == 3, f"Ожидалось 3 запроса при загрузке справочников, выполнено {loaded}"
+
+        # Повторные обращения не обращаются к базе данных и возвращают готовые клавиатуры
+        for _ in range(100):
+            assert cache.selection_keyboard("cities", []) is keyboard
+            cache.admin_keyboard("categories")
+            cache.subcategories_keyboard("area", [category_id], [])
+            cache.find_category("Электрика")
+            assert cache.area_subcategory_ids(30) == cache.area_subcategory_ids(30, category_id)
+        assert len(statements) == loaded, f"Выполнено {len(statements) - loaded} лишних запросов"
+
+        assert button_texts(cache.admin_keyboard("cities"))[:2] == ["✅ Москва", "❌ Казань"]
+        assert button_texts(cache.subcategories_keyboard("area", [category_id], []))[0] == "❌ До 50 м²"
+        assert len(cache.area_subcategory_ids(50)) == 1
+        assert cache.area_subcategory_ids(51) == []
+
+        # После изменения справочника и invalidate() клавиатуры строятся заново
+        with get_session() as session:
+            session.query(City).filter(City.name == "Казань").update({"is_active": True})
+            session.commit()
+        cache.invalidate()
+
+        assert button_texts(cache.selection_keyboard("cities", []))[:2] == ["❌ Москва", "❌ Казань"]
+        assert len(statements) == loaded + 1 + 3
+    finally:
+        event.remove(database.engine, "before_cursor_execute", count_statement)
+
+    logger.info("Кэш справочников работает корректно")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,86 @@
+"""
+Скрипт для проверки очереди распределения заявок с приоритетами
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import and_, func, select
+
+from bot.database.setup import async_session, get_session
+from bot.models import Category, City, Distribution, Request, RequestStatus, User
+from bot.services.distribution_service import drain_request_queue
+from bot.services.request_priority import QueuedRequest, RequestQueue, score_request
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+COSTS = [1_000, 500_000, 20_000, None, 3_000_000, 150_000]
+
+def check_scores() -> None:
+    """Проверяет порядок заявок в очереди"""
+    now = datetime.utcnow()
+    cheap = QueuedRequest(1, now, 1_000, None, None)
+    expensive = QueuedRequest(2, now, 1_000_000, 120, None)
+    assert score_request(expensive, now) > score_request(cheap, now)
+
+    # Дешевая заявка, которая долго ждет, обгоняет новую дорогую
+    old_cheap = QueuedRequest(3, now - timedelta(days=2), 1_000, None, None)
+    assert score_request(old_cheap, now) > score_request(expensive, now)
+
+    queue = RequestQueue([cheap, expensive, old_cheap], now=now)
+    assert queue.pop_batch(2) == [3, 2]
+    assert queue.pop_batch(5) == [1]
+    assert len(queue) == 0
+
+def create_requests() -> int:
+    """Создает заявки с разной стоимостью и исполнителя для них, возвращает ID категории"""
+    with get_session() as session:
+        category = Category(name="Проверка очереди распределения")
+        city = City(name="Проверка очереди распределения")
+        session.add_all([category, city])
+        session.add(User(telegram_id=8_100_000, is_active=True, categories=[category], cities=[city]))
+        session.add_all([
+            Request(description=f"Заявка {index}", estimated_cost=cost, category=category, city=city, has_design_project=None)
+            for index, cost in enumerate(COSTS)
+        ])
+        session.commit()
+        return category.id
+
+async def run_queue_test() -> None:
+    """Проверяет, что заявки распределяются по убыванию стоимости и в пределах времени запуска"""
+    check_scores()
+    category_id = create_requests()
+    new_requests = and_(Request.status == RequestStatus.NEW, Request.category_id == category_id)
+
+    async with async_session() as session:
+        # Время запуска истекло, заявки остаются в очереди
+        assert await drain_request_queue(session, new_requests, "test", deadline=time.monotonic()) == 0
+
+        assert await drain_request_queue(session, new_requests, "test", deadline=time.monotonic() + 60) == len(COSTS)
+
+        # Порядок распределения - порядок создания распределений
+        result = await session.execute(
+            select(Request.estimated_cost, func.min(Distribution.id))
+            .join(Distribution, Distribution.request_id == Request.id)
+            .where(Request.category_id == category_id)
+            .group_by(Request.id)
+            .order_by(func.min(Distribution.id))
+        )
+        order = [cost for cost, _ in result]
+
+    assert order == sorted(COSTS, key=lambda cost: cost or 0, reverse=True), order
+    logger.info(f"Порядок распределения по стоимости: {order}")
+
+def test_request_priority(database):
+    """Проверяет очередь распределения заявок с приоритетами"""
+    asyncio.run(run_queue_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
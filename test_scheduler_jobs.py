@@ -0,0 +1,124 @@
+"""
+Скрипт для проверки ограничений выполнения задач планировщика
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from bot.database.setup import async_session
+from bot.services import scheduler
+from bot.services.scheduler import MISFIRE_COALESCE, MISFIRE_SKIP, acquire_lease, job_summary, run_due_task
+from bot.utils.metrics import metrics
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+INTERVAL = 10
+
+def counter(name: str, **labels: str) -> float:
+    """Возвращает значение счетчика"""
+    return metrics.counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+async def run_jobs_test() -> None:
+    """Проверяет отмену по времени, пропуск запусков и ограничение одновременных задач"""
+    async with async_session() as session:
+        await session.execute(select(1))
+
+    scheduler.SCHEDULER_CANCEL_GRACE = 0.1
+    scheduler.job_slots = asyncio.Semaphore(1)
+    prefix = uuid.uuid4().hex[:8]
+
+    # Зависшая задача отменяется по времени
+    key = f"{prefix}_slow"
+    assert (await acquire_lease(key))[0]
+    cancelled = []
+
+    async def slow_job():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    now = datetime.utcnow()
+    next_run = await run_due_task(slow_job, INTERVAL, "Медленная задача", key, 0.2, MISFIRE_COALESCE, now)
+    assert cancelled and counter("bot_job_timeouts_total", job=key) == 1
+    assert next_run >= now + timedelta(seconds=INTERVAL)
+
+    # Задача, не завершившаяся после отмены, не запускается повторно
+    key = f"{prefix}_hung"
+    assert (await acquire_lease(key))[0]
+    release = asyncio.Event()
+    runs = []
+
+    async def hung_job():
+        runs.append(True)
+        while not release.is_set():
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                pass
+
+    await run_due_task(hung_job, INTERVAL, "Зависшая задача", key, 0.2, MISFIRE_COALESCE, datetime.utcnow())
+    await run_due_task(hung_job, INTERVAL, "Зависшая задача", key, 0.2, MISFIRE_COALESCE, datetime.utcnow())
+    assert len(runs) == 1 and counter("bot_job_skipped_total", job=key, reason="running") == 1
+    release.set()
+    await asyncio.sleep(0.05)
+
+    # Пропущенные запуски: MISFIRE_SKIP ждет следующего запуска по расписанию, MISFIRE_COALESCE выполняет один раз
+    key = f"{prefix}_misfire"
+    assert (await acquire_lease(key))[0]
+    runs.clear()
+
+    async def quick_job():
+        runs.append(True)
+
+    due_at = datetime.utcnow() - timedelta(seconds=INTERVAL * 3.5)
+    next_run = await run_due_task(quick_job, INTERVAL, "Быстрая задача", key, INTERVAL, MISFIRE_SKIP, due_at)
+    assert not runs and next_run == due_at + timedelta(seconds=INTERVAL * 4)
+    assert counter("bot_job_skipped_total", job=key, reason="missed") == 3
+
+    next_run = await run_due_task(quick_job, INTERVAL, "Быстрая задача", key, INTERVAL, MISFIRE_COALESCE, due_at)
+    assert len(runs) == 1 and next_run > datetime.utcnow()
+
+    # Одновременно выполняется не больше job_slots задач
+    active = []
+    peak = []
+
+    async def limited_job():
+        active.append(True)
+        peak.append(len(active))
+        await asyncio.sleep(0.1)
+        active.pop()
+
+    keys = [f"{prefix}_limited_{index}" for index in range(3)]
+    for key in keys:
+        assert (await acquire_lease(key))[0]
+    await asyncio.gather(*(
+        run_due_task(limited_job, INTERVAL, "Ограниченная задача", key, INTERVAL, MISFIRE_COALESCE, datetime.utcnow())
+        for key in keys
+    ))
+    assert len(peak) == 3 and max(peak) == 1
+
+    # Сводка для команды /jobs
+    rows = {row["name"]: row for row in job_summary()}
+    assert rows[f"{prefix}_slow"]["timeouts"] == 1
+    assert rows[f"{prefix}_misfire"]["skipped"] == 3
+    assert rows[f"{prefix}_misfire"]["lag_p95"] > 0
+
+    logger.info(f"Сводка задач: {[(row['name'], row['count']) for row in rows.values()]}")
+
+def test_scheduler_jobs(database):
+    """Проверяет ограничения выполнения задач планировщика"""
+    asyncio.run(run_jobs_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
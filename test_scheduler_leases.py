@@ -0,0 +1,142 @@
+"""
+Скрипт для проверки аренды периодических задач несколькими экземплярами бота
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from bot.database.setup import async_session
+from bot.models import JobLease
+from bot.services import scheduler
+from bot.services.scheduler import MISFIRE_COALESCE, acquire_lease, record_run, release_lease, run_due_task, stop_scheduler
+from bot.utils.metrics import metrics
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+async def run_leases_test() -> None:
+    """Проверяет, что задачу держит один экземпляр и что аренду перехватывают после остановки"""
+    key = f"test_job_{uuid.uuid4().hex[:8]}"
+
+    # Первое подключение движка выполняем заранее, а не одновременно из нескольких экземпляров
+    async with async_session() as session:
+        await session.execute(select(1))
+
+    # Экземпляры запускаются одновременно, задачу получает только один
+    results = await asyncio.gather(*(acquire_lease(key, owner=f"worker-{index}") for index in range(4)))
+    leaders = [index for index, (held, _) in enumerate(results) if held]
+    assert len(leaders) == 1, f"Задачу арендовали несколько экземпляров: {leaders}"
+    leader = f"worker-{leaders[0]}"
+    follower = "worker-new"
+
+    # Владелец продлевает аренду, остальные ее не получают
+    assert (await acquire_lease(key, owner=leader))[0]
+    assert not (await acquire_lease(key, owner=follower))[0]
+
+    # Время запуска сохраняется и возвращается при продлении аренды
+    started_at = datetime.utcnow().replace(microsecond=0)
+    await record_run(key, started_at, owner=leader)
+    await record_run(key, started_at + timedelta(hours=1), owner=follower)  # Чужая запись игнорируется
+    held, last_run_at = await acquire_lease(key, owner=leader)
+    assert held and last_run_at == started_at
+
+    # После истечения аренды (экземпляр остановился) задачу перехватывают вместе со временем запуска
+    async with async_session() as session:
+        await session.execute(
+            update(JobLease).where(JobLease.name == key).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await session.commit()
+    held, last_run_at = await acquire_lease(key, owner=follower)
+    assert held and last_run_at == started_at
+    assert not (await acquire_lease(key, owner=leader))[0]
+
+    # Освобожденная аренда сразу доступна другим экземплярам
+    await release_lease(key, owner=follower)
+    assert (await acquire_lease(key, owner=leader))[0]
+
+    logger.info(f"Аренда задачи {key} перешла от {leader} к {follower} и обратно")
+
+async def take_lease(key: str, owner: str) -> None:
+    """Передает аренду задачи другому экземпляру, как будто срок аренды истек"""
+    async with async_session() as session:
+        await session.execute(
+            update(JobLease).where(JobLease.name == key)
+            .values(owner=owner, expires_at=datetime.utcnow() + timedelta(minutes=5))
+        )
+        await session.commit()
+
+async def run_lease_lost_test() -> None:
+    """Проверяет, что задача отменяется, если аренду перехватили во время ее выполнения"""
+    key = f"test_job_{uuid.uuid4().hex[:8]}"
+    assert (await acquire_lease(key))[0]
+    cancelled = asyncio.Event()
+
+    async def long_job():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def steal():
+        await asyncio.sleep(0.05)
+        await take_lease(key, "worker-new")
+
+    started = time.monotonic()
+    await asyncio.gather(
+        run_due_task(long_job, 60, "Долгая задача", key, 60, MISFIRE_COALESCE, datetime.utcnow()),
+        steal()
+    )
+    assert cancelled.is_set() and time.monotonic() - started < 5
+    assert metrics.counters["bot_job_lease_lost_total"][(("job", key),)] == 1
+
+async def run_stop_test() -> None:
+    """Проверяет, что аренда освобождается только после остановки задачи"""
+    key = f"test_job_{uuid.uuid4().hex[:8]}"
+    assert (await acquire_lease(key))[0]
+    events = []
+
+    async def schedule():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            # Задача завершает работу и успевает продлить аренду
+            await asyncio.sleep(0.05)
+            await acquire_lease(key)
+            events.append("stopped")
+            raise
+
+    scheduler.tasks[key] = asyncio.create_task(schedule())
+    await asyncio.sleep(0)
+    await stop_scheduler()
+    assert events == ["stopped"] and not scheduler.tasks
+
+    # Освобожденную аренду сразу получает другой экземпляр
+    assert (await acquire_lease(key, owner="worker-new"))[0]
+
+def test_scheduler_leases(database):
+    """Проверяет аренду периодических задач"""
+    asyncio.run(run_leases_test())
+
+def test_lease_lost(database, monkeypatch):
+    """Проверяет отмену задачи при потере аренды"""
+    monkeypatch.setattr(scheduler, "SCHEDULER_LEASE_TTL", 0.3)
+    monkeypatch.setattr(scheduler, "SCHEDULER_CANCEL_GRACE", 0.1)
+    monkeypatch.setattr(scheduler, "job_slots", asyncio.Semaphore(1))
+    asyncio.run(run_lease_lost_test())
+
+def test_stop_scheduler(database):
+    """Проверяет освобождение аренды при остановке планировщика"""
+    asyncio.run(run_stop_test())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
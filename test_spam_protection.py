@@ -0,0 +1,112 @@
+"""
+Скрипт для проверки защиты от спама: скользящее окно, удаление неактивных счетчиков и сохранение блокировок
+"""
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.utils import security_utils
+from bot.utils.security_utils import check_spam, get_blocked_until
+from config import BLOCK_DURATION_HOURS, MAX_REQUESTS_PER_MINUTE, MAX_WARNINGS, SPAM_IDLE_TIMEOUT
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Начало минуты, чтобы положение внутри окна было известно
+BASE_TIME = datetime(2024, 1, 1, 12, 0, 0)
+
+@pytest.fixture
+def spam_state(tmp_path, monkeypatch):
+    """Пустые счетчики и блокировки, файл блокировок во временной директории"""
+    blocks_file = str(tmp_path / "spam_blocks.json")
+    monkeypatch.setattr(security_utils, "SPAM_BLOCKS_FILE", blocks_file)
+    monkeypatch.setattr(security_utils, "user_requests", OrderedDict())
+    monkeypatch.setattr(security_utils, "blocked_users", {})
+    monkeypatch.setattr(security_utils, "_blocked_users_loaded", False)
+    return blocks_file
+
+def restart(monkeypatch) -> None:
+    """Сбрасывает состояние в памяти, как после перезапуска бота"""
+    monkeypatch.setattr(security_utils, "user_requests", OrderedDict())
+    monkeypatch.setattr(security_utils, "blocked_users", {})
+    monkeypatch.setattr(security_utils, "_blocked_users_loaded", False)
+
+def send(user_id: int, count: int, at: datetime) -> list:
+    """Отправляет несколько запросов от пользователя, возвращает результаты проверки"""
+    return [check_spam(user_id, at) for _ in range(count)]
+
+def test_sliding_window(spam_state):
+    """Проверяет, что запросы предыдущей минуты учитываются пропорционально"""
+    assert send(1001, MAX_REQUESTS_PER_MINUTE, BASE_TIME) == [False] * MAX_REQUESTS_PER_MINUTE
+    assert check_spam(1001, BASE_TIME)
+    assert security_utils.user_requests[1001].warnings == 1
+
+    # Через полторы минуты из предыдущего окна учитывается половина запросов:
+    # 31 * 0.5 + k > 30 при k >= 15
+    middle = BASE_TIME + timedelta(seconds=90)
+    assert send(1001, 14, middle) == [False] * 14
+    assert check_spam(1001, middle)
+
+    # Через две минуты прошлые запросы уже не учитываются
+    assert not check_spam(1001, BASE_TIME + timedelta(seconds=200))
+
+def test_idle_eviction(spam_state, monkeypatch):
+    """Проверяет удаление неактивных счетчиков, не затрагивающее текущего пользователя"""
+    send(1001, 5, BASE_TIME)
+    send(1002, 1, BASE_TIME + timedelta(seconds=1))
+
+    # Вернувшийся после простоя пользователь остается в памяти с учтенным запросом,
+    # а счетчик неактивного пользователя удаляется
+    returned = BASE_TIME + timedelta(seconds=SPAM_IDLE_TIMEOUT + 5)
+    assert not check_spam(1001, returned)
+    assert list(security_utils.user_requests) == [1001]
+    window = security_utils.user_requests[1001]
+    assert window.current == 1 and window.last_seen == returned.timestamp()
+
+    # Единственный отслеживаемый пользователь тоже не удаляется
+    later = returned + timedelta(seconds=SPAM_IDLE_TIMEOUT + 5)
+    assert not check_spam(1001, later)
+    assert security_utils.user_requests[1001].last_seen == later.timestamp()
+
+    # При превышении лимита пользователей удаляются самые давние
+    monkeypatch.setattr(security_utils, "SPAM_MAX_TRACKED_USERS", 3)
+    for index, user_id in enumerate(range(2001, 2005)):
+        check_spam(user_id, later + timedelta(seconds=index))
+    assert list(security_utils.user_requests) == [2002, 2003, 2004]
+
+def test_block_persistence(spam_state, monkeypatch):
+    """Проверяет, что блокировка сохраняется в файл и восстанавливается после перезапуска"""
+    # При загрузке из файла блокировки сравниваются с текущим временем
+    base_time = datetime.now().replace(second=0, microsecond=0)
+    results = send(1001, MAX_REQUESTS_PER_MINUTE + MAX_WARNINGS, base_time)
+    assert results[-MAX_WARNINGS:] == [True] * MAX_WARNINGS
+    blocked_until = base_time + timedelta(hours=BLOCK_DURATION_HOURS)
+    assert get_blocked_until(1001, base_time) == blocked_until
+
+    with open(spam_state) as f:
+        saved = json.load(f)
+    assert saved == {"1001": blocked_until.isoformat()}
+
+    # Истекшая блокировка в файле не загружается
+    saved["1002"] = (base_time - timedelta(hours=1)).isoformat()
+    with open(spam_state, "w") as f:
+        json.dump(saved, f)
+
+    restart(monkeypatch)
+    assert check_spam(1001, base_time + timedelta(hours=1))
+    assert get_blocked_until(1001, base_time + timedelta(hours=1)) == blocked_until
+    assert 1002 not in security_utils.blocked_users
+
+    # После окончания блокировки запросы снова принимаются
+    assert get_blocked_until(1001, blocked_until) is None
+    assert not check_spam(1001, blocked_until)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
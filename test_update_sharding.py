@@ -0,0 +1,101 @@
+"""
+Скрипт для проверки упорядоченной обработки обновлений по пользователям
+"""
+import asyncio
+import logging
+import random
+import time
+
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.middlewares.sharding import setup_update_sharding
+from bot.utils.metrics import metrics
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+USERS = 20
+MESSAGES_PER_USER = 10
+MAX_CONCURRENCY = 4
+
+def make_update(update_id: int, user_id: int, text: str) -> types.Update:
+    """Формирует обновление с текстовым сообщением"""
+    return types.Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text
+        }
+    })
+
+def queue_depth_gauge() -> dict:
+    """Возвращает значения датчика глубины очередей по номерам очередей"""
+    series = metrics.gauges.get("bot_update_queue_depth", {})
+    return {int(dict(labels)["shard"]): value for labels, value in series.items()}
+
+async def run_sharding_test() -> None:
+    """Отправляет пачку обновлений и проверяет порядок и ограничение параллельности"""
+    bot = Bot(token="123456:TEST-TOKEN")
+    dp = Dispatcher(storage=MemoryStorage())
+    router = Router()
+    processed = {}
+    running = 0
+    max_running = 0
+
+    @router.message()
+    async def handler(message: types.Message):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # Случайная задержка перемешала бы обновления без упорядочивания
+        await asyncio.sleep(random.uniform(0, 0.01))
+        processed.setdefault(message.from_user.id, []).append(int(message.text))
+        running -= 1
+
+    dp.include_router(router)
+    sharding = setup_update_sharding(dp, shards=8, max_concurrency=MAX_CONCURRENCY)
+
+    tasks = []
+    update_id = 0
+    for seq in range(MESSAGES_PER_USER):
+        for user_id in range(1, USERS + 1):
+            update_id += 1
+            tasks.append(asyncio.create_task(dp.feed_update(bot, make_update(update_id, user_id, str(seq)))))
+
+    # Даем обновлениям попасть в очереди
+    await asyncio.sleep(0)
+    depths = sharding.get_queue_depths()
+    logger.info(f"Глубина очередей: {depths}")
+    assert sum(depths.values()) == USERS * MESSAGES_PER_USER, f"Неверная глубина очередей: {depths}"
+    # Глубина очередей выводится в /metrics
+    assert queue_depth_gauge() == depths
+
+    await asyncio.gather(*tasks)
+
+    for user_id, sequence in processed.items():
+        assert sequence == list(range(MESSAGES_PER_USER)), f"Нарушен порядок для пользователя {user_id}: {sequence}"
+    assert len(processed) == USERS
+    assert max_running <= MAX_CONCURRENCY, f"Одновременно выполнялось {max_running} обновлений"
+    assert sum(sharding.get_queue_depths().values()) == 0
+    assert sum(queue_depth_gauge().values()) == 0
+    assert 'bot_update_queue_depth{shard="0"} 0' in metrics.render()
+
+    logger.info(f"Порядок сохранен для {USERS} пользователей, максимум параллельных обработчиков: {max_running}")
+
+    await sharding.close()
+    await bot.session.close()
+
+def test_update_sharding():
+    """Проверяет упорядоченную обработку обновлений"""
+    asyncio.run(run_sharding_test())
+
+if __name__ == "__main__":
+    test_update_sharding()
@@ -0,0 +1,147 @@
+"""
+Скрипт для проверки кэша пользователей и пакетной записи активности в DatabaseMiddleware
+"""
+import asyncio
+import logging
+import time
+
+import pytest
+from aiogram import types
+from sqlalchemy import delete, event, select
+
+from bot.database.setup import async_session
+from bot.database.setup import get_session
+from bot.middlewares.database import DatabaseMiddleware, UserCache, user_cache
+from bot.models import User
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+UPDATES = 1000
+USERS = 10
+FLUSH_INTERVAL = 0.2
+
+def make_message(message_id: int, user_id: int) -> types.Message:
+    """Формирует сообщение от пользователя"""
+    return types.Message.model_validate({
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+        "text": "click"
+    })
+
+async def run_user_cache_test(database) -> None:
+    """Прогоняет всплеск обновлений через middleware и считает запросы к таблице users"""
+    statements = {"SELECT": 0, "INSERT": 0, "UPDATE": 0}
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        sql = statement.lstrip().upper()
+        if " USERS" in sql:
+            for kind in statements:
+                if sql.startswith(kind):
+                    statements[kind] += 1
+
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    cache = UserCache(flush_interval=FLUSH_INTERVAL)
+    middleware = DatabaseMiddleware(cache=cache)
+    seen_users = []
+
+    async def handler(message, data):
+        user, session = data["user"], data["session"]
+        # Каждое событие получает собственный объект, привязанный к своей сессии и без изменений для записи
+        assert user in session and not session.dirty
+        assert user.telegram_id == message.from_user.id and user.last_activity is not None
+        seen_users.append(user)
+
+    started = time.monotonic()
+    for message_id in range(UPDATES):
+        user_id = 1000 + message_id % USERS
+        await middleware(handler, make_message(message_id, user_id), {})
+    burst_duration = time.monotonic() - started
+
+    # Ждем несколько сбросов буфера и записываем остаток
+    await asyncio.sleep(FLUSH_INTERVAL * 2)
+    await cache.close()
+
+    event.remove(database.async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    logger.info(f"{UPDATES} обновлений за {burst_duration:.2f} с, запросы к users: {statements}")
+
+    assert len(seen_users) == UPDATES
+    assert len({id(user) for user in seen_users}) == UPDATES
+    assert statements["INSERT"] == USERS, f"Ожидалось {USERS} вставок, выполнено {statements['INSERT']}"
+    assert statements["SELECT"] == USERS, f"Ожидалось {USERS} чтений, выполнено {statements['SELECT']}"
+    assert 1 <= statements["UPDATE"] <= 5, f"Выполнено {statements['UPDATE']} запросов UPDATE"
+
+    # Последняя активность записана в базу данных
+    async with async_session() as session:
+        result = await session.execute(select(User).where(User.telegram_id.between(1000, 1000 + USERS - 1)))
+        users = result.scalars().all()
+    assert len(users) == USERS
+    assert all(user.last_activity is not None for user in users)
+
+    # Удаляем тестовых пользователей
+    async with async_session() as session:
+        await session.execute(delete(User).where(User.telegram_id.between(1000, 1000 + USERS - 1)))
+        await session.commit()
+
+def test_user_cache(database):
+    """Проверяет, что всплеск обновлений приводит лишь к нескольким записям в базу данных"""
+    asyncio.run(run_user_cache_test(database))
+
+async def run_failed_row_test(database) -> None:
+    """Сбрасывает буфер, в котором один из пользователей удален"""
+    cache = UserCache(flush_interval=60)
+    middleware = DatabaseMiddleware(cache=cache)
+
+    async def handler(message, data):
+        pass
+
+    for user_id in range(2000, 2003):
+        await middleware(handler, make_message(user_id, user_id), {})
+    await cache.flush()
+
+    # Удаленный пользователь отбрасывается, остальные записываются
+    for user_id in range(2000, 2003):
+        await middleware(handler, make_message(user_id, user_id), {})
+    async with async_session() as session:
+        await session.execute(delete(User).where(User.telegram_id == 2001))
+        await session.commit()
+    assert await cache.flush() == 2
+    assert not cache._dirty
+
+    # Следующий сброс не блокируется удаленным пользователем
+    await middleware(handler, make_message(2000, 2000), {})
+    assert await cache.flush() == 1
+    await cache.close()
+
+def test_failed_row(database):
+    """Проверяет, что пользователь, которого нельзя записать, не блокирует остальные записи"""
+    asyncio.run(run_failed_row_test(database))
+
+def test_invalidate_on_update(database):
+    """Проверяет, что изменение пользователя через ORM удаляет его из кэша"""
+    with get_session() as session:
+        user = User(telegram_id=3000, is_active=True)
+        session.add(user)
+        session.commit()
+        user_cache.put(user)
+        assert user_cache.get(3000)["is_active"]
+
+        user.is_active = False
+        session.commit()
+        assert user_cache.get(3000) is None
+
+        user_cache.put(user)
+        session.delete(user)
+        session.commit()
+        assert user_cache.get(3000) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,213 @@
+"""
+Скрипт для проверки инкрементального обновления статистики пользователей
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, update
+
+from bot.database.setup import async_session, get_session
+from bot.handlers.admin_handlers_aiogram import admin_stats
+from bot.models import Category, City, Distribution, DistributionStatus, Request, RequestStatus, User, UserStatistics
+from bot.services.distribution_service import process_expired_distributions
+from bot.services.request_service import RequestService, insert_distributions
+from bot.services.user_service import UserService
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+class FakeMessage:
+    """Сообщение администратора, которое запоминает ответ"""
+
+    def __init__(self):
+        self.text = None
+
+    async def answer(self, text, **kwargs):
+        self.text = text
+
+class FakeState:
+    """Состояние FSM, которое ничего не хранит"""
+
+    async def set_state(self, state):
+        pass
+
+def age_distribution(session, distribution: Distribution, seconds: int) -> None:
+    """Сдвигает время создания распределения в прошлое"""
+    session.execute(
+        update(Distribution)
+        .where(Distribution.id == distribution.id)
+        .values(created_at=datetime.utcnow() - timedelta(seconds=seconds))
+    )
+    session.commit()
+
+def test_user_statistics(database):
+    """Проверяет, что статистика обновляется при создании распределений и ответах на них"""
+    with get_session() as session:
+        category = Category(name="Проверка статистики пользователей")
+        city = City(name="Проверка статистики пользователей")
+        users = [
+            User(telegram_id=8_400_000 + index, first_name=f"User{'_' if index else ' '}{index}", is_active=True)
+            for index in range(3)
+        ]
+        requests = [Request(description=f"Заявка {index}", category=category, city=city) for index in range(2)]
+        session.add_all([category, city, *users, *requests])
+        session.commit()
+        first, second, third = [user.id for user in users]
+        service = RequestService(session)
+
+        # Первая заявка: второй отказывается, первый принимает через 100 секунд
+        created = insert_distributions(session, requests[0].id, [first, second, third])
+        session.commit()
+        age_distribution(session, created[0], 100)
+        age_distribution(session, created[1], 50)
+        asyncio.run(service.update_distribution_status(created[1].id, DistributionStatus.REJECTED))
+        distribution, revoked = service.accept_distribution(created[0].id)
+        assert distribution.status == DistributionStatus.ACCEPTED and len(revoked) == 1
+
+        # Вторая заявка: первый принимает через 300 секунд
+        created = insert_distributions(session, requests[1].id, [first, third])
+        session.commit()
+        age_distribution(session, created[0], 300)
+        service.accept_distribution(created[0].id)
+
+        statistics = {row.user_id: row for row in session.query(UserStatistics).populate_existing()}
+        assert statistics[first].total_requests == 2
+        assert statistics[first].processed_requests == 2
+        assert statistics[first].successful_requests == 2
+        assert abs(statistics[first].avg_response_time - 200) < 2
+        assert statistics[first].conversion_rate == 100.0
+
+        # Отказ учитывается как ответ, отозванное предложение - как закрытое без ответа
+        assert statistics[second].total_requests == 1 and statistics[second].processed_requests == 1
+        assert statistics[second].successful_requests == 0 and statistics[second].conversion_rate == 0.0
+        assert statistics[second].expired_requests == 0
+        assert statistics[third].total_requests == 2 and statistics[third].processed_requests == 0
+        assert statistics[third].expired_requests == 2
+
+        first_user = session.get(User, first)
+        first_user.categories.append(category)
+        first_user.cities.append(city)
+        session.commit()
+        session.expire_all()
+
+        # Итоги читаются из user_statistics, число запросов не зависит от количества распределений
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", count_statement)
+        try:
+            result = UserService(session).get_user_statistics(first)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", count_statement)
+        assert len(statements) == 4
+        assert result["total_distributions"] == 2 and result["successful_requests"] == 2
+        assert result["categories"] == [category.name] and result["cities"] == [city.name]
+        assert result["status_stats"] == {
+            "ожидание": 0, "принято": 2, "отклонено": 0, "завершено": 0, "просрочено": 0
+        }
+        second_stats = UserService(session).get_user_statistics(second)["status_stats"]
+        assert second_stats["отклонено"] == 1 and second_stats["принято"] == 0
+        assert UserService(session).get_user_statistics(-1) == {}
+
+        top = UserService(session).get_top_users(limit=2)
+        assert [user.id for user, _ in top] == [first, second]
+
+        # Лучшие исполнители выводятся в статистике админ-панели
+        message = FakeMessage()
+        asyncio.run(admin_stats(message, FakeState()))
+        assert "Лучшие исполнители" in message.text
+        assert "1. User 0: принято 2 из 2, конверсия 100%" in message.text
+        assert "2. User\\_1: принято 0 из 1, конверсия 0%" in message.text
+        assert "3. User\\_2: принято 0 из 2, конверсия 0%" in message.text
+
+    logger.info("Статистика пользователей обновлена инкрементально")
+
+async def run_expired_statistics_test() -> None:
+    """Отмечает истекшие распределения"""
+    async with async_session() as session:
+        await process_expired_distributions(session)
+
+def test_expired_statistics(database):
+    """Проверяет учет распределений с истекшим сроком в статистике"""
+    with get_session() as session:
+        users = [User(telegram_id=8_450_000 + index, is_active=True) for index in range(3)]
+        request = Request(description="Заявка без ответа", status=RequestStatus.DISTRIBUTING)
+        session.add_all([*users, request])
+        session.commit()
+        first, second, third = [user.id for user in users]
+        created = insert_distributions(session, request.id, [first, second])
+        session.execute(
+            update(Distribution)
+            .where(Distribution.id == created[0].id)
+            .values(expires_at=datetime.utcnow() - timedelta(minutes=1))
+        )
+        session.commit()
+
+    asyncio.run(run_expired_statistics_test())
+
+    with get_session() as session:
+        statistics = {row.user_id: row for row in session.query(UserStatistics)}
+        assert statistics[first].total_requests == 1 and statistics[first].expired_requests == 1
+        assert statistics[first].processed_requests == 0
+        assert statistics[second].expired_requests == 0
+        assert UserService(session).get_user_statistics(first)["expired_requests"] == 1
+
+def test_least_loaded_users(database):
+    """Проверяет выбор наименее загруженных пользователей по статистике и ожидающим ответа распределениям"""
+    with get_session() as session:
+        users = [User(telegram_id=8_500_000 + index, is_active=True) for index in range(4)]
+        requests = [Request(description=f"Заявка {index}") for index in range(4)]
+        session.add_all([*users, *requests])
+        session.commit()
+        busy, veteran, newcomer, fresh = [user.id for user in users]
+
+        # Ожидает ответа: busy - одно распределение; veteran получил три заявки и ответил на все
+        insert_distributions(session, requests[0].id, [busy, veteran])
+        insert_distributions(session, requests[1].id, [veteran])
+        insert_distributions(session, requests[2].id, [veteran, newcomer])
+        session.query(Distribution).filter(Distribution.user_id != busy).update(
+            {Distribution.status: DistributionStatus.REJECTED}
+        )
+        session.commit()
+
+        statements = []
+
+        def capture_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        service = RequestService(session)
+        candidates = session.query(User.id).filter(User.is_active == True)
+        event.listen(database.engine, "before_cursor_execute", capture_statement)
+        try:
+            ranked = service._least_loaded_users(candidates, 4)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", capture_statement)
+
+        # Сначала без ожидающих ответа, среди них - с меньшим числом полученных заявок
+        assert [user.id for user in ranked] == [fresh, newcomer, veteran, busy]
+
+        # Заявка не предлагается повторно тем, кто ее уже получал
+        excluded = service._least_loaded_users(candidates, 4, requests[2].id)
+        assert [user.id for user in excluded] == [fresh, busy]
+
+        # Сортировка и LIMIT выполняются в одном запросе, ожидающие ответа распределения
+        # считаются по индексу, а не по всей истории
+        assert len(statements) == 1
+        statement, parameters = statements[0]
+        assert "ORDER BY" in statement and "LIMIT" in statement
+        with database.engine.connect() as connection:
+            plan = " ".join(str(row) for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        assert "ix_distributions_status_user" in plan
+
+    logger.info("Наименее загруженные пользователи выбраны по статистике")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,128 @@
+"""
+Скрипт для проверки режима webhook: имитирует Telegram, отправляющий обновления на вебхук
+"""
+import asyncio
+import logging
+import time
+
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.services import webhook_service
+from bot.services.webhook_service import create_webhook_app, run_webhook
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+SECRET = "test-secret"
+PATH = "/webhook"
+HANDLER_DELAY = 0.5
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    """Формирует обновление в том виде, в котором его отправляет Telegram"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text
+        }
+    }
+
+async def run_webhook_test() -> None:
+    """Отправляет обновления на вебхук и проверяет, что они обработаны"""
+    bot = Bot(token="123456:TEST-TOKEN")
+    dp = Dispatcher(storage=MemoryStorage())
+    router = Router()
+    received = []
+    done = asyncio.Event()
+
+    @router.message()
+    async def slow_handler(message: types.Message):
+        # Медленный обработчик не должен задерживать ответ Telegram
+        await asyncio.sleep(HANDLER_DELAY)
+        received.append(message.text)
+        if len(received) == 3:
+            done.set()
+
+    dp.include_router(router)
+
+    app = create_webhook_app(dp, bot, path=PATH, secret_token=SECRET)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    try:
+        # Запрос без секретного токена отклоняется
+        response = await client.post(PATH, json=make_update(1, 100, "intruder"))
+        assert response.status == 401, f"Ожидался код 401, получен {response.status}"
+
+        # Запрос с неверным токеном отклоняется
+        response = await client.post(
+            PATH,
+            json=make_update(2, 100, "intruder"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+        )
+        assert response.status == 401, f"Ожидался код 401, получен {response.status}"
+
+        # Корректные обновления подтверждаются сразу, до завершения обработки
+        for update_id, text in enumerate(["one", "two", "three"], start=3):
+            started = time.monotonic()
+            response = await client.post(
+                PATH,
+                json=make_update(update_id, 100 + update_id, text),
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            )
+            elapsed = time.monotonic() - started
+            assert response.status == 200, f"Ожидался код 200, получен {response.status}"
+            assert elapsed < HANDLER_DELAY, f"Ответ занял {elapsed:.3f} с, обновление обработано не в фоне"
+
+        await asyncio.wait_for(done.wait(), timeout=5)
+        assert sorted(received) == ["one", "three", "two"], f"Получены обновления: {received}"
+        logger.info("Все обновления обработаны, посторонние запросы отклонены")
+    finally:
+        await client.close()
+        await bot.session.close()
+
+def test_webhook():
+    """Проверяет прием обновлений через вебхук"""
+    asyncio.run(run_webhook_test())
+
+async def run_shutdown_test() -> int:
+    """Запускает и останавливает веб-сервер, возвращает количество закрытий сессии бота"""
+    bot = Bot(token="123456:TEST-TOKEN")
+    dp = Dispatcher(storage=MemoryStorage())
+    started = asyncio.Event()
+    closed = []
+
+    async def set_webhook(**kwargs):
+        started.set()
+
+    async def close():
+        closed.append(True)
+
+    bot.set_webhook = set_webhook
+    bot.session.close = close
+
+    task = asyncio.create_task(run_webhook(dp, bot))
+    await asyncio.wait_for(started.wait(), timeout=5)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return len(closed)
+
+def test_webhook_shutdown(monkeypatch):
+    """Проверяет, что остановка веб-сервера оставляет закрытие сессии бота вызывающему коду"""
+    monkeypatch.setattr(webhook_service, "WEBHOOK_BASE_URL", "https://example.com")
+    monkeypatch.setattr(webhook_service, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(webhook_service, "WEBHOOK_HOST", "127.0.0.1")
+    monkeypatch.setattr(webhook_service, "WEBHOOK_PORT", 0)
+    assert asyncio.run(run_shutdown_test()) == 0
+
+if __name__ == "__main__":
+    test_webhook()